@@ -12,10 +12,23 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # Cambiar a True para debug SQL
     
+    # SQLite en producción (services/basedatos.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # ms
+        'mmap_size': 268435456,  # 256 MB
+        'cache_size': -64000,  # 64 MB (negativo = KiB)
+        'temp_store': 'MEMORY'
+    }
+    SQLITE_POOL_LECTURA = True  # Pool de solo lectura para peticiones GET
+    SQLITE_POOL_LECTURA_TAMANO = 5
+    
     # Carpetas
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'exports', 'reports')
     DATA_FOLDER = os.path.join(BASE_DIR, 'data')
+    ARCHIVE_FOLDER = os.path.join(BASE_DIR, 'exports', 'archive')
     STATIC_FOLDER = os.path.join(BASE_DIR, 'static')
     TEMPLATE_FOLDER = os.path.join(BASE_DIR, 'templates')
     
@@ -23,6 +36,15 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max
     ALLOWED_EXTENSIONS = {'pdf', 'csv'}
     
+    # Retención de reportes
+    REPORTES_CONSERVADOS = 10  # por usuario; los anteriores se resumen por año
+    DIAS_ARCHIVO_PDF = 30  # PDFs más antiguos se comprimen en ARCHIVE_FOLDER
+    CUOTA_ARCHIVO_MB = 512
+    
+    # Caché de gráficas (memoria y DATA_FOLDER/graficas)
+    CACHE_GRAFICAS_MEMORIA_MB = 32
+    CACHE_GRAFICAS_DISCO_MB = 256
+    
     # sesión
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     SESSION_COOKIE_SECURE = False  # Cambiar a True en producción con HTTPS
@@ -43,6 +65,8 @@ class Config:
     # Tarifas eléctricas (CFE - México)
     TARIFA_BASE = 0.82  # MXN por kWh (tarifa 1)
     TARIFA_INTERMEDIA = 1.05  # MXN por kWh (tarifa 1A)
+    TARIFA_1B = 1.35  # MXN por kWh (tarifa 1B)
+    TARIFA_1C = 1.85  # MXN por kWh (tarifa 1C)
     TARIFA_EXCEDENTE = 2.85  # MXN por kWh (tarifa DAC)
     
     # Límites de consumo para tarifas escalonadas (kWh bimestrales)
@@ -51,6 +75,33 @@ class Config:
     LIMITE_TARIFA_1B = 400
     LIMITE_TARIFA_1C = 600
     
+    # Precios por ventana horaria (services/simulacion.py): esquema horario
+    # propio, independiente de las tarifas por bloque de consumo
+    PRECIO_HORARIO_BASE = 0.95  # MXN por kWh
+    PRECIO_HORARIO_INTERMEDIO = 1.60
+    PRECIO_HORARIO_PUNTA = 2.90
+    
+    # Perfiles de uso horario por tipo de dispositivo (services/simulacion.py):
+    # (hora inicio, hora fin, peso relativo); 'otro' para tipos sin perfil
+    PERFILES_USO = {
+        'refrigerador': [(0, 24, 1)],
+        'lavadora': [(8, 12, 1), (18, 21, 1)],
+        'televisor': [(14, 18, 1), (18, 23, 2)],
+        'tv': [(14, 18, 1), (18, 23, 2)],
+        'computadora': [(9, 18, 2), (18, 23, 1)],
+        'laptop': [(9, 18, 2), (18, 23, 1)],
+        'aire_acondicionado': [(0, 2, 1), (12, 18, 2), (18, 24, 1)],
+        'microondas': [(7, 9, 1), (13, 15, 1), (19, 21, 1)],
+        'horno': [(13, 15, 1), (18, 21, 1)],
+        'plancha': [(7, 10, 1), (18, 21, 1)],
+        'calentador': [(5, 8, 2), (18, 21, 1)],
+        'ventilador': [(0, 6, 1), (12, 24, 1)],
+        'foco_led': [(5, 7, 1), (18, 24, 2)],
+        'foco_incandescente': [(5, 7, 1), (18, 24, 2)],
+        'secadora': [(9, 13, 1), (18, 21, 1)],
+        'otro': [(7, 23, 1)]
+    }
+    
     # Configuración de optimización
     OBJETIVO_AHORRO_DEFAULT = 0.20  # 20%
     OBJETIVO_AHORRO_MIN = 0.10  # 10%
@@ -60,6 +111,7 @@ class Config:
     DIAS_PROYECCION_DEFAULT = 30
     DIAS_PROYECCION_MIN = 7
     DIAS_PROYECCION_MAX = 365
+    VARIACION_DIARIA = (0.9, 1.1)  # Factor aleatorio sobre el consumo estimado de cada día
     
     # Configuración de gráficas
     GRAFICAS_DPI = 100
@@ -125,6 +177,7 @@ class Config:
         
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         os.makedirs(Config.DATA_FOLDER, exist_ok=True)
+        os.makedirs(Config.ARCHIVE_FOLDER, exist_ok=True)
 
 
 class DevelopmentConfig(Config):
@@ -1,6 +1,7 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, send_file
+from flask import (Flask, render_template, redirect, url_for, flash, request, send_file, abort, jsonify,
+                   Response, stream_with_context)
 from flask_migrate import Migrate
-from models import db, Usuario, Dispositivo, ConsumoBimestral, Reporte
+from models import db, Usuario, Dispositivo, ConsumoBimestral, Reporte, ResumenUsuario
 # CORRECCIÓN 1: Agregamos DISPOSITIVOS_DATA a la importación
 from forms import (RegistroUsuarioForm, DispositivoForm, ConsumoBimestralForm, 
                    GenerarReporteForm, BusquedaUsuarioForm, DISPOSITIVOS_DATA)
@@ -8,14 +9,47 @@ from services.calculations import OptimizadorEnergetico
 from services.recommendations import GeneradorRecomendaciones
 from services.charts import GeneradorGraficas
 from services.pdf_generator import GeneradorPDF
+from services.cache import CacheOptimizacion, CacheGraficas
+from services.programador import ProgramadorCargas
+from services.consultas import consultas_dashboard, HISTORIAL_CONSUMOS
+from services.resumen import resumen_usuarios
+from services.busqueda import buscador_usuarios
+from services.basedatos import configurar_sqlite
+from services.importacion import ImportadorCSV, COLUMNAS, TAMANO_LOTE
+from services.exportacion import ExportadorDatos, TABLAS, FORMATOS
+from services.series import almacen_series
+from services.columnar import cache_columnar
+from services.retencion import retencion_reportes
+from services.tarifas import motor_tarifario
+from services.simulacion import simulador_horario
 from datetime import datetime
+import io
 import os
+import sys
+import click
+
+# config.py vive en la raíz del repositorio, dos niveles arriba de la app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from config import Config
+
+# Parámetros de los servicios: la única fuente es Config
+CLAVES_CONFIG = (
+    'SQLITE_PRAGMAS', 'SQLITE_POOL_LECTURA', 'SQLITE_POOL_LECTURA_TAMANO',
+    'RANGOS_POTENCIA', 'HORAS_USO_TIPICAS',
+    'REPORTES_CONSERVADOS', 'DIAS_ARCHIVO_PDF', 'CUOTA_ARCHIVO_MB',
+    'CACHE_GRAFICAS_MEMORIA_MB', 'CACHE_GRAFICAS_DISCO_MB',
+    'DIAS_PROYECCION_MAX', 'VARIACION_DIARIA',
+    'OBJETIVO_AHORRO_DEFAULT',
+    'TARIFA_BASE', 'TARIFA_INTERMEDIA', 'TARIFA_1B', 'TARIFA_1C', 'TARIFA_EXCEDENTE',
+    'LIMITE_TARIFA_1', 'LIMITE_TARIFA_1A', 'LIMITE_TARIFA_1B', 'LIMITE_TARIFA_1C',
+    'PRECIO_HORARIO_BASE', 'PRECIO_HORARIO_INTERMEDIO', 'PRECIO_HORARIO_PUNTA', 'PERFILES_USO'
+)
 
 app = Flask(__name__)
 
 # Configuración
 app.config['SECRET_KEY'] = 'clave_secreta_real_ig'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///pywatts.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///pywatts.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Configuración de carpetas
@@ -24,12 +58,76 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['DATA_FOLDER'] = 'data'
+app.config['ARCHIVE_FOLDER'] = 'exports/archive'
+app.config.from_mapping({clave: getattr(Config, clave) for clave in CLAVES_CONFIG})
 
-db.init_app(app)
+# WAL, pragmas y pool de solo lectura para GET (reemplaza db.init_app)
+configurar_sqlite(app, db)
 migrate = Migrate(app, db)
 
+# Resumen por usuario mantenido en la misma transacción de cada escritura
+resumen_usuarios.escuchar_cambios()
+
 with app.app_context():
     db.create_all()
+    resumen_usuarios.sincronizar_faltantes(db.session)
+    buscador_usuarios.preparar(db.engine)
+
+# Resultados de optimización compartidos entre "Analizar" y "PDF"
+cache_optimizacion = CacheOptimizacion(max_entradas=256)
+cache_optimizacion.escuchar_cambios(Dispositivo, ConsumoBimestral)
+
+# Imágenes de gráficas por hash de sus datos (memoria + disco)
+cache_graficas = CacheGraficas(app.config['CACHE_GRAFICAS_MEMORIA_MB'] * 1024 * 1024,
+                               app.config['CACHE_GRAFICAS_DISCO_MB'] * 1024 * 1024,
+                               carpeta=os.path.join(app.config['DATA_FOLDER'], 'graficas'))
+
+# Lecturas por intervalo en archivos columnares para análisis con memmap
+cache_columnar.carpeta = os.path.join(app.config['DATA_FOLDER'], 'lecturas')
+
+# Recibo escalonado con las tarifas y límites de bloque de Config
+motor_tarifario.configurar(app.config)
+
+# Límite de días y variación diaria de las proyecciones
+OptimizadorEnergetico.configurar(app.config)
+
+# Perfiles de uso y precios por ventana horaria (esquema aparte de las
+# tarifas por bloque)
+simulador_horario.configurar(app.config)
+
+# PDFs por mes (AAAA/MM) y archivo comprimido de los antiguos
+retencion_reportes.carpeta_reportes = app.config['UPLOAD_FOLDER']
+retencion_reportes.carpeta_archivo = app.config['ARCHIVE_FOLDER']
+retencion_reportes.conservar = app.config['REPORTES_CONSERVADOS']
+retencion_reportes.dias_archivo = app.config['DIAS_ARCHIVO_PDF']
+retencion_reportes.cuota_mb = app.config['CUOTA_ARCHIVO_MB']
+
+
+def _contexto_dashboard(usuario_id):
+    """Datos comunes de dashboard.html (None si el usuario no existe)"""
+    vista = consultas_dashboard.vista_usuario(usuario_id, db.session)
+    if vista is None:
+        return None
+    
+    # Un recibo de más para saber si hay que mostrar "Ver todos"
+    consumos = consultas_dashboard.consumos_recientes(usuario_id, db.session, limite=HISTORIAL_CONSUMOS + 1)
+    
+    # Estadísticas básicas desde el resumen desnormalizado
+    resumen = vista['resumen'] or ResumenUsuario(total_dispositivos=0, consumo_bimestral_kwh=0.0)
+    vista.update({
+        'total_dispositivos': resumen.total_dispositivos,
+        'consumo_total': resumen.consumo_bimestral_kwh,
+        # Parte de cada dispositivo en el total y meta de ahorro, sin
+        # reconstruir el optimizador
+        'porcentajes': {d.id: resumen.porcentaje(d.consumo_bimestral_kwh()) for d in vista['dispositivos']},
+        'holgura': resumen.holgura_optimizador(app.config['OBJETIVO_AHORRO_DEFAULT']),
+        'consumos': consumos[:HISTORIAL_CONSUMOS],
+        'mas_consumos': len(consumos) > HISTORIAL_CONSUMOS,
+        'reportes': consultas_dashboard.reportes_recientes(usuario_id, db.session)
+    })
+    return vista
+
 
 @app.route('/')
 def index():
@@ -66,54 +164,30 @@ def registro_usuario():
 
 @app.route('/usuarios')
 def lista_usuarios():
-    busqueda_form = BusquedaUsuarioForm()
-    usuarios = Usuario.query.order_by(Usuario.fecha_registro.desc()).all()
-    return render_template('login.html', usuarios=usuarios, form=busqueda_form)
+    busqueda_form = BusquedaUsuarioForm(request.args, meta={'csrf': False})
+    termino = busqueda_form.nombre_usuario.data if busqueda_form.validate() else None
+    usuarios, siguiente = buscador_usuarios.pagina(db.session, termino, request.args.get('despues'))
+    return render_template('login.html', usuarios=usuarios, form=busqueda_form,
+                          termino=termino, siguiente=siguiente)
 
 
 @app.route('/dashboard/<int:usuario_id>')
 def dashboard(usuario_id):
     """Dashboard principal del usuario"""
-    usuario = db.session.get(Usuario, usuario_id)
-    if not usuario:
+    contexto = _contexto_dashboard(usuario_id)
+    if not contexto:
         flash('Usuario no encontrado', 'danger')
         return redirect(url_for('lista_usuarios'))
-    dispositivos = usuario.dispositivos
-    consumos = usuario.consumos
-    reportes = usuario.reportes
-    
-    # Calcular estadísticas básicas
-    total_dispositivos = len(dispositivos)
-    consumo_total = sum(d.consumo_bimestral_kwh() for d in dispositivos) if dispositivos else 0
     
-    ultimo_consumo = consumos[-1] if consumos else None
-    ultimo_reporte = reportes[-1] if reportes else None
-    
-    return render_template('dashboard.html',
-                          usuario=usuario,
-                          dispositivos=dispositivos,
-                          total_dispositivos=total_dispositivos,
-                          consumo_total=consumo_total,
-                          ultimo_consumo=ultimo_consumo,
-                          ultimo_reporte=ultimo_reporte)
+    return render_template('dashboard.html', **contexto)
 
 
 @app.route('/usuario/<int:usuario_id>/dispositivo/agregar', methods=['GET', 'POST'])
 def agregar_dispositivo(usuario_id):
-    usuario = db.session.get(Usuario, usuario_id)
-    if not usuario:
+    contexto = _contexto_dashboard(usuario_id)
+    if not contexto:
         flash('Usuario no encontrado', 'danger')
         return redirect(url_for('lista_usuarios'))
-    
-    dispositivos = usuario.dispositivos
-    consumos = usuario.consumos
-    reportes = usuario.reportes
-    
-    # Datos para el contexto del dashboard
-    total_dispositivos = len(dispositivos)
-    consumo_total = sum(d.consumo_bimestral_kwh() for d in dispositivos) if dispositivos else 0
-    ultimo_consumo = consumos[-1] if consumos else None
-    ultimo_reporte = reportes[-1] if reportes else None
 
     form = DispositivoForm()
     
@@ -133,34 +207,24 @@ def agregar_dispositivo(usuario_id):
         return redirect(url_for('dashboard', usuario_id=usuario_id))
     
     return render_template('dashboard.html', 
-                          usuario=usuario, 
                           form=form, 
                           modal_active=True,
-                          dispositivos=dispositivos,
-                          total_dispositivos=total_dispositivos,
-                          consumo_total=consumo_total,
-                          ultimo_consumo=ultimo_consumo,
-                          ultimo_reporte=ultimo_reporte,
-                          reportes=reportes)
+                          **contexto)
 
 
 @app.route('/usuario/<int:usuario_id>/dispositivo/<int:dispositivo_id>/editar', methods=['GET', 'POST'])
 def editar_dispositivo(usuario_id, dispositivo_id):
-    usuario = db.session.get(Usuario, usuario_id)
+    contexto = _contexto_dashboard(usuario_id)
+    if not contexto:
+        flash('Usuario no encontrado', 'danger')
+        return redirect(url_for('lista_usuarios'))
+    
+    # Ya está en el mapa de identidad si pertenece al usuario (joinedload)
     dispositivo = db.session.get(Dispositivo, dispositivo_id)
     
-    if dispositivo.usuario_id != usuario_id:
+    if not dispositivo or dispositivo.usuario_id != usuario_id:
         flash('No tienes permiso para editar este dispositivo', 'danger')
         return redirect(url_for('dashboard', usuario_id=usuario_id))
-    
-    dispositivos = usuario.dispositivos
-    consumos = usuario.consumos
-    reportes = usuario.reportes
-    
-    total_dispositivos = len(dispositivos)
-    consumo_total = sum(d.consumo_bimestral_kwh() for d in dispositivos) if dispositivos else 0
-    ultimo_consumo = consumos[-1] if consumos else None
-    ultimo_reporte = reportes[-1] if reportes else None
 
     form = DispositivoForm(obj=dispositivo)
     
@@ -176,17 +240,11 @@ def editar_dispositivo(usuario_id, dispositivo_id):
         return redirect(url_for('dashboard', usuario_id=usuario_id))
     
     return render_template('dashboard.html', 
-                          usuario=usuario, 
                           form=form, 
                           dispositivo=dispositivo, 
                           modal_active=True, 
                           modo_edicion=True,
-                          dispositivos=dispositivos,
-                          total_dispositivos=total_dispositivos,
-                          consumo_total=consumo_total,
-                          ultimo_consumo=ultimo_consumo,
-                          ultimo_reporte=ultimo_reporte,
-                          reportes=reportes)
+                          **contexto)
 
 
 @app.route('/usuario/<int:usuario_id>/dispositivo/<int:dispositivo_id>/eliminar', methods=['POST'])
@@ -208,16 +266,10 @@ def eliminar_dispositivo(usuario_id, dispositivo_id):
 
 @app.route('/usuario/<int:usuario_id>/consumo/agregar', methods=['GET', 'POST'])
 def agregar_consumo(usuario_id):
-    usuario = db.session.get(Usuario, usuario_id)
-    
-    dispositivos = usuario.dispositivos
-    consumos = usuario.consumos
-    reportes = usuario.reportes
-    
-    total_dispositivos = len(dispositivos)
-    consumo_total = sum(d.consumo_bimestral_kwh() for d in dispositivos) if dispositivos else 0
-    ultimo_consumo = consumos[-1] if consumos else None
-    ultimo_reporte = reportes[-1] if reportes else None
+    contexto = _contexto_dashboard(usuario_id)
+    if not contexto:
+        flash('Usuario no encontrado', 'danger')
+        return redirect(url_for('lista_usuarios'))
 
     form = ConsumoBimestralForm()
     
@@ -237,15 +289,51 @@ def agregar_consumo(usuario_id):
         return redirect(url_for('dashboard', usuario_id=usuario_id))
     
     return render_template('dashboard.html', 
-                          usuario=usuario, 
                           form=form, 
                           modal_consumo_active=True,
-                          dispositivos=dispositivos,
-                          total_dispositivos=total_dispositivos,
-                          consumo_total=consumo_total,
-                          ultimo_consumo=ultimo_consumo,
-                          ultimo_reporte=ultimo_reporte,
-                          reportes=reportes)
+                          **contexto)
+
+
+def _analisis_usuario(usuario):
+    """
+    Cálculos comunes de análisis, PDF y gráficas
+    
+    Returns:
+        tuple: (optimizador, consumo por dispositivo, configuración óptima, ahorro total)
+    """
+    # Tarifa promedio
+    tarifa_kwh = 1.5
+    ultimo_consumo = consultas_dashboard.ultimo_consumo(usuario.id, db.session)
+    if ultimo_consumo:
+        tarifa_kwh = ultimo_consumo.costo_por_kwh()
+    
+    optimizador = OptimizadorEnergetico(usuario.dispositivos, tarifa_kwh)
+    consumo_por_dispositivo = optimizador.calcular_consumo_por_dispositivo()
+    configuracion_optima = cache_optimizacion.obtener(optimizador,
+                                                      restriccion_ahorro=app.config['OBJETIVO_AHORRO_DEFAULT'],
+                                                      usuario_id=usuario.id)
+    ahorro_total = optimizador.calcular_ahorro_total(configuracion_optima)
+    return optimizador, consumo_por_dispositivo, configuracion_optima, ahorro_total
+
+
+# Gráficas servidas por URL: tipo de GeneradorGraficas -> sus argumentos
+# a partir de (consumo por dispositivo, configuración óptima, ahorro total)
+GRAFICAS_USUARIO = {
+    'consumo_por_dispositivo': lambda consumo, configuracion, ahorro: (consumo,),
+    'pie_distribucion': lambda consumo, configuracion, ahorro: (consumo,),
+    'comparativa_antes_despues': lambda consumo, configuracion, ahorro: (ahorro,),
+    'costo_por_dispositivo': lambda consumo, configuracion, ahorro: (consumo,),
+    'ahorro_por_dispositivo': lambda consumo, configuracion, ahorro: (configuracion,),
+    'dashboard_completo': lambda consumo, configuracion, ahorro: (consumo, ahorro, configuracion)
+}
+# json: solo los datos (GeneradorGraficas.datos_<tipo>) para dibujar en el navegador
+FORMATOS_GRAFICA = {'png': 'image/png', 'svg': 'image/svg+xml', 'json': 'application/json'}
+CACHE_GRAFICA_INMUTABLE = 365 * 24 * 3600  # segundos
+
+
+def _url_grafica(usuario_id, tipo, llave, formato='png'):
+    """URL de la gráfica con su llave: si los datos cambian, cambia la URL"""
+    return url_for('grafica_usuario', usuario_id=usuario_id, tipo=tipo, formato=formato, v=llave)
 
 
 @app.route('/usuario/<int:usuario_id>/analizar')
@@ -258,24 +346,27 @@ def analizar_consumo(usuario_id):
         flash('Debe agregar al menos un dispositivo para realizar el análisis', 'warning')
         return redirect(url_for('dashboard', usuario_id=usuario_id))
     
-    # Tarifa promedio
-    tarifa_kwh = 1.5
-    ultimo_consumo = usuario.consumos[-1] if usuario.consumos else None
-    if ultimo_consumo:
-        tarifa_kwh = ultimo_consumo.costo_por_kwh()
-    
     # Realizar cálculos
-    optimizador = OptimizadorEnergetico(dispositivos, tarifa_kwh)
-    consumo_por_dispositivo = optimizador.calcular_consumo_por_dispositivo()
-    configuracion_optima = optimizador.encontrar_punto_optimo(restriccion_ahorro=0.20)
-    ahorro_total = optimizador.calcular_ahorro_total(configuracion_optima)
+    optimizador, consumo_por_dispositivo, configuracion_optima, ahorro_total = _analisis_usuario(usuario)
     proyeccion = optimizador.proyectar_consumo(dias=30)
-    
-    # Generar gráficas
-    gen_graficas = GeneradorGraficas()
-    grafica_barras = gen_graficas.grafica_consumo_por_dispositivo(consumo_por_dispositivo)
-    grafica_pie = gen_graficas.grafica_pie_distribucion(consumo_por_dispositivo)
-    grafica_comparativa = gen_graficas.grafica_comparativa_antes_despues(ahorro_total)
+    frontera_ahorro = optimizador.frontera_ahorro(
+        [float(valor) for valor, _ in GenerarReporteForm.OPCIONES_AHORRO]
+    )
+    programacion = ProgramadorCargas().programar(dispositivos)
+    holgura = resumen_usuarios.holgura_optimizador(usuario_id, db.session, app.config['OBJETIVO_AHORRO_DEFAULT'])
+    
+    # URLs de las gráficas: el navegador pide los datos (JSON) y las dibuja;
+    # la imagen PNG queda de respaldo. Aquí solo se calcula el hash de sus datos
+    graficas = {}
+    for formato in ('json', 'png'):
+        gen_graficas = GeneradorGraficas(formato=formato)
+        graficas[formato] = {
+            nombre: _url_grafica(usuario_id, tipo, gen_graficas.preparar(
+                tipo, *GRAFICAS_USUARIO[tipo](consumo_por_dispositivo, configuracion_optima, ahorro_total)
+            )[0], formato)
+            for nombre, tipo in (('barras', 'consumo_por_dispositivo'), ('pie', 'pie_distribucion'),
+                                 ('comparativa', 'comparativa_antes_despues'))
+        }
     
     # Generar recomendaciones
     gen_recomendaciones = GeneradorRecomendaciones(dispositivos, configuracion_optima)
@@ -289,11 +380,55 @@ def analizar_consumo(usuario_id):
                           consumo_por_dispositivo=consumo_por_dispositivo,
                           configuracion_optima=configuracion_optima,
                           ahorro_total=ahorro_total,
+                          frontera_ahorro=frontera_ahorro,
+                          holgura=holgura,
+                          objetivo_ahorro=app.config['OBJETIVO_AHORRO_DEFAULT'],
+                          programacion=programacion,
                           recomendaciones=recomendaciones,
                           impacto_ambiental=impacto_ambiental,
-                          grafica_barras=grafica_barras,
-                          grafica_pie=grafica_pie,
-                          grafica_comparativa=grafica_comparativa)
+                          grafica_barras=graficas['png']['barras'],
+                          grafica_pie=graficas['png']['pie'],
+                          grafica_comparativa=graficas['png']['comparativa'],
+                          datos_barras=graficas['json']['barras'],
+                          datos_pie=graficas['json']['pie'],
+                          datos_comparativa=graficas['json']['comparativa'])
+
+
+@app.route('/usuario/<int:usuario_id>/grafica/<tipo>.<formato>')
+def grafica_usuario(usuario_id, tipo, formato):
+    """
+    Imagen PNG o SVG de una gráfica del análisis, o sus datos en JSON
+    
+    El ETag es la llave de la imagen (hash de sus datos), así que se
+    responde 304 sin dibujar nada si el navegador ya la tiene. Pedida
+    con ?v=<llave> vigente la respuesta es inmutable por un año. El JSON
+    nunca usa matplotlib.
+    """
+    if tipo not in GRAFICAS_USUARIO or formato not in FORMATOS_GRAFICA:
+        abort(404)
+    usuario = Usuario.query.get_or_404(usuario_id)
+    if not usuario.dispositivos:
+        abort(404)
+    
+    _, consumo_por_dispositivo, configuracion_optima, ahorro_total = _analisis_usuario(usuario)
+    gen_graficas = GeneradorGraficas(cache=cache_graficas, formato=formato)
+    argumentos = GRAFICAS_USUARIO[tipo](consumo_por_dispositivo, configuracion_optima, ahorro_total)
+    llave, datos = gen_graficas.preparar(tipo, *argumentos)
+    
+    if llave in request.if_none_match:
+        respuesta = Response(status=304)
+    elif formato == 'json':
+        respuesta = jsonify(getattr(gen_graficas, f'datos_{tipo}')(*argumentos))
+    else:
+        respuesta = Response(gen_graficas.imagen(tipo, datos), mimetype=FORMATOS_GRAFICA[formato])
+    respuesta.set_etag(llave)
+    respuesta.cache_control.private = True
+    if request.args.get('v') == llave:
+        respuesta.cache_control.max_age = CACHE_GRAFICA_INMUTABLE
+        respuesta.cache_control.immutable = True
+    else:
+        respuesta.cache_control.no_cache = True
+    return respuesta
 
 
 @app.route('/usuario/<int:usuario_id>/generar-pdf')
@@ -306,33 +441,26 @@ def generar_pdf(usuario_id):
         flash('Debe agregar al menos un dispositivo para generar el reporte', 'warning')
         return redirect(url_for('dashboard', usuario_id=usuario_id))
     
-    # Tarifa promedio
-    tarifa_kwh = 1.5
-    ultimo_consumo = usuario.consumos[-1] if usuario.consumos else None
-    if ultimo_consumo:
-        tarifa_kwh = ultimo_consumo.costo_por_kwh()
-    
     # Realizar cálculos
-    optimizador = OptimizadorEnergetico(dispositivos, tarifa_kwh)
-    consumo_por_dispositivo = optimizador.calcular_consumo_por_dispositivo()
-    configuracion_optima = optimizador.encontrar_punto_optimo(restriccion_ahorro=0.20)
-    ahorro_total = optimizador.calcular_ahorro_total(configuracion_optima)
+    _, consumo_por_dispositivo, configuracion_optima, ahorro_total = _analisis_usuario(usuario)
     
     # Generar recomendaciones
     gen_recomendaciones = GeneradorRecomendaciones(dispositivos, configuracion_optima)
     recomendaciones = gen_recomendaciones.generar_recomendaciones_personalizadas()
+    programacion = ProgramadorCargas().programar(dispositivos)
     
     # Generar PDF
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     nombre_archivo = f'reporte_{usuario.nombre_usuario}_{timestamp}.pdf'
-    ruta_completa = os.path.join(app.config['UPLOAD_FOLDER'], nombre_archivo)
+    archivo_pdf, ruta_completa = retencion_reportes.ruta_nueva(nombre_archivo)
     
     generador_pdf = GeneradorPDF(
         usuario,
         consumo_por_dispositivo,
         configuracion_optima,
         ahorro_total,
-        recomendaciones
+        recomendaciones,
+        programacion=programacion
     )
     
     generador_pdf.generar_reporte(ruta_completa)
@@ -344,7 +472,7 @@ def generar_pdf(usuario_id):
         consumo_optimizado_kwh=ahorro_total['consumo_optimizado_kwh'],
         ahorro_kwh=ahorro_total['ahorro_kwh'],
         ahorro_pesos=ahorro_total['ahorro_pesos'],
-        archivo_pdf=nombre_archivo
+        archivo_pdf=archivo_pdf
     )
     
     db.session.add(nuevo_reporte)
@@ -354,14 +482,187 @@ def generar_pdf(usuario_id):
     return send_file(ruta_completa, as_attachment=True, download_name=nombre_archivo)
 
 
+@app.route('/usuario/<int:usuario_id>/reporte/<int:reporte_id>/pdf')
+def descargar_reporte(usuario_id, reporte_id):
+    """PDF de un reporte, vigente o descomprimido del archivo"""
+    reporte = db.session.get(Reporte, reporte_id)
+    if not reporte or reporte.usuario_id != usuario_id:
+        abort(404)
+    archivo = retencion_reportes.abrir_pdf(reporte.archivo_pdf)
+    if archivo is None:
+        abort(404)
+    return send_file(archivo, mimetype='application/pdf',
+                     download_name=os.path.basename(reporte.archivo_pdf))
+
+
+def _importador(tamano_lote=TAMANO_LOTE):
+    """ImportadorCSV con los rangos típicos por tipo de Config"""
+    return ImportadorCSV(db.session, resumen=resumen_usuarios, cache=cache_optimizacion,
+                         tamano_lote=tamano_lote,
+                         rangos_potencia=app.config['RANGOS_POTENCIA'],
+                         horas_tipicas=app.config['HORAS_USO_TIPICAS'])
+
+
+@app.route('/importar/<tipo>', methods=['POST'])
+def importar_csv(tipo):
+    """Importación masiva de dispositivos o recibos desde un CSV (campo 'archivo')"""
+    if tipo not in COLUMNAS:
+        abort(404)
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename.lower().endswith('.csv'):
+        return jsonify({'error': 'Debe enviar un archivo .csv en el campo "archivo"'}), 400
+    
+    importador = _importador()
+    try:
+        reporte = importador.importar(archivo.stream, tipo)
+    except ValueError as e:
+        # Encabezado o tipo inválido: todavía no se importó nada
+        return jsonify({'error': str(e)}), 400
+    
+    # ?formato=csv regresa solo el reporte de errores por fila
+    if request.args.get('formato') == 'csv':
+        salida = io.StringIO()
+        ImportadorCSV.escribir_errores(reporte, salida)
+        return Response(salida.getvalue(), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename=errores_{tipo}.csv'})
+    return jsonify(reporte)
+
+
+@app.cli.command('importar-csv')
+@click.argument('tipo', type=click.Choice(list(COLUMNAS)))
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', default=TAMANO_LOTE, show_default=True, help='Filas por transacción')
+@click.option('--errores', 'ruta_errores', type=click.Path(dir_okay=False),
+              help='Archivo CSV donde escribir las filas rechazadas')
+def importar_csv_comando(tipo, ruta, lote, ruta_errores):
+    """Importa dispositivos o consumos desde un CSV grande"""
+    importador = _importador(tamano_lote=lote)
+    # En binario: el importador decodifica línea por línea
+    with open(ruta, 'rb') as archivo:
+        reporte = importador.importar(archivo, tipo)
+    
+    click.echo(f"{reporte['filas']} filas: {reporte['importadas']} importadas, "
+               f"{reporte['rechazadas']} rechazadas, {len(reporte['advertencias'])} con advertencias "
+               f"({reporte['usuarios']} usuarios)")
+    if reporte['detenido']:
+        click.echo(f"Importación detenida en la línea {reporte['detenido']['fila']}: "
+                   f"{reporte['detenido']['error']}", err=True)
+    if ruta_errores:
+        with open(ruta_errores, 'w', newline='', encoding='utf-8') as salida:
+            ImportadorCSV.escribir_errores(reporte, salida)
+        click.echo(f'Reporte de errores: {ruta_errores}')
+
+
+@app.route('/exportar/<tabla>.<formato>')
+def exportar_datos(tabla, formato):
+    """Descarga en streaming de dispositivos, consumos o reportes (CSV, Parquet o Arrow)"""
+    if tabla not in TABLAS or formato not in FORMATOS:
+        abort(404)
+    if not ExportadorDatos.formato_disponible(formato):
+        return jsonify({'error': f'El formato {formato} requiere pyarrow'}), 400
+    
+    usuario_id = request.args.get('usuario_id', type=int)
+    calculadas = request.args.get('calculadas', '1') != '0'
+    contenido = ExportadorDatos(db.session).exportar(tabla, formato, usuario_id, calculadas)
+    
+    nombre = f'{tabla}_usuario_{usuario_id}.{formato}' if usuario_id else f'{tabla}.{formato}'
+    return Response(stream_with_context(contenido), mimetype=FORMATOS[formato],
+                    headers={'Content-Disposition': f'attachment; filename={nombre}'})
+
+
+@app.cli.command('exportar')
+@click.argument('tabla', type=click.Choice(list(TABLAS)))
+@click.argument('ruta', type=click.Path(dir_okay=False))
+@click.option('--formato', type=click.Choice(list(FORMATOS)), default='csv', show_default=True)
+@click.option('--usuario-id', type=int, help='Solo las filas de este usuario')
+@click.option('--calculadas/--sin-calculadas', default=True, show_default=True,
+              help='Incluir columnas calculadas (kWh, costo por kWh, % de ahorro)')
+@click.option('--lote', default=TAMANO_LOTE, show_default=True, help='Filas por lote')
+def exportar_comando(tabla, ruta, formato, usuario_id, calculadas, lote):
+    """Exporta dispositivos, consumos o reportes sin cargar la tabla en memoria"""
+    try:
+        contenido = ExportadorDatos(db.session, tamano_lote=lote).exportar(tabla, formato, usuario_id, calculadas)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    
+    if formato == 'csv':
+        archivo = open(ruta, 'w', encoding='utf-8', newline='')
+    else:
+        archivo = open(ruta, 'wb')
+    with archivo:
+        for pedazo in contenido:
+            archivo.write(pedazo)
+    click.echo(f'{tabla} exportado a {ruta}')
+
+
+@app.cli.command('retencion-lecturas')
+@click.option('--dias-maximos', type=int, help='Borrar las lecturas con más de estos días')
+def retencion_lecturas_comando(dias_maximos):
+    """Compacta las lecturas de medidor antiguas (horaria tras 90 días, diaria tras 2 años)"""
+    resultado = almacen_series.aplicar_retencion(db.session, dias_maximos=dias_maximos)
+    for resolucion, bloques in resultado['compactados'].items():
+        click.echo(f'{bloques} días compactados a {resolucion} min')
+    click.echo(f"{resultado['eliminados']} días eliminados")
+
+
+@app.cli.command('exportar-lecturas')
+@click.argument('inicio')
+@click.argument('fin')
+@click.option('--usuario-id', 'usuario_ids', type=int, multiple=True, help='Solo estos usuarios')
+def exportar_lecturas_comando(inicio, fin, usuario_ids):
+    """Genera los archivos columnares (memmap) de lecturas de [INICIO, FIN) por usuario"""
+    try:
+        rutas = cache_columnar.exportar_flota(db.session, inicio, fin, usuario_ids or None)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for ruta in rutas.values():
+        click.echo(ruta)
+    click.echo(f'{len(rutas)} usuarios exportados a {cache_columnar.carpeta}')
+
+
+@app.cli.command('retencion-reportes')
+@click.option('--conservar', type=int, help='Reportes completos por usuario (los anteriores se resumen por año)')
+@click.option('--dias-archivo', type=int, help='Archivar PDFs con más de estos días')
+@click.option('--cuota-mb', type=int, help='Tamaño máximo del archivo de PDFs')
+def retencion_reportes_comando(conservar, dias_archivo, cuota_mb):
+    """Compacta reportes antiguos, archiva sus PDFs y aplica la cuota de disco"""
+    if conservar is not None:
+        if conservar < 1:
+            raise click.BadParameter('Debe ser al menos 1', param_hint='--conservar')
+        retencion_reportes.conservar = conservar
+    if dias_archivo is not None:
+        retencion_reportes.dias_archivo = dias_archivo
+    if cuota_mb is not None:
+        retencion_reportes.cuota_mb = cuota_mb
+    
+    resultado = retencion_reportes.aplicar(db.session)
+    click.echo(f"{resultado['compactados']} reportes compactados en resúmenes anuales")
+    click.echo(f"{resultado['archivados']} PDFs archivados en {retencion_reportes.carpeta_archivo}")
+    click.echo(f"{resultado['cuota']['archivos']} PDFs eliminados por cuota "
+               f"({resultado['cuota']['bytes'] / 1024 / 1024:.1f} MB)")
+
+
+@app.route('/usuario/<int:usuario_id>/recibos')
+def ver_consumos(usuario_id):
+    """Ver historial completo de recibos"""
+    contexto = _contexto_dashboard(usuario_id)
+    if not contexto:
+        abort(404)
+    contexto['consumos'] = consultas_dashboard.consumos_recientes(usuario_id, db.session, limite=None)
+    contexto['mas_consumos'] = False
+    
+    return render_template('dashboard.html', **contexto)
+
+
 @app.route('/usuario/<int:usuario_id>/reportes')
 def ver_reportes(usuario_id):
     """Ver historial de reportes"""
-    usuario = Usuario.query.get_or_404(usuario_id)
-    reportes = usuario.reportes
+    contexto = _contexto_dashboard(usuario_id)
+    if not contexto:
+        abort(404)
+    contexto['reportes'] = consultas_dashboard.reportes_recientes(usuario_id, db.session, limite=None)
     
-    return render_template('dashboard.html', usuario=usuario, reportes=reportes, 
-                          mostrar_reportes=True)
+    return render_template('dashboard.html', mostrar_reportes=True, **contexto)
 
 
 @app.errorhandler(404)
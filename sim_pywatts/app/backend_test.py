@@ -8,6 +8,8 @@ import os
 
 # Asegurar que se puedan importar los módulos
 sys.path.insert(0, os.path.dirname(__file__))
+# config.py vive en la raíz del repositorio, como en app.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from flask import Flask
 from models import db, Usuario, Dispositivo, ConsumoBimestral, Reporte
@@ -15,8 +17,18 @@ from services.calculations import OptimizadorEnergetico
 from services.recommendations import GeneradorRecomendaciones
 from services.charts import GeneradorGraficas
 from services.pdf_generator import GeneradorPDF
+from services.importacion import ImportadorCSV
+from services.series import AlmacenSeries
+from services.columnar import CacheColumnar
+from services.tarifas import motor_tarifario
+from services.simulacion import simulador_horario, SimuladorCargaHoraria
+from services.programador import ProgramadorCargas
+from models import BloqueLecturas
+from config import Config
 from datetime import datetime, timedelta
+import io
 import json
+import tempfile
 
 # Configurar Flask y DB
 app = Flask(__name__)
@@ -30,6 +42,11 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db.init_app(app)
 
+# Los servicios leen sus parámetros de Config (app.py hace lo mismo)
+motor_tarifario.configurar(Config)
+OptimizadorEnergetico.configurar(Config)
+simulador_horario.configurar(Config)
+
 def print_seccion(titulo):
     """Imprime un separador visual"""
     print("\n" + "="*80)
@@ -238,11 +255,21 @@ def test_calculos_optimizacion(usuario_id):
         
         print(f"Primeros 5 días:")
         for i, dia in enumerate(proyeccion[:5], 1):
-            print(f"  Día {i} ({dia['fecha']}): {dia['consumo_kwh']:.2f} kWh - ${dia['costo']:.2f}")
+            print(f"  Día {i} ({dia['fecha']}): {dia['consumo_kwh']:.2f} kWh - ${dia['costo']:.2f}"
+                  f" (precios horarios: ${dia['costo_horario']:.2f})")
         
         consumo_promedio = sum(d['consumo_kwh'] for d in proyeccion) / len(proyeccion)
         print(f"\nPromedio proyectado: {consumo_promedio:.2f} kWh/día")
         
+        # Los fines de semana todo el día es horario base: el kWh sale más barato
+        precio_kwh = {}
+        for dia in proyeccion:
+            fin_semana = datetime.strptime(dia['fecha'], '%Y-%m-%d').weekday() >= 5
+            precio_kwh.setdefault(fin_semana, []).append(dia['costo_horario'] / dia['consumo_kwh'])
+        assert max(precio_kwh[True]) < min(precio_kwh[False]), "El fin de semana debería costar menos por kWh"
+        print(f"✅ Precio horario promedio: ${sum(precio_kwh[False]) / len(precio_kwh[False]):.2f}/kWh entre semana, "
+              f"${sum(precio_kwh[True]) / len(precio_kwh[True]):.2f}/kWh en fin de semana")
+        
         # Rango de cobro
         print(f"\n💵 ESTIMACIÓN DE COBRO BIMESTRAL")
         print(f"{'='*60}")
@@ -343,6 +370,8 @@ def test_recomendaciones(usuario_id, configuracion_optima, ahorro_total):
                 print(f"  Dispositivos: {', '.join(info['dispositivos_recomendados'])}")
             if 'ahorro_estimado' in info:
                 print(f"  Ahorro estimado: {info['ahorro_estimado']}")
+            if 'porcentaje_consumo' in info:
+                print(f"  Consumo semanal: {info['consumo_kwh']:.2f} kWh ({info['porcentaje_consumo']:.1f}%) - ${info['costo']:.2f}")
 
 def test_graficas(usuario_id):
     """Prueba 6: Generación de Gráficas"""
@@ -473,6 +502,129 @@ def test_consumo_bimestral(usuario_id):
         print(f"  Costo total: ${consumo.costo_total:.2f} MXN")
         print(f"  Costo por kWh: ${consumo.costo_por_kwh():.2f} MXN")
 
+def test_importacion_csv(usuario_id):
+    """Prueba 9: Importación de dispositivos desde CSV"""
+    print_seccion("PRUEBA 9: Importación de Dispositivos desde CSV")
+    
+    contenido = (
+        "usuario_id,nombre,tipo,potencia_watts,horas_uso_dia\n"
+        f"{usuario_id},Ventilador CSV,ventilador,80,6\n"
+        f"{usuario_id}.7,Ventilador decimal,ventilador,80,6\n"
+        "abc,Ventilador texto,ventilador,80,6\n"
+        f"{usuario_id}.0,Ventilador entero,ventilador,80,6\n"
+    )
+    
+    with app.app_context():
+        antes = Dispositivo.query.filter_by(usuario_id=usuario_id).count()
+        reporte = ImportadorCSV(db.session).importar(io.StringIO(contenido), 'dispositivos')
+        despues = Dispositivo.query.filter_by(usuario_id=usuario_id).count()
+        
+        print(f"✓ Filas leídas: {reporte['filas']}, importadas: {reporte['importadas']}, "
+              f"rechazadas: {reporte['rechazadas']}")
+        for error in reporte['errores']:
+            print(f"  Fila {error['fila']}: {', '.join(error['errores'])}")
+        
+        # "1.7" no debe importarse como el usuario 1
+        assert reporte['importadas'] == 2 and despues == antes + 2, reporte
+        assert [e['fila'] for e in reporte['errores']] == [3, 4], reporte['errores']
+        assert all(e['errores'] == ['usuario_id inválido'] for e in reporte['errores']), reporte['errores']
+        print("✓ usuario_id no enteros rechazados con 'usuario_id inválido'")
+        
+        # Un byte que no es UTF-8 en la línea 5: los lotes anteriores quedan
+        # importados y el reporte dice dónde se detuvo
+        crudo = (
+            "usuario_id,nombre,tipo,potencia_watts,horas_uso_dia\n"
+            f"{usuario_id},Ventilador A,ventilador,80,6\n"
+            f"{usuario_id},Ventilador B,ventilador,80,6\n"
+            f"{usuario_id},Ventilador C,ventilador,80,6\n"
+        ).encode('utf-8') + f"{usuario_id},Ventilador \xd1,ventilador,80,6\n".encode('latin-1')
+        antes = Dispositivo.query.filter_by(usuario_id=usuario_id).count()
+        reporte = ImportadorCSV(db.session, tamano_lote=2).importar(io.BytesIO(crudo), 'dispositivos')
+        despues = Dispositivo.query.filter_by(usuario_id=usuario_id).count()
+        
+        print(f"✓ Importación detenida: {reporte['detenido']}, importadas: {reporte['importadas']}")
+        assert reporte['detenido'] and reporte['detenido']['fila'] == 5, reporte
+        assert reporte['importadas'] == 3 and despues == antes + 3, reporte
+
+def test_series_compactadas(usuario_id):
+    """Prueba 10: Lecturas nuevas en un día ya compactado"""
+    print_seccion("PRUEBA 10: Lecturas en un Día Compactado")
+    
+    almacen = AlmacenSeries(resolucion_min=15)
+    dia = datetime(2020, 1, 15)
+    tiempos = [dia + timedelta(minutes=15 * i) for i in range(96)]
+    
+    with app.app_context():
+        # 24 kWh en intervalos de 15 min, compactados a una hora (1 kWh por hora)
+        almacen.guardar(db.session, usuario_id, tiempos, [0.25] * 96)
+        db.session.commit()
+        almacen.compactar(db.session, dia + timedelta(days=1), 60, usuario_id=usuario_id)
+        
+        # Una lectura más de 0.5 kWh a las 10:15 se suma a la hora 10
+        almacen.guardar(db.session, usuario_id, [dia + timedelta(hours=10, minutes=15)], [0.5])
+        db.session.commit()
+        
+        bloque = db.session.scalars(
+            db.select(BloqueLecturas).filter_by(usuario_id=usuario_id, dia=dia.date())
+        ).one()
+        serie = almacen.rango(db.session, usuario_id, dia, dia + timedelta(days=1))
+        
+        print(f"✓ Resolución del día: {bloque.resolucion_min} min")
+        print(f"  Hora 10: {serie['kwh'][10]:.2f} kWh")
+        print(f"  Total del día: {bloque.total_kwh:.2f} kWh")
+        
+        assert bloque.resolucion_min == 60, bloque.resolucion_min
+        assert abs(serie['kwh'][10] - 1.5) < 1e-6, serie['kwh'][10]
+        assert abs(bloque.total_kwh - 24.5) < 1e-6, bloque.total_kwh
+        print("✓ La lectura se sumó al intervalo compactado")
+
+def test_programacion_horas_recortadas():
+    """Prueba 11: Dispositivo con más horas de uso que su ventana permitida"""
+    print_seccion("PRUEBA 11: Programación con Horas Fuera de Ventana")
+    
+    # Precios iguales en todas las ventanas: desplazar no ahorra nada, así
+    # que cualquier ahorro reportado vendría de horas recortadas
+    simulador = SimuladorCargaHoraria(perfiles=Config.PERFILES_USO,
+                                      precios={'base': 1.0, 'intermedio': 1.0, 'punta': 1.0})
+    # La lavadora solo puede usarse de 07:00 a 23:00 (16 horas)
+    lavadora = Dispositivo(nombre='Lavadora', tipo='lavadora', potencia_watts=1000, horas_uso_dia=20)
+    programacion = ProgramadorCargas(simulador=simulador).programar([lavadora])
+    disp = programacion['dispositivos'][0]
+    
+    print(f"✓ Horas programadas: {disp['horas_uso_dia']} h, recortadas: {disp['horas_recortadas']} h")
+    print(f"  Costo actual: ${programacion['costo_actual']:.2f}, programado: ${programacion['costo_programado']:.2f}")
+    
+    assert disp['horas_uso_dia'] == 16, disp['horas_uso_dia']
+    assert disp['horas_recortadas'] == 4, disp['horas_recortadas']
+    assert abs(sum(disp['uso_por_hora']) - 16) < 1e-3, sum(disp['uso_por_hora'])
+    assert abs(programacion['costo_actual'] - 16) < 1e-6, programacion['costo_actual']
+    assert abs(programacion['ahorro_diario']) < 1e-6, programacion['ahorro_diario']
+    print("✓ Las horas recortadas no se reportan como ahorro")
+
+def test_columnar_lecturas_reescritas(usuario_id):
+    """Prueba 12: El archivo columnar se regenera si se reescriben lecturas"""
+    print_seccion("PRUEBA 12: Caché Columnar con Lecturas Reescritas")
+    
+    almacen = AlmacenSeries(resolucion_min=15)
+    cache = CacheColumnar(carpeta=tempfile.mkdtemp(), almacen=almacen)
+    dia = datetime(2020, 2, 1)
+    tiempos = [dia + timedelta(minutes=15 * i) for i in range(4)]
+    
+    with app.app_context():
+        almacen.guardar(db.session, usuario_id, tiempos, [0.25] * 4)
+        db.session.commit()
+        serie = cache.obtener(db.session, usuario_id, dia, dia + timedelta(days=1))
+        print(f"✓ Primer intervalo exportado: {serie.kwh[0]:.2f} kWh")
+        
+        # Mismo número de lecturas y mismo total del día, distinto reparto
+        almacen.guardar(db.session, usuario_id, tiempos[:2], [0.5, 0.0])
+        db.session.commit()
+        serie = cache.obtener(db.session, usuario_id, dia, dia + timedelta(days=1))
+        print(f"✓ Tras reescribir: {serie.kwh[0]:.2f} kWh y {serie.kwh[1]:.2f} kWh")
+        
+        assert abs(serie.kwh[0] - 0.5) < 1e-6 and abs(serie.kwh[1]) < 1e-6, serie.kwh[:4]
+        print("✓ El archivo se regeneró aunque el total del día no cambió")
+
 def main():
     """Ejecuta todas las pruebas"""
     print("\n")
@@ -506,6 +658,18 @@ def main():
         # Prueba 8: Consumo bimestral
         test_consumo_bimestral(usuario_id)
         
+        # Prueba 9: Importación CSV
+        test_importacion_csv(usuario_id)
+        
+        # Prueba 10: Series de lecturas
+        test_series_compactadas(usuario_id)
+        
+        # Prueba 11: Programación horaria
+        test_programacion_horas_recortadas()
+        
+        # Prueba 12: Caché columnar
+        test_columnar_lecturas_reescritas(usuario_id)
+        
         # Resumen final
         print_seccion("RESUMEN FINAL")
         print("✅ Todas las pruebas completadas exitosamente!")
@@ -0,0 +1,128 @@
+"""
+Benchmark de SQLite con N procesos concurrentes (como workers de gunicorn)
+Compara la configuración por defecto (journal DELETE) contra los pragmas
+de producción (SQLITE_PRAGMAS de config.py: WAL, synchronous=NORMAL, ...)
+con una mezcla de lecturas tipo dashboard y escrituras tipo generar_pdf
+"""
+
+import sys
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(__file__))
+# config.py vive en la raíz del repositorio
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from models import Usuario, Dispositivo, ConsumoBimestral, Reporte, ResumenUsuario
+from services.basedatos import escuchar_conexiones
+from config import Config
+
+WORKERS = [1, 4, 8]
+DURACION = 3.0  # segundos por corrida
+FRACCION_ESCRITURAS = 0.2
+N_USUARIOS = 500
+DISPOSITIVOS_POR_USUARIO = 10
+
+CONFIGURACIONES = {
+    'por defecto': None,
+    'WAL + pragmas': Config.SQLITE_PRAGMAS
+}
+
+TABLAS = [Usuario.__table__, Dispositivo.__table__, ConsumoBimestral.__table__,
+          Reporte.__table__, ResumenUsuario.__table__]
+
+
+def crear_engine(ruta, pragmas):
+    engine = create_engine(f'sqlite:///{ruta}')
+    if pragmas:
+        escuchar_conexiones(engine, pragmas)
+    return engine
+
+
+def poblar(ruta, pragmas):
+    """Base de datos sintética con N_USUARIOS y sus dispositivos"""
+    engine = crear_engine(ruta, pragmas)
+    Usuario.metadata.create_all(engine, tables=TABLAS)
+    with engine.begin() as conexion:
+        conexion.execute(insert(Usuario.__table__), [
+            {'id': i, 'nombre_usuario': f'usuario{i}', 'domicilio': f'Calle {i}'}
+            for i in range(1, N_USUARIOS + 1)
+        ])
+        conexion.execute(insert(Dispositivo.__table__), [
+            {'usuario_id': i, 'nombre': f'Dispositivo {j}', 'tipo': 'otro',
+             'potencia_watts': 100.0 + j, 'horas_uso_dia': 2.0}
+            for i in range(1, N_USUARIOS + 1) for j in range(DISPOSITIVOS_POR_USUARIO)
+        ])
+    engine.dispose()
+
+
+def trabajador(argumentos):
+    """Lecturas y escrituras durante DURACION; regresa (lecturas, escrituras, errores, latencias)"""
+    ruta, pragmas, semilla = argumentos
+    rng = random.Random(semilla)
+    engine = crear_engine(ruta, pragmas)
+    lecturas = escrituras = errores = 0
+    latencias = []
+
+    fin = time.perf_counter() + DURACION
+    while time.perf_counter() < fin:
+        usuario_id = rng.randint(1, N_USUARIOS)
+        inicio = time.perf_counter()
+        try:
+            if rng.random() < FRACCION_ESCRITURAS:
+                with engine.begin() as conexion:
+                    conexion.execute(insert(Reporte.__table__).values(
+                        usuario_id=usuario_id, consumo_actual_kwh=500.0, consumo_optimizado_kwh=400.0,
+                        ahorro_kwh=100.0, ahorro_pesos=150.0))
+                    conexion.execute(insert(ConsumoBimestral.__table__).values(
+                        usuario_id=usuario_id, periodo_inicio=date(2026, 1, 1), periodo_fin=date(2026, 3, 1),
+                        consumo_kwh=450.0, costo_total=600.0))
+                escrituras += 1
+            else:
+                with engine.connect() as conexion:
+                    conexion.execute(select(Dispositivo.__table__)
+                                     .where(Dispositivo.usuario_id == usuario_id)).all()
+                    conexion.execute(select(func.max(Reporte.id))
+                                     .where(Reporte.usuario_id == usuario_id)).scalar()
+                lecturas += 1
+            latencias.append(time.perf_counter() - inicio)
+        except OperationalError:
+            # "database is locked"
+            errores += 1
+
+    engine.dispose()
+    return lecturas, escrituras, errores, latencias
+
+
+def main():
+    print(f"{'Configuración':>14} {'Workers':>8} {'Lecturas/s':>11} {'Escrituras/s':>13} "
+          f"{'Errores':>8} {'p95 ms':>8}")
+    print("-" * 68)
+
+    for nombre, pragmas in CONFIGURACIONES.items():
+        for n_workers in WORKERS:
+            with tempfile.TemporaryDirectory() as directorio:
+                ruta = os.path.join(directorio, 'benchmark.db')
+                poblar(ruta, pragmas)
+                with Pool(n_workers) as pool:
+                    resultados = pool.map(trabajador, [(ruta, pragmas, i) for i in range(n_workers)])
+
+            lecturas = sum(r[0] for r in resultados)
+            escrituras = sum(r[1] for r in resultados)
+            errores = sum(r[2] for r in resultados)
+            latencias = np.concatenate([r[3] for r in resultados]) if lecturas + escrituras else np.zeros(1)
+            print(f"{nombre:>14} {n_workers:>8} {lecturas / DURACION:>11.0f} {escrituras / DURACION:>13.0f} "
+                  f"{errores:>8} {np.percentile(latencias, 95) * 1000:>8.2f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de GeneradorGraficas
+Compara cada gráfica creando su figura desde cero contra reutilizar la
+plantilla del hilo, verifica que varios hilos generen exactamente las
+mismas imágenes que un solo hilo y mide los aciertos de CacheGraficas
+"""
+
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from services.cache import CacheGraficas
+from services import charts
+from services.charts import GeneradorGraficas
+
+N_DISPOSITIVOS = 8
+REPETICIONES = 10
+HILOS = 4
+
+
+def crear_datos(semilla, n=N_DISPOSITIVOS):
+    """Entradas sintéticas con la forma de calcular_consumo_por_dispositivo y compañía"""
+    rng = np.random.default_rng(semilla)
+    consumos = rng.uniform(10, 300, n)
+    total = consumos.sum()
+    consumo_dispositivos = {
+        f'Dispositivo {i}': {
+            'consumo_bimestral_kwh': float(c),
+            'porcentaje': float(c / total * 100),
+            'costo_bimestral': float(c * 1.5)
+        }
+        for i, c in enumerate(consumos)
+    }
+    configuracion_optima = {
+        nombre: {'ahorro_kwh': float(rng.uniform(0, 30)), 'ahorro_pesos': float(rng.uniform(0, 50))}
+        for nombre in consumo_dispositivos
+    }
+    ahorro_total = {
+        'consumo_actual_kwh': float(total),
+        'consumo_optimizado_kwh': float(total * 0.8),
+        'ahorro_kwh': float(total * 0.2),
+        'porcentaje_ahorro': 20.0
+    }
+    return consumo_dispositivos, configuracion_optima, ahorro_total
+
+
+TIPOS = {
+    'barras': lambda g, c, o, a: g.grafica_consumo_por_dispositivo(c),
+    'pastel': lambda g, c, o, a: g.grafica_pie_distribucion(c),
+    'comparativa': lambda g, c, o, a: g.grafica_comparativa_antes_despues(a),
+    'dashboard': lambda g, c, o, a: g.grafica_dashboard_completo(c, a, o)
+}
+
+
+def graficas(generador, semilla):
+    """Las tres gráficas de la página de análisis más el dashboard completo"""
+    consumo_dispositivos, configuracion_optima, ahorro_total = crear_datos(semilla)
+    return [grafica(generador, consumo_dispositivos, configuracion_optima, ahorro_total)
+            for grafica in TIPOS.values()]
+
+
+def medir(grafica, generador, reutilizar):
+    """Mejor tiempo de REPETICIONES gráficas, con o sin plantillas previas"""
+    datos = crear_datos(0)
+    grafica(generador, *datos)
+    tiempos = []
+    for _ in range(REPETICIONES):
+        if not reutilizar:
+            charts._hilos.__dict__.clear()
+        inicio = time.perf_counter()
+        grafica(generador, *datos)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    generador = GeneradorGraficas()
+    n_graficas = len(TIPOS)
+
+    print(f"{'Gráfica':>12} {'nueva (ms)':>12} {'plantilla (ms)':>15} {'Aceleración':>12}")
+    for nombre, grafica in TIPOS.items():
+        nueva = medir(grafica, generador, reutilizar=False)
+        plantilla = medir(grafica, generador, reutilizar=True)
+        print(f"{nombre:>12} {nueva * 1000:>12.1f} {plantilla * 1000:>15.1f} {nueva / plantilla:>11.2f}x")
+
+    # Hilos: mismas imágenes que en serie
+    semillas = list(range(HILOS * 2))
+    en_serie = [graficas(generador, s) for s in semillas]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(HILOS) as ejecutor:
+        en_paralelo = list(ejecutor.map(lambda s: graficas(GeneradorGraficas(), s), semillas))
+    tiempo_hilos = time.perf_counter() - inicio
+    print(f"\n{len(semillas) * n_graficas} gráficas en {HILOS} hilos: {tiempo_hilos:.2f}s, "
+          f"imágenes iguales a las de un solo hilo: {en_serie == en_paralelo}")
+
+    # Caché: la segunda vuelta no usa matplotlib
+    cache = CacheGraficas(max_bytes_memoria=64 * 1024 * 1024, max_bytes_disco=0)
+    con_cache = GeneradorGraficas(cache=cache)
+    graficas(con_cache, 0)
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        graficas(con_cache, 0)
+    tiempo_cache = (time.perf_counter() - inicio) / (REPETICIONES * n_graficas)
+    estadisticas = cache.estadisticas()
+    print(f"\nCon CacheGraficas: {tiempo_cache * 1000:.3f} ms/gráfica, "
+          f"aciertos {estadisticas['aciertos_memoria']}, fallos {estadisticas['fallos']}")
+
+
+if __name__ == "__main__":
+    main()
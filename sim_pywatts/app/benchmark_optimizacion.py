@@ -0,0 +1,91 @@
+"""
+Benchmark de los métodos de optimización de OptimizadorEnergetico
+Compara el método cerrado (voraz), el lineal (HiGHS) y SLSQP,
+y el tiempo de optimizar_lote / optimizar_lote_arreglos contra un
+optimizador por hogar
+"""
+
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from services.calculations import OptimizadorEnergetico
+
+TAMANOS = [10, 100, 1000]
+N_HOGARES_LOTE = 2000
+METODOS = ['voraz', 'lineal', 'slsqp']
+RESTRICCION_AHORRO = 0.20
+
+
+def crear_dispositivos(n, semilla=0):
+    """Crea n dispositivos sintéticos con potencias y horas aleatorias"""
+    rng = np.random.default_rng(semilla)
+    potencias = rng.uniform(10, 3000, n)
+    horas = rng.uniform(0.5, 24, n)
+    return [
+        SimpleNamespace(nombre=f'Dispositivo {i}', potencia_watts=float(p), horas_uso_dia=float(h))
+        for i, (p, h) in enumerate(zip(potencias, horas))
+    ]
+
+
+def medir(optimizador, metodo, repeticiones):
+    """Regresa (segundos por llamada, configuración óptima)"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        configuracion = optimizador.encontrar_punto_optimo(RESTRICCION_AHORRO, metodo=metodo)
+    return (time.perf_counter() - inicio) / repeticiones, configuracion
+
+
+def main():
+    print(f"{'Dispositivos':>12} {'Método':>8} {'ms/llamada':>12} {'Aceleración':>12} {'Máx. dif. kWh':>14}")
+    print("-" * 62)
+
+    for n in TAMANOS:
+        optimizador = OptimizadorEnergetico(crear_dispositivos(n), 1.5)
+        tiempos = {}
+        configuraciones = {}
+        for metodo in METODOS:
+            repeticiones = 1 if metodo == 'slsqp' and n >= 1000 else 5
+            tiempos[metodo], configuraciones[metodo] = medir(optimizador, metodo, repeticiones)
+
+        referencia = configuraciones['slsqp']
+        for metodo in METODOS:
+            diferencia = max(
+                abs(configuraciones[metodo][nombre]['consumo_optimo_kwh'] - referencia[nombre]['consumo_optimo_kwh'])
+                for nombre in referencia
+            )
+            aceleracion = tiempos['slsqp'] / tiempos[metodo]
+            print(f"{n:>12} {metodo:>8} {tiempos[metodo] * 1000:>12.3f} {aceleracion:>11.1f}x {diferencia:>14.4f}")
+        print()
+
+    # Lote: un optimizador por hogar contra optimizar_lote
+    rng = np.random.default_rng(1)
+    hogares = [crear_dispositivos(int(n), semilla=i) for i, n in enumerate(rng.integers(1, 40, N_HOGARES_LOTE))]
+
+    inicio = time.perf_counter()
+    individuales = [OptimizadorEnergetico(h, 1.5).encontrar_punto_optimo(RESTRICCION_AHORRO) for h in hogares]
+    tiempo_individual = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lote = OptimizadorEnergetico.optimizar_lote(hogares, RESTRICCION_AHORRO, 1.5)
+    tiempo_lote = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    arreglos = OptimizadorEnergetico.optimizar_lote_arreglos(hogares, RESTRICCION_AHORRO, 1.5)
+    tiempo_arreglos = time.perf_counter() - inicio
+
+    ahorro_individual = np.array([sum(c['ahorro_kwh'] for c in config.values()) for config in individuales])
+    diferencia = np.abs(arreglos['ahorro_kwh'] - ahorro_individual).max()
+
+    print(f"Lote de {N_HOGARES_LOTE} hogares: individual {tiempo_individual:.3f}s")
+    print(f"  optimizar_lote (dicts)      {tiempo_lote:.3f}s ({tiempo_individual / tiempo_lote:.1f}x), "
+          f"resultados iguales: {individuales == lote}")
+    print(f"  optimizar_lote_arreglos     {tiempo_arreglos:.3f}s ({tiempo_individual / tiempo_arreglos:.1f}x), "
+          f"máx. dif. ahorro kWh (redondeo): {diferencia:.4f}")
+
+if __name__ == "__main__":
+    main()
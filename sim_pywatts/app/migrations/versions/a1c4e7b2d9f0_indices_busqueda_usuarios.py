@@ -0,0 +1,69 @@
+"""Índices para listado y búsqueda de usuarios
+
+Agrega el índice (fecha_registro, id) de usuarios para la paginación por
+llave, índices en cada llave foránea usuario_id y la tabla FTS5
+usuarios_fts (trigramas) con sus triggers. Las tablas ya existen (las crea
+db.create_all), así que todo se crea solo si no existe.
+
+Revision ID: a1c4e7b2d9f0
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e7b2d9f0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDICES = [
+    ('ix_usuarios_fecha_registro_id', 'usuarios', ['fecha_registro', 'id']),
+    ('ix_dispositivos_usuario_id', 'dispositivos', ['usuario_id']),
+    ('ix_consumos_bimestrales_usuario_id', 'consumos_bimestrales', ['usuario_id']),
+    ('ix_reportes_usuario_id', 'reportes', ['usuario_id']),
+]
+
+DDL_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS usuarios_fts USING fts5(
+        nombre_usuario, domicilio, content='usuarios', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS usuarios_fts_ai AFTER INSERT ON usuarios BEGIN
+        INSERT INTO usuarios_fts(rowid, nombre_usuario, domicilio)
+        VALUES (new.id, new.nombre_usuario, new.domicilio);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS usuarios_fts_ad AFTER DELETE ON usuarios BEGIN
+        INSERT INTO usuarios_fts(usuarios_fts, rowid, nombre_usuario, domicilio)
+        VALUES ('delete', old.id, old.nombre_usuario, old.domicilio);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS usuarios_fts_au AFTER UPDATE ON usuarios BEGIN
+        INSERT INTO usuarios_fts(usuarios_fts, rowid, nombre_usuario, domicilio)
+        VALUES ('delete', old.id, old.nombre_usuario, old.domicilio);
+        INSERT INTO usuarios_fts(rowid, nombre_usuario, domicilio)
+        VALUES (new.id, new.nombre_usuario, new.domicilio);
+    END""",
+    "INSERT INTO usuarios_fts(usuarios_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    for nombre, tabla, columnas in INDICES:
+        op.create_index(nombre, tabla, columnas, unique=False, if_not_exists=True)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for sentencia in DDL_FTS:
+            op.execute(sentencia)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('usuarios_fts_ai', 'usuarios_fts_ad', 'usuarios_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS usuarios_fts')
+
+    for nombre, tabla, _ in reversed(INDICES):
+        op.drop_index(nombre, table_name=tabla, if_exists=True)
@@ -0,0 +1,40 @@
+"""Tabla de lecturas de medidor por bloques diarios
+
+Revision ID: b7d2f5a8c3e1
+Revises: a1c4e7b2d9f0
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2f5a8c3e1'
+down_revision = 'a1c4e7b2d9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'bloques_lecturas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('resolucion_min', sa.Integer(), nullable=False),
+        sa.Column('valores', sa.LargeBinary(), nullable=False),
+        sa.Column('total_kwh', sa.Float(), nullable=False),
+        sa.Column('lecturas', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('usuario_id', 'dia', name='uq_bloques_lecturas_usuario_dia'),
+        if_not_exists=True
+    )
+    op.create_index('ix_bloques_lecturas_usuario_id', 'bloques_lecturas', ['usuario_id'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_bloques_lecturas_usuario_id', table_name='bloques_lecturas', if_exists=True)
+    op.drop_table('bloques_lecturas', if_exists=True)
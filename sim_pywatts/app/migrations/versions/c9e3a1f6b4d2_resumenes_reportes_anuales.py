@@ -0,0 +1,44 @@
+"""Resumen anual de reportes compactados
+
+Revision ID: c9e3a1f6b4d2
+Revises: b7d2f5a8c3e1
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e3a1f6b4d2'
+down_revision = 'b7d2f5a8c3e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'resumenes_reportes_anuales',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('anio', sa.Integer(), nullable=False),
+        sa.Column('reportes', sa.Integer(), nullable=False),
+        sa.Column('consumo_actual_kwh', sa.Float(), nullable=False),
+        sa.Column('consumo_optimizado_kwh', sa.Float(), nullable=False),
+        sa.Column('ahorro_kwh', sa.Float(), nullable=False),
+        sa.Column('ahorro_pesos', sa.Float(), nullable=False),
+        sa.Column('primera_fecha', sa.DateTime(), nullable=True),
+        sa.Column('ultima_fecha', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('usuario_id', 'anio', name='uq_resumenes_reportes_usuario_anio'),
+        if_not_exists=True
+    )
+    op.create_index('ix_resumenes_reportes_anuales_usuario_id', 'resumenes_reportes_anuales', ['usuario_id'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_resumenes_reportes_anuales_usuario_id', table_name='resumenes_reportes_anuales',
+                  if_exists=True)
+    op.drop_table('resumenes_reportes_anuales', if_exists=True)
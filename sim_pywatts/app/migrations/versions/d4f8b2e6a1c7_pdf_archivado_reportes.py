@@ -0,0 +1,30 @@
+"""Marca de PDF archivado en reportes
+
+Revision ID: d4f8b2e6a1c7
+Revises: c9e3a1f6b4d2
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8b2e6a1c7'
+down_revision = 'c9e3a1f6b4d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reportes') as batch_op:
+        batch_op.add_column(sa.Column('pdf_archivado', sa.Boolean(), nullable=False,
+                                      server_default=sa.false()))
+    op.create_index('ix_reportes_pdf_archivado', 'reportes', ['pdf_archivado'], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_reportes_pdf_archivado', table_name='reportes', if_exists=True)
+    with op.batch_alter_table('reportes') as batch_op:
+        batch_op.drop_column('pdf_archivado')
@@ -0,0 +1,59 @@
+"""Resumen desnormalizado por usuario
+
+Crea la tabla resumenes_usuario (ver services/resumen.py) y la llena para
+los usuarios existentes con el mismo cálculo desde cero que
+SincronizadorResumen.sincronizar_faltantes.
+
+Revision ID: e5a9c3d7f2b8
+Revises: d4f8b2e6a1c7
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d7f2b8'
+down_revision = 'd4f8b2e6a1c7'
+branch_labels = None
+depends_on = None
+
+
+SQL_SINCRONIZAR = """
+INSERT INTO resumenes_usuario (usuario_id, total_dispositivos, consumo_diario_kwh, consumo_bimestral_kwh,
+                               ultimo_consumo_id, ultimo_reporte_id)
+SELECT u.id,
+       (SELECT count(d.id) FROM dispositivos d WHERE d.usuario_id = u.id),
+       (SELECT coalesce(sum((d.potencia_watts * d.horas_uso_dia) / 1000), 0.0)
+        FROM dispositivos d WHERE d.usuario_id = u.id),
+       (SELECT coalesce(sum((d.potencia_watts * d.horas_uso_dia) / 1000), 0.0) * 60
+        FROM dispositivos d WHERE d.usuario_id = u.id),
+       (SELECT max(c.id) FROM consumos_bimestrales c WHERE c.usuario_id = u.id),
+       (SELECT max(r.id) FROM reportes r WHERE r.usuario_id = u.id)
+FROM usuarios u
+WHERE NOT EXISTS (SELECT 1 FROM resumenes_usuario s WHERE s.usuario_id = u.id)
+"""
+
+
+def upgrade():
+    op.create_table(
+        'resumenes_usuario',
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('total_dispositivos', sa.Integer(), nullable=False),
+        sa.Column('consumo_diario_kwh', sa.Float(), nullable=False),
+        sa.Column('consumo_bimestral_kwh', sa.Float(), nullable=False),
+        sa.Column('ultimo_consumo_id', sa.Integer(), nullable=True),
+        sa.Column('ultimo_reporte_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('usuario_id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_resumenes_usuario_consumo_bimestral_kwh', 'resumenes_usuario', ['consumo_bimestral_kwh'],
+                    unique=False, if_not_exists=True)
+    op.execute(SQL_SINCRONIZAR)
+
+
+def downgrade():
+    op.drop_index('ix_resumenes_usuario_consumo_bimestral_kwh', table_name='resumenes_usuario', if_exists=True)
+    op.drop_table('resumenes_usuario', if_exists=True)
@@ -0,0 +1,27 @@
+"""Marca de última escritura en bloques de lecturas
+
+Revision ID: f2b6d8a4c9e3
+Revises: e5a9c3d7f2b8
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d8a4c9e3'
+down_revision = 'e5a9c3d7f2b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('bloques_lecturas') as batch_op:
+        batch_op.add_column(sa.Column('actualizado', sa.BigInteger(), nullable=False,
+                                      server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('bloques_lecturas') as batch_op:
+        batch_op.drop_column('actualizado')
@@ -1,11 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import case
+from sqlalchemy.ext.hybrid import hybrid_method
+from services.basedatos import SesionEnrutada
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
 
 class Usuario(db.Model):
     __tablename__ = 'usuarios'
+    __table_args__ = (
+        # Paginación por llave (fecha_registro, id) en lista_usuarios
+        db.Index('ix_usuarios_fecha_registro_id', 'fecha_registro', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nombre_usuario = db.Column(db.String(100), unique=True, nullable=False)
@@ -16,6 +23,8 @@ class Usuario(db.Model):
     dispositivos = db.relationship('Dispositivo', backref='usuario', lazy=True, cascade='all, delete-orphan')
     consumos = db.relationship('ConsumoBimestral', backref='usuario', lazy=True, cascade='all, delete-orphan')
     reportes = db.relationship('Reporte', backref='usuario', lazy=True, cascade='all, delete-orphan')
+    bloques_lecturas = db.relationship('BloqueLecturas', backref='usuario', lazy=True, cascade='all, delete-orphan')
+    resumenes_reportes = db.relationship('ResumenReportesAnual', backref='usuario', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Usuario {self.nombre_usuario}>'
@@ -25,21 +34,24 @@ class Dispositivo(db.Model):
     __tablename__ = 'dispositivos'
     
     id = db.Column(db.Integer, primary_key=True)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
     nombre = db.Column(db.String(100), nullable=False)
     tipo = db.Column(db.String(100), nullable=False)  
     potencia_watts = db.Column(db.Float, nullable=False) 
     horas_uso_dia = db.Column(db.Float, nullable=False)  
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @hybrid_method
     def consumo_diario_kwh(self):
         """Calcula el consumo diario en kWh"""
         return (self.potencia_watts * self.horas_uso_dia) / 1000
     
+    @hybrid_method
     def consumo_mensual_kwh(self):
         """Calcula el consumo mensual en kWh"""
         return self.consumo_diario_kwh() * 30
     
+    @hybrid_method
     def consumo_bimestral_kwh(self):
         """Calcula el consumo bimestral en kWh"""
         return self.consumo_mensual_kwh() * 2
@@ -52,7 +64,7 @@ class ConsumoBimestral(db.Model):
     __tablename__ = 'consumos_bimestrales'
     
     id = db.Column(db.Integer, primary_key=True)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
     periodo_inicio = db.Column(db.Date, nullable=False)
     periodo_fin = db.Column(db.Date, nullable=False)
     consumo_kwh = db.Column(db.Float, nullable=False)  
@@ -62,12 +74,18 @@ class ConsumoBimestral(db.Model):
     default=lambda: datetime.now(timezone.utc)
 )
     
+    @hybrid_method
     def costo_por_kwh(self):
         """Calcula el costo promedio por kWh"""
         if self.consumo_kwh > 0:
             return self.costo_total / self.consumo_kwh
         return 0
     
+    @costo_por_kwh.expression
+    def costo_por_kwh(cls):
+        """Versión SQL de costo_por_kwh (para AVG/GROUP BY)"""
+        return case((cls.consumo_kwh > 0, cls.costo_total / cls.consumo_kwh), else_=0.0)
+    
     def __repr__(self):
         return f'<ConsumoBimestral {self.consumo_kwh} kWh - ${self.costo_total}>'
 
@@ -76,19 +94,119 @@ class Reporte(db.Model):
     __tablename__ = 'reportes'
     
     id = db.Column(db.Integer, primary_key=True)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
     fecha_generacion = db.Column(db.DateTime, default=datetime.utcnow)
     consumo_actual_kwh = db.Column(db.Float, nullable=False)
     consumo_optimizado_kwh = db.Column(db.Float, nullable=False)
     ahorro_kwh = db.Column(db.Float, nullable=False)
     ahorro_pesos = db.Column(db.Float, nullable=False)
     archivo_pdf = db.Column(db.String(200))  # ruta al archivo PDF generado
+    # El PDF ya está comprimido en ARCHIVE_FOLDER (ver services/retencion.py)
+    pdf_archivado = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false(),
+                              index=True)
     
+    @hybrid_method
     def porcentaje_ahorro(self):
         """Calcula el porcentaje de ahorro"""
         if self.consumo_actual_kwh > 0:
             return (self.ahorro_kwh / self.consumo_actual_kwh) * 100
         return 0
     
+    @porcentaje_ahorro.expression
+    def porcentaje_ahorro(cls):
+        """Versión SQL de porcentaje_ahorro (para AVG/GROUP BY)"""
+        return case((cls.consumo_actual_kwh > 0, cls.ahorro_kwh / cls.consumo_actual_kwh * 100), else_=0.0)
+    
+    def __repr__(self):
+        return f'<Reporte {self.fecha_generacion} - Ahorro: {self.ahorro_kwh} kWh>'
+
+
+class ResumenReportesAnual(db.Model):
+    """Reportes antiguos de un usuario compactados por año (ver services/retencion.py)"""
+    __tablename__ = 'resumenes_reportes_anuales'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'anio', name='uq_resumenes_reportes_usuario_anio'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
+    anio = db.Column(db.Integer, nullable=False)
+    reportes = db.Column(db.Integer, nullable=False, default=0)
+    # Sumas de los reportes compactados
+    consumo_actual_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    consumo_optimizado_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    ahorro_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    ahorro_pesos = db.Column(db.Float, nullable=False, default=0.0)
+    primera_fecha = db.Column(db.DateTime)
+    ultima_fecha = db.Column(db.DateTime)
+    
+    def porcentaje_ahorro(self):
+        """Porcentaje de ahorro del año (ponderado por consumo)"""
+        if self.consumo_actual_kwh > 0:
+            return (self.ahorro_kwh / self.consumo_actual_kwh) * 100
+        return 0
+    
+    def __repr__(self):
+        return f'<ResumenReportesAnual {self.usuario_id} {self.anio} - {self.reportes} reportes>'
+
+
+class ResumenUsuario(db.Model):
+    """Totales por usuario mantenidos al escribir (ver services/resumen.py)"""
+    __tablename__ = 'resumenes_usuario'
+    
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), primary_key=True)
+    total_dispositivos = db.Column(db.Integer, nullable=False, default=0)
+    consumo_diario_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    consumo_bimestral_kwh = db.Column(db.Float, nullable=False, default=0.0, index=True)
+    # Sin llave foránea: son apuntadores desnormalizados al último registro
+    ultimo_consumo_id = db.Column(db.Integer)
+    ultimo_reporte_id = db.Column(db.Integer)
+    
+    def porcentaje(self, consumo_bimestral_kwh):
+        """Porcentaje que representa un consumo bimestral sobre el total del usuario"""
+        if self.consumo_bimestral_kwh > 0:
+            return (consumo_bimestral_kwh / self.consumo_bimestral_kwh) * 100
+        return 0
+    
+    def holgura_optimizador(self, restriccion_ahorro=0.20):
+        """
+        Cifras de la restricción de ahorro de encontrar_punto_optimo,
+        sin reconstruir el optimizador
+        
+        Returns:
+            dict: Consumo actual, consumo objetivo y ahorro requerido (kWh bimestrales)
+        """
+        return {
+            'consumo_actual_kwh': self.consumo_bimestral_kwh,
+            'consumo_objetivo_kwh': self.consumo_bimestral_kwh * (1 - restriccion_ahorro),
+            'ahorro_requerido_kwh': self.consumo_bimestral_kwh * restriccion_ahorro
+        }
+    
+    def __repr__(self):
+        return f'<ResumenUsuario {self.usuario_id} - {self.consumo_bimestral_kwh} kWh>'
+
+
+class BloqueLecturas(db.Model):
+    """
+    Lecturas de medidor de un usuario para un día, guardadas como un
+    arreglo float32 de ancho fijo (1440 / resolucion_min valores, NaN donde
+    no hay lectura). Ver services/series.py.
+    """
+    __tablename__ = 'bloques_lecturas'
+    __table_args__ = (
+        db.UniqueConstraint('usuario_id', 'dia', name='uq_bloques_lecturas_usuario_dia'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
+    dia = db.Column(db.Date, nullable=False)
+    resolucion_min = db.Column(db.Integer, nullable=False, default=15)
+    valores = db.Column(db.LargeBinary, nullable=False)  # kWh por intervalo, float32
+    total_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    lecturas = db.Column(db.Integer, nullable=False, default=0)  # intervalos con dato
+    # Marca de la última escritura (ns desde 1970); la usa services/columnar.py
+    # para saber si un archivo exportado sigue vigente
+    actualizado = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    
     def __repr__(self):
-        return f'<Reporte {self.fecha_generacion} - Ahorro: {self.ahorro_kwh} kWh>'
\ No newline at end of file
+        return f'<BloqueLecturas {self.usuario_id} {self.dia} - {self.total_kwh} kWh>'
@@ -0,0 +1,86 @@
+from sqlalchemy import event, inspect
+
+
+def consumo_diario(potencia_watts, horas_uso_dia):
+    """kWh diarios, igual que Dispositivo.consumo_diario_kwh()"""
+    return (potencia_watts * horas_uso_dia) / 1000
+
+
+def valor_anterior(estado, atributo):
+    """Valor del atributo antes del flush en curso"""
+    historial = estado.attrs[atributo].history
+    if historial.deleted:
+        return historial.deleted[0]
+    return getattr(estado.object, atributo)
+
+
+class DeltasConsumo:
+    """
+    Convierte cada insert, update o delete de Dispositivo en deltas por
+    usuario (número de dispositivos y kWh diarios)
+
+    En lugar de recalcular la suma de todos los dispositivos, cada cambio
+    aporta la diferencia: kWh nuevos menos kWh anteriores (con el historial
+    de atributos en los updates) y, si el dispositivo cambia de usuario,
+    un delta negativo para el anterior y uno positivo para el nuevo. Los
+    deltas se entregan a los suscriptores dentro del flush, con la conexión
+    de la transacción en curso, así que lo que escriban se confirma o se
+    revierte junto con el cambio.
+    """
+
+    def __init__(self):
+        self._suscriptores = []
+        self._modelo = None
+
+    def suscribir(self, aplicar):
+        """
+        Registra una función aplicar(connection, usuario_id, delta_dispositivos, delta_consumo)
+
+        Args:
+            aplicar: Se llama una vez por delta, dentro del flush
+        """
+        if aplicar not in self._suscriptores:
+            self._suscriptores.append(aplicar)
+
+    def escuchar_cambios(self, modelo_dispositivo):
+        """
+        Registra los eventos de mapper que generan los deltas (una sola vez)
+
+        Args:
+            modelo_dispositivo: Clase Dispositivo
+        """
+        if self._modelo is not None:
+            return
+        self._modelo = modelo_dispositivo
+        event.listen(modelo_dispositivo, 'after_insert', self._insertado)
+        event.listen(modelo_dispositivo, 'after_update', self._actualizado)
+        event.listen(modelo_dispositivo, 'after_delete', self._eliminado)
+
+    def _emitir(self, connection, usuario_id, delta_dispositivos, delta_consumo):
+        for aplicar in self._suscriptores:
+            aplicar(connection, usuario_id, delta_dispositivos, delta_consumo)
+
+    def _insertado(self, mapper, connection, target):
+        self._emitir(connection, target.usuario_id, 1,
+                     consumo_diario(target.potencia_watts, target.horas_uso_dia))
+
+    def _actualizado(self, mapper, connection, target):
+        estado = inspect(target)
+        usuario_anterior = valor_anterior(estado, 'usuario_id')
+        consumo_anterior = consumo_diario(valor_anterior(estado, 'potencia_watts'),
+                                          valor_anterior(estado, 'horas_uso_dia'))
+        consumo_nuevo = consumo_diario(target.potencia_watts, target.horas_uso_dia)
+        if usuario_anterior == target.usuario_id:
+            if consumo_nuevo != consumo_anterior:
+                self._emitir(connection, target.usuario_id, 0, consumo_nuevo - consumo_anterior)
+        else:
+            self._emitir(connection, usuario_anterior, -1, -consumo_anterior)
+            self._emitir(connection, target.usuario_id, 1, consumo_nuevo)
+
+    def _eliminado(self, mapper, connection, target):
+        self._emitir(connection, target.usuario_id, -1,
+                     -consumo_diario(target.potencia_watts, target.horas_uso_dia))
+
+
+# Capa de deltas compartida; SincronizadorResumen se suscribe a ella
+deltas_consumo = DeltasConsumo()
@@ -0,0 +1,123 @@
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session as SesionFlask
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+
+# Pragmas que modifican el archivo; no se aplican en conexiones de solo lectura
+PRAGMAS_ESCRITURA = ('journal_mode',)
+
+BIND_LECTURA = 'lectura'
+METODOS_LECTURA = ('GET', 'HEAD')
+
+CLAVE_ESCRITURA = 'usa_escritura'
+
+
+def aplicar_pragmas(conexion_dbapi, pragmas, solo_lectura=False):
+    """
+    Ejecuta los PRAGMA en una conexión sqlite3 recién abierta
+
+    Args:
+        conexion_dbapi: Conexión sqlite3
+        pragmas: Dict nombre -> valor
+        solo_lectura: Si es True omite PRAGMAS_ESCRITURA y activa query_only
+    """
+    cursor = conexion_dbapi.cursor()
+    for nombre, valor in pragmas.items():
+        if solo_lectura and nombre in PRAGMAS_ESCRITURA:
+            continue
+        cursor.execute(f'PRAGMA {nombre}={valor}')
+    if solo_lectura:
+        cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def escuchar_conexiones(engine, pragmas, solo_lectura=False):
+    """Aplica los pragmas a cada conexión nueva del pool del engine"""
+    def al_conectar(conexion_dbapi, registro):
+        aplicar_pragmas(conexion_dbapi, pragmas, solo_lectura)
+    event.listen(engine, 'connect', al_conectar)
+
+
+def _es_sqlite_en_archivo(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def configurar_sqlite(app, db):
+    """
+    Inicializa Flask-SQLAlchemy con los pragmas de producción de SQLite
+
+    Con SQLITE_POOL_LECTURA activo se agrega el bind 'lectura': un segundo
+    pool sobre el mismo archivo con query_only, que SesionEnrutada usa en
+    las peticiones GET. En modo WAL los lectores no bloquean al escritor,
+    así que los dashboards no compiten con los commits de generar_pdf.
+
+    Reemplaza a db.init_app(app).
+
+    Args:
+        app: Aplicación Flask (se leen SQLITE_PRAGMAS, SQLITE_POOL_LECTURA
+             y SQLITE_POOL_LECTURA_TAMANO de app.config; app.py los toma
+             de Config)
+        db: Instancia SQLAlchemy de models.py
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    sqlite = _es_sqlite_en_archivo(uri)
+    pragmas = app.config.get('SQLITE_PRAGMAS', {})
+
+    if sqlite:
+        # timeout del driver en segundos, alineado con busy_timeout
+        connect_args = {}
+        if 'busy_timeout' in pragmas:
+            connect_args['timeout'] = pragmas['busy_timeout'] / 1000
+        opciones = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        opciones.setdefault('connect_args', {}).update(connect_args)
+
+        if app.config.get('SQLITE_POOL_LECTURA', False):
+            binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+            binds.setdefault(BIND_LECTURA, {
+                'url': uri,
+                'pool_size': app.config['SQLITE_POOL_LECTURA_TAMANO'],
+                'connect_args': connect_args
+            })
+
+    db.init_app(app)
+
+    if sqlite:
+        with app.app_context():
+            for clave, engine in db.engines.items():
+                escuchar_conexiones(engine, pragmas, solo_lectura=(clave == BIND_LECTURA))
+
+
+class SesionEnrutada(SesionFlask):
+    """
+    Sesión que lee del pool de solo lectura durante peticiones GET/HEAD
+
+    Las escrituras (flush, INSERT/UPDATE/DELETE explícitos) siempre van
+    al engine principal, y después del primer flush la sesión se queda
+    en él hasta terminar la transacción para leer sus propios cambios.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._usar_lectura(clause):
+            return self._db.engines[BIND_LECTURA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _usar_lectura(self, clause):
+        if self._flushing or self.info.get(CLAVE_ESCRITURA) or isinstance(clause, UpdateBase):
+            return False
+        if not has_request_context() or request.method not in METODOS_LECTURA:
+            return False
+        return BIND_LECTURA in self._db.engines
+
+
+@event.listens_for(SesionEnrutada, 'after_flush')
+def _fijar_escritura(sesion, contexto):
+    sesion.info[CLAVE_ESCRITURA] = True
+
+
+@event.listens_for(SesionEnrutada, 'after_transaction_end')
+def _liberar_escritura(sesion, transaccion):
+    if transaccion.parent is None:
+        sesion.info.pop(CLAVE_ESCRITURA, None)
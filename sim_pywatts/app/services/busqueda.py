@@ -0,0 +1,139 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from models import Usuario
+
+
+POR_PAGINA = 20
+
+# El tokenizador trigram de FTS5 necesita al menos 3 caracteres
+MIN_CARACTERES_FTS = 3
+
+# Índice de texto completo sobre usuarios (mismo DDL que la migración
+# a1c4e7b2d9f0); los triggers lo mantienen al día
+DDL_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS usuarios_fts USING fts5(
+        nombre_usuario, domicilio, content='usuarios', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS usuarios_fts_ai AFTER INSERT ON usuarios BEGIN
+        INSERT INTO usuarios_fts(rowid, nombre_usuario, domicilio)
+        VALUES (new.id, new.nombre_usuario, new.domicilio);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS usuarios_fts_ad AFTER DELETE ON usuarios BEGIN
+        INSERT INTO usuarios_fts(usuarios_fts, rowid, nombre_usuario, domicilio)
+        VALUES ('delete', old.id, old.nombre_usuario, old.domicilio);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS usuarios_fts_au AFTER UPDATE ON usuarios BEGIN
+        INSERT INTO usuarios_fts(usuarios_fts, rowid, nombre_usuario, domicilio)
+        VALUES ('delete', old.id, old.nombre_usuario, old.domicilio);
+        INSERT INTO usuarios_fts(rowid, nombre_usuario, domicilio)
+        VALUES (new.id, new.nombre_usuario, new.domicilio);
+    END"""
+]
+
+
+def _escapar_like(termino):
+    return termino.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class BuscadorUsuarios:
+    """
+    Listado de usuarios paginado por llave y con búsqueda indexada
+
+    Las páginas se piden con un cursor (fecha_registro, id) del último
+    usuario mostrado, así que cada página es un recorrido corto del índice
+    ix_usuarios_fecha_registro_id sin importar cuántas cuentas haya. La
+    búsqueda por nombre o domicilio usa la tabla FTS5 usuarios_fts
+    (trigramas, coincide en cualquier parte del texto); si SQLite no la
+    soporta o el término es muy corto, se usa un LIKE por prefijo.
+    """
+
+    def __init__(self, por_pagina=POR_PAGINA):
+        self.por_pagina = por_pagina
+        self.fts = False
+
+    def preparar(self, engine):
+        """
+        Crea la tabla FTS y sus triggers si no existen (idempotente)
+
+        Args:
+            engine: Engine de SQLAlchemy (db.engine)
+        """
+        if engine.dialect.name != 'sqlite':
+            return
+        try:
+            with engine.begin() as conexion:
+                existia = conexion.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usuarios_fts'"
+                )).first() is not None
+                for sentencia in DDL_FTS:
+                    conexion.execute(text(sentencia))
+                if not existia:
+                    conexion.execute(text("INSERT INTO usuarios_fts(usuarios_fts) VALUES ('rebuild')"))
+            self.fts = True
+        except OperationalError:
+            # SQLite compilado sin FTS5 o sin el tokenizador trigram
+            self.fts = False
+
+    def _filtro_busqueda(self, termino):
+        if self.fts and len(termino) >= MIN_CARACTERES_FTS:
+            consulta_fts = '"' + termino.replace('"', '""') + '"'
+            coincidencias = text('SELECT rowid FROM usuarios_fts WHERE usuarios_fts MATCH :consulta') \
+                .bindparams(consulta=consulta_fts).columns(rowid=Usuario.id.type)
+            return Usuario.id.in_(select(coincidencias.subquery().c.rowid))
+
+        patron = _escapar_like(termino) + '%'
+        return or_(Usuario.nombre_usuario.ilike(patron, escape='\\'),
+                   Usuario.domicilio.ilike(patron, escape='\\'))
+
+    @staticmethod
+    def codificar_cursor(usuario):
+        """Cursor de la página siguiente a partir del último usuario mostrado"""
+        return f'{usuario.fecha_registro.isoformat()}_{usuario.id}'
+
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """(fecha_registro, id) del cursor, o None si no es válido"""
+        try:
+            fecha, usuario_id = cursor.rsplit('_', 1)
+            return datetime.fromisoformat(fecha), int(usuario_id)
+        except (AttributeError, ValueError):
+            return None
+
+    def pagina(self, sesion, termino=None, cursor=None):
+        """
+        Una página de usuarios, del registro más reciente al más antiguo
+
+        Args:
+            sesion: Sesión de SQLAlchemy (db.session)
+            termino: Texto a buscar en nombre de usuario o domicilio
+            cursor: Cursor devuelto por la página anterior
+
+        Returns:
+            tuple: (lista de Usuario, cursor de la página siguiente o None)
+        """
+        consulta = select(Usuario).order_by(Usuario.fecha_registro.desc(), Usuario.id.desc())
+
+        termino = (termino or '').strip()
+        if termino:
+            consulta = consulta.where(self._filtro_busqueda(termino))
+
+        posicion = self.decodificar_cursor(cursor) if cursor else None
+        if posicion:
+            fecha, usuario_id = posicion
+            consulta = consulta.where(or_(
+                Usuario.fecha_registro < fecha,
+                and_(Usuario.fecha_registro == fecha, Usuario.id < usuario_id)
+            ))
+
+        # Se pide uno de más para saber si hay página siguiente
+        usuarios = sesion.scalars(consulta.limit(self.por_pagina + 1)).all()
+        if len(usuarios) > self.por_pagina:
+            usuarios = usuarios[:self.por_pagina]
+            return usuarios, self.codificar_cursor(usuarios[-1])
+        return usuarios, None
+
+
+buscador_usuarios = BuscadorUsuarios()
@@ -0,0 +1,297 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+from sqlalchemy import event
+
+
+class CacheOptimizacion:
+    """
+    Caché LRU de resultados de encontrar_punto_optimo
+
+    La llave es la huella del conjunto de dispositivos (potencias, horas,
+    nombres), la tarifa, el objetivo de ahorro y el método, así que dos
+    peticiones con los mismos datos comparten el resultado. Además se
+    lleva un índice por usuario para descartar sus entradas cuando
+    cambian sus dispositivos o recibos.
+    """
+
+    EVENTOS_INVALIDACION = ('after_insert', 'after_update', 'after_delete')
+
+    def __init__(self, max_entradas=256):
+        """
+        Args:
+            max_entradas: Número máximo de resultados guardados
+        """
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._por_usuario = {}
+        self._usuario_de_llave = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, optimizador, restriccion_ahorro=0.20, metodo='voraz', usuario_id=None):
+        """
+        Regresa la configuración óptima, resolviéndola solo si no está en caché
+
+        Args:
+            optimizador: OptimizadorEnergetico ya construido
+            restriccion_ahorro: Objetivo de ahorro
+            metodo: Método de optimización
+            usuario_id: Usuario dueño de los dispositivos (para invalidación)
+
+        Returns:
+            dict: Copia de la configuración óptima
+        """
+        llave = optimizador.huella(restriccion_ahorro, metodo)
+
+        with self._lock:
+            configuracion = self._entradas.get(llave)
+            if configuracion is not None:
+                self._entradas.move_to_end(llave)
+                self.aciertos += 1
+                return self._copiar(configuracion)
+            self.fallos += 1
+
+        configuracion = optimizador.encontrar_punto_optimo(restriccion_ahorro, metodo=metodo)
+
+        with self._lock:
+            self._entradas[llave] = configuracion
+            self._entradas.move_to_end(llave)
+            if usuario_id is not None:
+                self._por_usuario.setdefault(usuario_id, set()).add(llave)
+                self._usuario_de_llave[llave] = usuario_id
+            while len(self._entradas) > self.max_entradas:
+                llave_vieja, _ = self._entradas.popitem(last=False)
+                self._descartar_indice(llave_vieja)
+
+        return self._copiar(configuracion)
+
+    def invalidar_usuario(self, usuario_id):
+        """Elimina todos los resultados calculados para un usuario"""
+        with self._lock:
+            for llave in self._por_usuario.pop(usuario_id, set()):
+                self._entradas.pop(llave, None)
+                self._usuario_de_llave.pop(llave, None)
+
+    def limpiar(self):
+        """Vacía la caché por completo"""
+        with self._lock:
+            self._entradas.clear()
+            self._por_usuario.clear()
+            self._usuario_de_llave.clear()
+
+    def escuchar_cambios(self, *modelos):
+        """
+        Registra eventos de SQLAlchemy para invalidar al usuario dueño
+        cada vez que se inserta, modifica o elimina una fila de los modelos
+
+        Args:
+            modelos: Clases con columna usuario_id (Dispositivo, ConsumoBimestral, ...)
+        """
+        def al_cambiar(mapper, connection, target):
+            self.invalidar_usuario(target.usuario_id)
+
+        for modelo in modelos:
+            for nombre_evento in self.EVENTOS_INVALIDACION:
+                event.listen(modelo, nombre_evento, al_cambiar)
+
+    def _descartar_indice(self, llave):
+        """Quita una llave expulsada del índice por usuario"""
+        usuario_id = self._usuario_de_llave.pop(llave, None)
+        if usuario_id is None:
+            return
+        llaves = self._por_usuario.get(usuario_id)
+        if llaves is not None:
+            llaves.discard(llave)
+            if not llaves:
+                del self._por_usuario[usuario_id]
+
+    @staticmethod
+    def _copiar(configuracion):
+        """Copia superficial por dispositivo para que el llamador no altere la caché"""
+        return {nombre: dict(datos) for nombre, datos in configuracion.items()}
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def _a_json(valor):
+    """Escalares de numpy y fechas para la llave de CacheGraficas"""
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return str(valor)
+
+
+class CacheGraficas:
+    """
+    Caché de imágenes de gráficas direccionada por contenido
+
+    La llave es el SHA-256 del tipo de gráfica, los datos que se dibujan,
+    el estilo, los DPI y el formato, así que dos peticiones con los mismos
+    datos comparten la imagen sin importar el usuario. Tiene dos niveles:
+    memoria (LRU acotado en bytes) y disco (un archivo por llave bajo
+    'carpeta', LRU por tamaño total usando la fecha de modificación, que
+    se actualiza en cada acierto).
+    """
+
+    def __init__(self, max_bytes_memoria, max_bytes_disco, carpeta=None):
+        """
+        Args:
+            max_bytes_memoria: Tamaño máximo del nivel en memoria
+                               (CACHE_GRAFICAS_MEMORIA_MB de Config)
+            max_bytes_disco: Tamaño máximo del nivel en disco
+                             (CACHE_GRAFICAS_DISCO_MB de Config)
+            carpeta: Carpeta del nivel en disco (None = solo memoria)
+        """
+        self.carpeta = carpeta
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._disco = None  # llave -> (ruta, bytes), se carga al primer uso
+        self._bytes_disco = 0
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+
+    @staticmethod
+    def llave(tipo, datos, estilo, dpi, formato):
+        """SHA-256 de todo lo que determina la imagen"""
+        contenido = json.dumps([tipo, datos, estilo, dpi, formato], separators=(',', ':'),
+                               ensure_ascii=False, default=_a_json)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    def _ruta(self, llave):
+        return os.path.join(self.carpeta, llave[:2], llave)
+
+    def _cargar_disco(self):
+        """Índice del nivel en disco, del menos al más recientemente usado"""
+        archivos = []
+        if os.path.isdir(self.carpeta):
+            for raiz, _, nombres in os.walk(self.carpeta):
+                for nombre in nombres:
+                    if nombre.endswith('.tmp'):
+                        continue
+                    ruta = os.path.join(raiz, nombre)
+                    estado = os.stat(ruta)
+                    archivos.append((estado.st_mtime, nombre, ruta, estado.st_size))
+        archivos.sort()
+        self._disco = OrderedDict((nombre, (ruta, tamano)) for _, nombre, ruta, tamano in archivos)
+        self._bytes_disco = sum(tamano for _, tamano in self._disco.values())
+
+    def obtener(self, llave):
+        """
+        Imagen guardada (None si no está en ningún nivel)
+
+        Returns:
+            bytes o None
+        """
+        with self._lock:
+            contenido = self._memoria.get(llave)
+            if contenido is not None:
+                self._memoria.move_to_end(llave)
+                self.aciertos_memoria += 1
+                return contenido
+
+            if self.carpeta is not None:
+                if self._disco is None:
+                    self._cargar_disco()
+                entrada = self._disco.get(llave)
+                if entrada is not None:
+                    try:
+                        with open(entrada[0], 'rb') as archivo:
+                            contenido = archivo.read()
+                        os.utime(entrada[0])
+                    except FileNotFoundError:
+                        # Lo borró otro proceso al expulsar
+                        self._quitar_disco(llave)
+                    else:
+                        self._disco.move_to_end(llave)
+                        self._guardar_memoria(llave, contenido)
+                        self.aciertos_disco += 1
+                        return contenido
+
+            self.fallos += 1
+            return None
+
+    def guardar(self, llave, contenido):
+        """Guarda la imagen en memoria y en disco, expulsando las menos usadas"""
+        with self._lock:
+            self._guardar_memoria(llave, contenido)
+            if self.carpeta is None:
+                return
+            if self._disco is None:
+                self._cargar_disco()
+            if llave in self._disco:
+                return
+
+            ruta = self._ruta(llave)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f'{ruta}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporal, 'wb') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
+            self._disco[llave] = (ruta, len(contenido))
+            self._bytes_disco += len(contenido)
+
+            while self._bytes_disco > self.max_bytes_disco and len(self._disco) > 1:
+                llave_vieja = next(iter(self._disco))
+                ruta_vieja, _ = self._quitar_disco(llave_vieja)
+                try:
+                    os.remove(ruta_vieja)
+                except FileNotFoundError:
+                    pass
+
+    def _guardar_memoria(self, llave, contenido):
+        if llave in self._memoria:
+            self._memoria.move_to_end(llave)
+            return
+        self._memoria[llave] = contenido
+        self._bytes_memoria += len(contenido)
+        while self._bytes_memoria > self.max_bytes_memoria and len(self._memoria) > 1:
+            _, viejo = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(viejo)
+
+    def _quitar_disco(self, llave):
+        ruta, tamano = self._disco.pop(llave)
+        self._bytes_disco -= tamano
+        return ruta, tamano
+
+    def limpiar(self, disco=False):
+        """Vacía el nivel en memoria (y el de disco si se indica)"""
+        with self._lock:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+            if disco and self.carpeta is not None:
+                if self._disco is None:
+                    self._cargar_disco()
+                for ruta, _ in self._disco.values():
+                    try:
+                        os.remove(ruta)
+                    except FileNotFoundError:
+                        pass
+                self._disco.clear()
+                self._bytes_disco = 0
+
+    def estadisticas(self):
+        """Aciertos por nivel, fallos y tamaño ocupado"""
+        with self._lock:
+            consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+            return {
+                'aciertos_memoria': self.aciertos_memoria,
+                'aciertos_disco': self.aciertos_disco,
+                'fallos': self.fallos,
+                'tasa_aciertos': (self.aciertos_memoria + self.aciertos_disco) / consultas if consultas else 0.0,
+                'entradas_memoria': len(self._memoria),
+                'bytes_memoria': self._bytes_memoria,
+                'entradas_disco': len(self._disco) if self._disco is not None else None,
+                'bytes_disco': self._bytes_disco
+            }
+
+    def __len__(self):
+        return len(self._memoria)
@@ -1,17 +1,263 @@
+import hashlib
 import numpy as np
-from scipy.optimize import minimize
-from datetime import datetime, timedelta
+from scipy.optimize import minimize, linprog
+from datetime import datetime
+from services.configuracion import valor_config
+from services.tarifas import motor_tarifario
+from services.simulacion import simulador_horario
+
+
+def resolver_voraz(costos, consumos, limites, consumo_objetivo):
+    """
+    Solución cerrada del problema lineal
+        min costos·h  s.a.  consumos·h <= consumo_objetivo,  0 <= h <= limites
+    
+    Es una mochila fraccionaria: cada dispositivo arranca en la cota que
+    minimiza su costo y, si se excede el objetivo, se recortan primero las
+    horas que menos costo agregan por kWh liberado.
+    
+    Args:
+        costos: Arreglo con el coeficiente de la función objetivo por dispositivo
+        consumos: Arreglo (no negativo) con kWh bimestrales por hora diaria de uso
+        limites: Arreglo con las horas máximas de cada dispositivo
+        consumo_objetivo: Consumo máximo permitido en kWh bimestrales
+    
+    Returns:
+        np.ndarray: Horas óptimas por dispositivo
+    """
+    horas, factible = resolver_voraz_lote(
+        costos, consumos, limites,
+        np.array([consumo_objetivo], dtype=np.float64),
+        np.zeros(len(limites), dtype=np.intp)
+    )
+    if not factible[0]:
+        raise ValueError('El objetivo de consumo es infactible')
+    return horas
+
+
+def resolver_voraz_lote(costos, consumos, limites, consumos_objetivo, hogar):
+    """
+    Versión segmentada de resolver_voraz: resuelve en una sola pasada
+    vectorizada un problema independiente por hogar sobre arreglos
+    concatenados.
+    
+    Args:
+        costos, consumos, limites: Arreglos concatenados de todos los hogares
+        consumos_objetivo: Arreglo con el consumo máximo de cada hogar
+        hogar: Índice de hogar de cada dispositivo (no decreciente)
+    
+    Returns:
+        tuple: (horas óptimas por dispositivo, máscara de hogares factibles)
+    """
+    n_hogares = len(consumos_objetivo)
+    horas = np.where(costos < 0, limites, 0.0)
+    exceso = np.bincount(hogar, weights=consumos * horas, minlength=n_hogares) - consumos_objetivo
+    factible = consumos_objetivo >= 0
+    
+    candidatos = np.flatnonzero(
+        (costos < 0) & (consumos > 0) & (exceso[hogar] > 0) & factible[hogar]
+    )
+    if len(candidatos) == 0:
+        return horas, factible
+    
+    # Ordenar por hogar y, dentro de cada hogar, por costo por kWh liberado
+    razon = -costos[candidatos] / consumos[candidatos]
+    orden = candidatos[np.lexsort((razon, hogar[candidatos]))]
+    hogar_orden = hogar[orden]
+    aporte = consumos[orden] * limites[orden]
+    
+    # Suma acumulada reiniciada al inicio de cada hogar
+    acumulado = np.cumsum(aporte)
+    inicio_hogar = np.r_[True, hogar_orden[1:] != hogar_orden[:-1]]
+    base = (acumulado - aporte)[inicio_hogar][np.cumsum(inicio_hogar) - 1]
+    hasta = acumulado - base
+    previo = hasta - aporte
+    
+    exceso_orden = exceso[hogar_orden]
+    completo = hasta < exceso_orden
+    parcial = ~completo & (previo < exceso_orden)
+    horas[orden[completo]] = 0.0
+    idx = orden[parcial]
+    horas[idx] -= (exceso_orden[parcial] - previo[parcial]) / consumos[idx]
+    return horas, factible
+
+
+def resolver_voraz_parametrico(costos, consumos, limites, consumos_objetivo):
+    """
+    Resuelve el problema de resolver_voraz para varios objetivos de consumo
+    del mismo hogar a la vez. El orden de recorte no depende del objetivo,
+    así que se calcula una sola vez y cada objetivo solo mueve el punto de
+    corte sobre la misma suma acumulada.
+    
+    Args:
+        costos, consumos, limites: Arreglos por dispositivo
+        consumos_objetivo: Arreglo con K consumos máximos
+    
+    Returns:
+        tuple: (matriz K x n de horas óptimas, máscara de objetivos factibles)
+    """
+    consumos_objetivo = np.asarray(consumos_objetivo, dtype=np.float64)
+    base = np.where(costos < 0, limites, 0.0)
+    horas = np.tile(base, (len(consumos_objetivo), 1))
+    exceso = float(consumos @ base) - consumos_objetivo
+    factible = consumos_objetivo >= 0
+    
+    candidatos = np.flatnonzero((costos < 0) & (consumos > 0))
+    if len(candidatos) == 0:
+        return horas, factible
+    
+    orden = candidatos[np.argsort(-costos[candidatos] / consumos[candidatos], kind='stable')]
+    aporte = consumos[orden] * limites[orden]
+    acumulado = np.cumsum(aporte)
+    previo = acumulado - aporte
+    
+    exceso = exceso[:, None]
+    completo = acumulado < exceso
+    parcial = ~completo & (previo < exceso)
+    reduccion = np.where(completo, limites[orden], 0.0)
+    reduccion = np.where(parcial, (exceso - previo) / consumos[orden], reduccion)
+    horas[:, orden] -= reduccion
+    return horas, factible
+
+
+def _configuracion_por_dispositivo(nombres, horas, potencias, consumo_bimestral, horas_finales, tarifa):
+    """
+    Convierte un vector de horas óptimas en pares (nombre, dict) con el
+    formato de configuracion_optima. tarifa puede ser un escalar o un
+    arreglo por dispositivo.
+    """
+    horas_optimas = np.maximum(np.asarray(horas_finales, dtype=np.float64), 0)  # Asegurar no negativos
+    reduccion_horas = horas - horas_optimas
+    consumo_optimo = (potencias * horas_optimas * 60) / 1000
+    ahorro = consumo_bimestral - consumo_optimo
+    
+    columnas = zip(
+        nombres,
+        horas.tolist(),
+        horas_optimas.tolist(),
+        reduccion_horas.tolist(),
+        consumo_bimestral.tolist(),
+        consumo_optimo.tolist(),
+        ahorro.tolist(),
+        (ahorro * tarifa).tolist()
+    )
+    return [
+        (nombre, {
+            'horas_actuales': round(actuales, 2),
+            'horas_optimas': round(optimas, 2),
+            'reduccion_horas': round(reduccion, 2),
+            'consumo_actual_kwh': round(actual_kwh, 2),
+            'consumo_optimo_kwh': round(optimo_kwh, 2),
+            'ahorro_kwh': round(ahorro_kwh, 2),
+            'ahorro_pesos': round(ahorro_pesos, 2)
+        })
+        for nombre, actuales, optimas, reduccion, actual_kwh, optimo_kwh, ahorro_kwh, ahorro_pesos in columnas
+    ]
+
+
+def resolver_lineal(costos, consumos, limites, consumo_objetivo):
+    """
+    Resuelve el mismo problema lineal que resolver_voraz con el método
+    simplex/punto interior de HiGHS (scipy.optimize.linprog).
+    """
+    resultado = linprog(
+        costos,
+        A_ub=consumos.reshape(1, -1),
+        b_ub=[consumo_objetivo],
+        bounds=np.column_stack([np.zeros_like(limites), limites]),
+        method='highs'
+    )
+    if not resultado.success:
+        raise ValueError(resultado.message)
+    return resultado.x
+
+
+def resolver_slsqp(costos, consumos, limites, consumo_objetivo, objetivo=None):
+    """
+    Resuelve con SLSQP. Es el método más lento, pero admite una función
+    objetivo no lineal arbitraria; si no se da, se usa costos·h.
+    """
+    if objetivo is None:
+        def objetivo(horas_uso):
+            return float(costos @ horas_uso)
+    
+    def restriccion_ahorro_func(horas_uso):
+        return consumo_objetivo - float(consumos @ horas_uso)
+    
+    resultado = minimize(
+        objetivo,
+        limites,
+        method='SLSQP',
+        bounds=list(zip(np.zeros_like(limites), limites)),
+        constraints={'type': 'ineq', 'fun': restriccion_ahorro_func}
+    )
+    return resultado.x
+
+
+METODOS_OPTIMIZACION = {
+    'voraz': resolver_voraz,
+    'lineal': resolver_lineal,
+    'slsqp': resolver_slsqp
+}
+
 
 class OptimizadorEnergetico:
 
+    # Parámetros de la proyección; app.py los toma de Config con configurar()
+    dias_proyeccion_max = None
+    variacion_diaria = None
+    
+    @classmethod
+    def configurar(cls, config):
+        """
+        Lee de Config o app.config el máximo de días a proyectar
+        (DIAS_PROYECCION_MAX) y el rango de variación diaria del consumo
+        (VARIACION_DIARIA)
+        """
+        cls.dias_proyeccion_max = valor_config(config, 'DIAS_PROYECCION_MAX')
+        cls.variacion_diaria = tuple(valor_config(config, 'VARIACION_DIARIA'))
     
     def __init__(self, dispositivos, tarifa_kwh=1.5):
         self.dispositivos = dispositivos
         self.tarifa_kwh = tarifa_kwh
+        self._construir_matriz()
+    
+    def _construir_matriz(self):
+        """
+        Construye una vista columnar de los dispositivos (potencia y horas
+        como arreglos float64 contiguos) para que todos los cálculos se
+        hagan en una sola pasada vectorizada en lugar de llamar a los
+        métodos del modelo por cada dispositivo.
+        """
+        n = len(self.dispositivos)
+        self.nombres = [d.nombre for d in self.dispositivos]
+        self.indice_nombres = {nombre: i for i, nombre in enumerate(self.nombres)}
+        self.potencias = np.fromiter((d.potencia_watts for d in self.dispositivos), dtype=np.float64, count=n)
+        self.horas = np.fromiter((d.horas_uso_dia for d in self.dispositivos), dtype=np.float64, count=n)
         
+        # Mismo orden de operaciones que Dispositivo.consumo_*_kwh()
+        self.consumo_diario = (self.potencias * self.horas) / 1000
+        self.consumo_mensual = self.consumo_diario * 30
+        self.consumo_bimestral = self.consumo_mensual * 2
+        self._consumo_total = float(self.consumo_bimestral.sum())
+        
+    def huella(self, restriccion_ahorro=0.20, metodo='voraz'):
+        """
+        Huella estable (SHA-256) de todo lo que determina el resultado de
+        encontrar_punto_optimo: nombres, potencias, horas, tarifa, objetivo
+        de ahorro y método. Sirve como llave de caché.
+        """
+        h = hashlib.sha256()
+        h.update('\x1f'.join(self.nombres).encode('utf-8'))
+        h.update(self.potencias.tobytes())
+        h.update(self.horas.tobytes())
+        h.update(np.array([self.tarifa_kwh, restriccion_ahorro], dtype=np.float64).tobytes())
+        h.update(metodo.encode('utf-8'))
+        return h.hexdigest()
+    
     def consumo_total_actual(self):
         """Calcula el consumo total actual en kWh bimestral"""
-        return sum(d.consumo_bimestral_kwh() for d in self.dispositivos)
+        return self._consumo_total
     
     def costo_total_actual(self):
         """Calcula el costo total actual en pesos"""
@@ -20,81 +266,248 @@ class OptimizadorEnergetico:
     def calcular_consumo_por_dispositivo(self):
         """Retorna un diccionario con el consumo de cada dispositivo"""
         total_actual = self.consumo_total_actual()
+        costos = self.consumo_bimestral * self.tarifa_kwh
+        if total_actual > 0:
+            porcentajes = (self.consumo_bimestral / total_actual * 100).tolist()
+        else:
+            porcentajes = [0] * len(self.nombres)
         
+        columnas = zip(
+            self.nombres,
+            self.potencias.tolist(),
+            self.horas.tolist(),
+            self.consumo_diario.tolist(),
+            self.consumo_mensual.tolist(),
+            self.consumo_bimestral.tolist(),
+            costos.tolist(),
+            porcentajes
+        )
         return {
-            d.nombre: {
-                'potencia_watts': d.potencia_watts,
-                'horas_uso_dia': d.horas_uso_dia,
-                'consumo_diario_kwh': d.consumo_diario_kwh(),
-                'consumo_mensual_kwh': d.consumo_mensual_kwh(),
-                'consumo_bimestral_kwh': d.consumo_bimestral_kwh(),
-                'costo_bimestral': d.consumo_bimestral_kwh() * self.tarifa_kwh,
-                'porcentaje': (d.consumo_bimestral_kwh() / total_actual * 100) if total_actual > 0 else 0
+            nombre: {
+                'potencia_watts': potencia,
+                'horas_uso_dia': horas,
+                'consumo_diario_kwh': diario,
+                'consumo_mensual_kwh': mensual,
+                'consumo_bimestral_kwh': bimestral,
+                'costo_bimestral': costo,
+                'porcentaje': porcentaje
             }
-            for d in self.dispositivos
+            for nombre, potencia, horas, diario, mensual, bimestral, costo, porcentaje in columnas
         }
     
-    def encontrar_punto_optimo(self, restriccion_ahorro=0.20):
+    def encontrar_punto_optimo(self, restriccion_ahorro=0.20, metodo='voraz'):
         """
-        Encuentra el punto óptimo de consumo usando optimización (SLSQP).
+        Encuentra el punto óptimo de consumo.
+        
+        El objetivo (kWh bimestrales) es lineal en las horas de uso y las
+        restricciones son cotas por dispositivo más una desigualdad lineal,
+        así que por defecto se resuelve de forma exacta y cerrada.
+        
+        Args:
+            restriccion_ahorro: Fracción mínima de ahorro sobre el consumo actual
+            metodo: 'voraz' (cerrado, por defecto), 'lineal' (HiGHS) o 'slsqp'
+        
+        Returns:
+            dict: Configuración óptima por dispositivo
         """
         n_dispositivos = len(self.dispositivos)
         if n_dispositivos == 0:
             return {}
         
-        # Función objetivo: Minimizar consumo total (en kWh bimestrales)
-        def objetivo(horas_uso):
-            consumo_total = 0
-            for i, dispositivo in enumerate(self.dispositivos):
-                # (Watts * horas) / 1000 = kWh diarios
-                consumo_total += (dispositivo.potencia_watts * horas_uso[i]) / 1000
-            return consumo_total * 60  # Convertir a bimestral
-        
-       
-        limites = [(0, d.horas_uso_dia) for d in self.dispositivos]
+        if metodo not in METODOS_OPTIMIZACION:
+            raise ValueError(f'Método de optimización desconocido: {metodo}')
         
-        horas_iniciales = [d.horas_uso_dia for d in self.dispositivos]
+        # (Watts * horas) / 1000 = kWh diarios, * 60 = bimestral
+        kwh_por_hora = self.potencias * 60 / 1000
         
         consumo_actual = self.consumo_total_actual()
         consumo_objetivo = consumo_actual * (1 - restriccion_ahorro)
         
-        def restriccion_ahorro_func(horas_uso):
-            return consumo_objetivo - objetivo(horas_uso)
-        
-        restricciones = {'type': 'ineq', 'fun': restriccion_ahorro_func}
-        
         try:
-            resultado = minimize(
-                objetivo,
-                horas_iniciales,
-                method='SLSQP',
-                bounds=limites,
-                constraints=restricciones
+            horas_finales = METODOS_OPTIMIZACION[metodo](
+                kwh_por_hora, kwh_por_hora, self.horas, consumo_objetivo
             )
-            horas_finales = resultado.x
         except Exception:
-            horas_finales = [h * (1 - restriccion_ahorro) for h in horas_iniciales]
-
-        configuracion_optima = {}
-        for i, dispositivo in enumerate(self.dispositivos):
-            horas_optimas = max(0, horas_finales[i]) # Asegurar no negativos
-            reduccion_horas = dispositivo.horas_uso_dia - horas_optimas
-            
-            consumo_actual_disp = dispositivo.consumo_bimestral_kwh()
-            consumo_optimo_disp = (dispositivo.potencia_watts * horas_optimas * 60) / 1000
-            ahorro_disp = consumo_actual_disp - consumo_optimo_disp
-            
-            configuracion_optima[dispositivo.nombre] = {
-                'horas_actuales': round(dispositivo.horas_uso_dia, 2),
-                'horas_optimas': round(horas_optimas, 2),
-                'reduccion_horas': round(reduccion_horas, 2),
-                'consumo_actual_kwh': round(consumo_actual_disp, 2),
-                'consumo_optimo_kwh': round(consumo_optimo_disp, 2),
-                'ahorro_kwh': round(ahorro_disp, 2),
-                'ahorro_pesos': round(ahorro_disp * self.tarifa_kwh, 2)
+            horas_finales = self.horas * (1 - restriccion_ahorro)
+
+        return self._armar_configuracion(horas_finales)
+    
+    def frontera_ahorro(self, objetivos):
+        """
+        Calcula en una sola pasada la solución óptima para una rejilla de
+        objetivos de ahorro (frontera consumo/costo), en lugar de correr
+        encontrar_punto_optimo una vez por objetivo.
+        
+        Objetivos consecutivos con la misma solución se juntan en un solo
+        punto: con un costo proporcional al consumo el óptimo es apagar
+        todo sin importar el objetivo, y la frontera queda en un punto.
+        
+        Args:
+            objetivos: Secuencia de fracciones de ahorro (p. ej. las
+                opciones de GenerarReporteForm)
+        
+        Returns:
+            list: Un dict por solución distinta con los objetivos que la
+            alcanzan, horas óptimas, kWh y pesos
+        """
+        if len(self.dispositivos) == 0:
+            return []
+        
+        objetivos = np.asarray(objetivos, dtype=np.float64)
+        kwh_por_hora = self.potencias * 60 / 1000
+        consumo_actual = self.consumo_total_actual()
+        
+        horas, factible = resolver_voraz_parametrico(
+            kwh_por_hora, kwh_por_hora, self.horas, consumo_actual * (1 - objetivos)
+        )
+        horas = np.where(factible[:, None], horas, self.horas * (1 - objetivos[:, None]))
+        horas = np.maximum(horas, 0)
+        
+        # Inicio de cada grupo de objetivos consecutivos con las mismas horas
+        nuevo = np.ones(len(objetivos), dtype=bool)
+        nuevo[1:] = ~np.all(np.isclose(horas[1:], horas[:-1]), axis=1)
+        inicios = np.flatnonzero(nuevo)
+        grupos = np.split(objetivos, inicios[1:])
+        objetivos = objetivos[inicios]
+        horas = horas[inicios]
+        
+        consumo_optimizado = horas @ kwh_por_hora
+        ahorro_kwh = consumo_actual - consumo_optimizado
+        porcentaje = ahorro_kwh / consumo_actual * 100 if consumo_actual > 0 else np.zeros_like(ahorro_kwh)
+        
+        columnas = zip(
+            objetivos.tolist(),
+            grupos,
+            consumo_optimizado.tolist(),
+            ahorro_kwh.tolist(),
+            (ahorro_kwh * self.tarifa_kwh).tolist(),
+            porcentaje.tolist(),
+            horas.tolist()
+        )
+        return [
+            {
+                'objetivo_ahorro': objetivo,
+                'objetivos': grupo.tolist(),
+                'consumo_actual_kwh': round(consumo_actual, 2),
+                'consumo_optimizado_kwh': round(optimizado, 2),
+                'ahorro_kwh': round(ahorro, 2),
+                'ahorro_pesos': round(pesos, 2),
+                'porcentaje_ahorro': round(pct, 2),
+                'horas_optimas': {nombre: round(h, 2) for nombre, h in zip(self.nombres, fila)}
             }
+            for objetivo, grupo, optimizado, ahorro, pesos, pct, fila in columnas
+        ]
+    
+    def _armar_configuracion(self, horas_finales):
+        """
+        Convierte un vector de horas óptimas en el dict por dispositivo
+        que consumen las vistas, el PDF y las recomendaciones.
+        """
+        return dict(_configuracion_por_dispositivo(
+            self.nombres, self.horas, self.potencias, self.consumo_bimestral,
+            horas_finales, self.tarifa_kwh
+        ))
+    
+    @classmethod
+    def optimizar_lote(cls, hogares, restriccion_ahorro=0.20, tarifas=1.5):
+        """
+        configuracion_optima de muchos hogares; es un adaptador de
+        optimizar_lote_arreglos. Armar los dicts cuesta casi lo mismo que
+        resolver cada hogar por separado, así que para procesar muchos
+        hogares conviene usar los arreglos y convertir con
+        configuracion_de_lote solo los hogares que se muestran.
+        
+        Args:
+            hogares: Lista con la lista de dispositivos de cada hogar
+            restriccion_ahorro: Fracción de ahorro, única o una por hogar
+            tarifas: Tarifa por kWh, única o una por hogar
+        
+        Returns:
+            list: configuracion_optima de cada hogar, en el mismo orden
+        """
+        resultado = cls.optimizar_lote_arreglos(hogares, restriccion_ahorro, tarifas)
+        return [cls.configuracion_de_lote(resultado, i) for i in range(len(resultado['inicios']))]
+    
+    @classmethod
+    def optimizar_lote_arreglos(cls, hogares, restriccion_ahorro=0.20, tarifas=1.5):
+        """
+        Optimiza muchos hogares en una sola llamada.
+        
+        Los dispositivos de todos los hogares se concatenan en arreglos
+        segmentados y se resuelven juntos con resolver_voraz_lote, en lugar
+        de crear un optimizador y resolver un problema por usuario. No se
+        arma ningún dict: los totales por hogar salen con np.bincount.
+        
+        Args:
+            hogares: Lista con la lista de dispositivos de cada hogar
+            restriccion_ahorro: Fracción de ahorro, única o una por hogar
+            tarifas: Tarifa por kWh, única o una por hogar
+        
+        Returns:
+            dict: Arreglos por dispositivo (nombres, hogar, horas,
+            potencias, consumo_bimestral, horas_optimas, tarifa), inicios
+            y fines de cada hogar, y por hogar consumo_actual_kwh,
+            consumo_optimo_kwh, ahorro_kwh y ahorro_pesos
+        """
+        hogares = [list(dispositivos) for dispositivos in hogares]
+        n_hogares = len(hogares)
+        longitudes = np.fromiter((len(h) for h in hogares), dtype=np.intp, count=n_hogares)
+        hogar = np.repeat(np.arange(n_hogares), longitudes)
+        restriccion_ahorro = np.broadcast_to(np.asarray(restriccion_ahorro, dtype=np.float64), (n_hogares,))
+        tarifas = np.broadcast_to(np.asarray(tarifas, dtype=np.float64), (n_hogares,))
         
-        return configuracion_optima
+        lote = cls([d for dispositivos in hogares for d in dispositivos])
+        
+        # (Watts * horas) / 1000 = kWh diarios, * 60 = bimestral
+        kwh_por_hora = lote.potencias * 60 / 1000
+        consumo_actual = np.bincount(hogar, weights=lote.consumo_bimestral, minlength=n_hogares)
+        consumo_objetivo = consumo_actual * (1 - restriccion_ahorro)
+        
+        horas_finales, factible = resolver_voraz_lote(
+            kwh_por_hora, kwh_por_hora, lote.horas, consumo_objetivo, hogar
+        )
+        horas_finales = np.where(
+            factible[hogar], horas_finales, lote.horas * (1 - restriccion_ahorro[hogar])
+        )
+        horas_optimas = np.maximum(horas_finales, 0)
+        consumo_optimo = np.bincount(hogar, weights=kwh_por_hora * horas_optimas, minlength=n_hogares)
+        ahorro = consumo_actual - consumo_optimo
+        
+        fines = np.cumsum(longitudes)
+        return {
+            'nombres': lote.nombres,
+            'hogar': hogar,
+            'horas': lote.horas,
+            'potencias': lote.potencias,
+            'consumo_bimestral': lote.consumo_bimestral,
+            'horas_optimas': horas_optimas,
+            'tarifa': tarifas[hogar],
+            'inicios': fines - longitudes,
+            'fines': fines,
+            'consumo_actual_kwh': consumo_actual,
+            'consumo_optimo_kwh': consumo_optimo,
+            'ahorro_kwh': ahorro,
+            'ahorro_pesos': ahorro * tarifas
+        }
+    
+    @staticmethod
+    def configuracion_de_lote(resultado, indice):
+        """
+        configuracion_optima de un hogar de optimizar_lote_arreglos
+        
+        Args:
+            resultado: Dict que regresa optimizar_lote_arreglos
+            indice: Posición del hogar en la lista original
+        
+        Returns:
+            dict: Igual que encontrar_punto_optimo para ese hogar
+        """
+        tramo = slice(int(resultado['inicios'][indice]), int(resultado['fines'][indice]))
+        return dict(_configuracion_por_dispositivo(
+            resultado['nombres'][tramo], resultado['horas'][tramo], resultado['potencias'][tramo],
+            resultado['consumo_bimestral'][tramo], resultado['horas_optimas'][tramo],
+            resultado['tarifa'][tramo]
+        ))
     
     def calcular_ahorro_total(self, configuracion_optima):
         ahorro_total_kwh = sum(config['ahorro_kwh'] for config in configuracion_optima.values())
@@ -109,46 +522,128 @@ class OptimizadorEnergetico:
             'porcentaje_ahorro': round((ahorro_total_kwh / consumo_actual * 100) if consumo_actual > 0 else 0, 2)
         }
     
-    def proyectar_consumo(self, dias=30):
-        consumo_diario = sum(d.consumo_diario_kwh() for d in self.dispositivos)
-        proyeccion = []
-        fecha_inicio = datetime.now()
-        
-        for i in range(dias):
-            variacion = np.random.uniform(0.9, 1.1)
-            consumo = consumo_diario * variacion
-            fecha = fecha_inicio + timedelta(days=i)
-            proyeccion.append({
-                'fecha': fecha.strftime('%Y-%m-%d'),
+    def proyectar_consumo(self, dias=30, semilla=None):
+        """
+        Proyección diaria como lista de dicts (formato usado por las vistas
+        y las gráficas); es un adaptador de proyectar_consumo_arreglos.
+        """
+        proyeccion = self.proyectar_consumo_arreglos(dias, semilla=semilla)
+        columnas = zip(
+            np.datetime_as_string(proyeccion['fechas']).tolist(),
+            proyeccion['consumo_kwh'].tolist(),
+            proyeccion['costo'].tolist(),
+            proyeccion['costo_horario'].tolist()
+        )
+        return [
+            {
+                'fecha': fecha,
                 'consumo_kwh': round(consumo, 2),
-                'costo': round(consumo * self.tarifa_kwh, 2)
-            })
-        return proyeccion
+                'costo': round(costo, 2),
+                'costo_horario': round(costo_horario, 2)
+            }
+            for fecha, consumo, costo, costo_horario in columnas
+        ]
     
-    def calcular_rango_cobro_bimestral(self, consumo_kwh):
-        if consumo_kwh <= 150: tarifa = 0.82
-        elif consumo_kwh <= 280: tarifa = 1.05
-        elif consumo_kwh <= 400: tarifa = 1.35
-        elif consumo_kwh <= 600: tarifa = 1.85
-        else: tarifa = 2.85
+    def proyectar_consumo_arreglos(self, dias=30, semilla=None, trayectorias=None, fecha_inicio=None,
+                                   historial=None):
+        """
+        Proyección diaria reproducible y vectorizada.
         
-        costo_base = consumo_kwh * tarifa
+        Args:
+            dias: Días a proyectar (1 a DIAS_PROYECCION_MAX de Config)
+            semilla: Entero, numpy.random.Generator o None
+            trayectorias: Si se da K, genera K trayectorias en un solo sorteo
+            fecha_inicio: Fecha del primer día (hoy por defecto)
+            historial: kWh diarios medidos (p. ej. SerieMapeada.diario()['kwh']);
+                si se da, cada día se sortea de los días observados en lugar
+                de variar el consumo estimado de los dispositivos
+        
+        Returns:
+            dict: 'fechas' (datetime64[D]), 'consumo_kwh', 'costo' (tarifa
+            plana) y 'costo_horario' (precios por ventana de
+            SimuladorCargaHoraria según el perfil horario de los
+            dispositivos y el día de la semana); los tres con forma (dias,)
+            o (trayectorias, dias)
+        """
+        if self.dias_proyeccion_max is None:
+            raise RuntimeError('OptimizadorEnergetico sin configurar: llame a OptimizadorEnergetico.configurar(Config)')
+        if not 1 <= dias <= self.dias_proyeccion_max:
+            raise ValueError(f'Los días deben estar entre 1 y {self.dias_proyeccion_max}')
+        
+        rng = np.random.default_rng(semilla)
+        if fecha_inicio is None:
+            fecha_inicio = datetime.now().date()
+        fechas = np.datetime64(fecha_inicio, 'D') + np.arange(dias)
+        
+        forma = dias if trayectorias is None else (trayectorias, dias)
+        if historial is not None:
+            observados = np.asarray(historial, dtype=np.float64)
+            observados = observados[~np.isnan(observados)]
+            if not len(observados):
+                raise ValueError('El historial no tiene días con lecturas')
+            consumo = rng.choice(observados, size=forma)
+        else:
+            consumo = float(self.consumo_diario.sum()) * rng.uniform(*self.variacion_diaria, size=forma)
+        perfil = simulador_horario.perfil_diario(self.potencias, self.horas, [d.tipo for d in self.dispositivos])
+        precio_dia = simulador_horario.precio_medio_diario(perfil, fecha_inicio, dias)
         return {
-            'consumo_kwh': round(consumo_kwh, 2),
-            'tarifa_aplicada': tarifa,
-            'costo_estimado': round(costo_base, 2),
-            'rango_minimo': round(costo_base * 0.95, 2),
-            'rango_maximo': round(costo_base * 1.05, 2)
+            'fechas': fechas,
+            'consumo_kwh': consumo,
+            'costo': consumo * self.tarifa_kwh,
+            'costo_horario': consumo * precio_dia
+        }
+    
+    def bandas_proyeccion(self, dias=30, trayectorias=1000, semilla=None, percentiles=(10, 50, 90),
+                          historial=None):
+        """
+        Bandas de percentiles (P10/P50/P90 por defecto) del consumo y costo
+        diario y acumulado, a partir de un ensamble de trayectorias
+        (historial como en proyectar_consumo_arreglos).
+        
+        Returns:
+            dict: 'fechas', 'percentiles' y, para 'consumo_kwh', 'costo',
+            'costo_horario', 'consumo_acumulado_kwh', 'costo_acumulado' y
+            'costo_horario_acumulado', una matriz (len(percentiles), dias)
+        """
+        ensamble = self.proyectar_consumo_arreglos(dias, semilla=semilla, trayectorias=trayectorias,
+                                                   historial=historial)
+        consumo = np.percentile(ensamble['consumo_kwh'], percentiles, axis=0)
+        consumo_acumulado = np.percentile(np.cumsum(ensamble['consumo_kwh'], axis=1), percentiles, axis=0)
+        return {
+            'fechas': ensamble['fechas'],
+            'percentiles': tuple(percentiles),
+            'consumo_kwh': consumo,
+            'costo': consumo * self.tarifa_kwh,
+            'consumo_acumulado_kwh': consumo_acumulado,
+            'costo_acumulado': consumo_acumulado * self.tarifa_kwh,
+            'costo_horario': np.percentile(ensamble['costo_horario'], percentiles, axis=0),
+            'costo_horario_acumulado': np.percentile(np.cumsum(ensamble['costo_horario'], axis=1),
+                                                     percentiles, axis=0)
+        }
+    
+    def calcular_rango_cobro_bimestral(self, consumo_kwh):
+        """
+        Estima el recibo bimestral con la tarifa escalonada por bloques
+        (ver services.tarifas.MotorTarifario para arreglos de consumos)
+        """
+        rango = motor_tarifario.rango_cobro(consumo_kwh)
+        return {
+            'consumo_kwh': round(float(consumo_kwh), 2),
+            'tarifa_aplicada': float(rango['tarifa_aplicada']),
+            'costo_estimado': round(float(rango['costo_estimado']), 2),
+            'rango_minimo': round(float(rango['rango_minimo']), 2),
+            'rango_maximo': round(float(rango['rango_maximo']), 2)
         }
     
     def calcular_energia_acumulada(self, intervalo='dia'):
         multiplicador = {'dia': 1, 'semana': 7, 'mes': 30}.get(intervalo, 1)
-        energia_acumulada = {}
-        for dispositivo in self.dispositivos:
-            consumo_intervalo = dispositivo.consumo_diario_kwh() * multiplicador
-            energia_acumulada[dispositivo.nombre] = {
-                'consumo_kwh': round(consumo_intervalo, 2),
-                'costo': round(consumo_intervalo * self.tarifa_kwh, 2),
+        consumo_intervalo = self.consumo_diario * multiplicador
+        costo_intervalo = consumo_intervalo * self.tarifa_kwh
+        return {
+            nombre: {
+                'consumo_kwh': round(consumo, 2),
+                'costo': round(costo, 2),
                 'intervalo': intervalo
             }
-        return energia_acumulada
\ No newline at end of file
+            for nombre, consumo, costo in zip(self.nombres, consumo_intervalo.tolist(), costo_intervalo.tolist())
+        }
\ No newline at end of file
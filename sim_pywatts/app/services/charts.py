@@ -1,61 +1,302 @@
-import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')  # Backend no interactivo para servidor
+import matplotlib.style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import io
 import base64
-from datetime import datetime, timedelta
+import itertools
+import threading
+from collections import OrderedDict
 import numpy as np
 
+from services.cache import CacheGraficas
+
+
+ESTILO = 'seaborn-v0_8-darkgrid'
+DPI = 100
+FORMATO = 'png'
+
+# Subir cuando cambie el dibujo o el JSON de alguna gráfica para no
+# reutilizar imágenes viejas de la caché en disco ni ETags del navegador
+VERSION_GRAFICAS = 3
+
+# Plantillas de figura guardadas por hilo
+MAX_PLANTILLAS = 32
+
+# Dispositivos en "Top 5 Potencial de Ahorro" del dashboard
+TOP_AHORRO = 5
+
+# El estilo se aplica una sola vez (rcParams del proceso); las figuras se
+# crean con Figure/FigureCanvasAgg, sin el estado global de pyplot
+matplotlib.style.use(ESTILO)
+# Mismos ids en el SVG en cada dibujo (y en cada proceso) para que la
+# imagen dependa solo de sus datos
+matplotlib.rcParams['svg.hashsalt'] = 'pywatts'
+
+_hilos = threading.local()
+
+
+def _nueva_figura(figsize):
+    """Figure con su propio lienzo Agg"""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _plantilla(llave, crear):
+    """
+    Plantilla del hilo actual para la llave (tipo de gráfica y número de
+    elementos), creándola con crear() la primera vez. Cada hilo tiene sus
+    propias figuras, así que ninguna se dibuja desde dos hilos a la vez.
+    """
+    plantillas = getattr(_hilos, 'plantillas', None)
+    if plantillas is None:
+        plantillas = _hilos.plantillas = OrderedDict()
+    plantilla = plantillas.get(llave)
+    if plantilla is None:
+        plantilla = plantillas[llave] = crear()
+        while len(plantillas) > MAX_PLANTILLAS:
+            plantillas.popitem(last=False)
+    plantillas.move_to_end(llave)
+    return plantilla
+
+
+class _PlantillaBarras:
+    """
+    Barras ya creadas sobre un eje; en cada gráfica solo se actualizan
+    alturas (o anchos), colores, etiquetas del eje y textos de valor
+    """
+    
+    def __init__(self, ax, n, horizontal=False, ancho=0.8, estilo_texto=None):
+        self.ax = ax
+        self.fig = ax.figure
+        self.horizontal = horizontal
+        posiciones = np.arange(n)
+        if horizontal:
+            self.barras = ax.barh(posiciones, np.zeros(n), height=ancho)
+        else:
+            self.barras = ax.bar(posiciones, np.zeros(n), width=ancho)
+        self.textos = [ax.text(0, 0, '', **estilo_texto) for _ in range(n)] if estilo_texto else []
+        self.extra = None
+    
+    def actualizar(self, etiquetas, valores, colores, formato=None, rotacion=0):
+        for barra, valor, color in zip(self.barras, valores, itertools.cycle(colores)):
+            barra.set_facecolor(color)
+            if self.horizontal:
+                barra.set_width(valor)
+            else:
+                barra.set_height(valor)
+        for barra, valor, texto in zip(self.barras, valores, self.textos):
+            if self.horizontal:
+                texto.set_position((valor, barra.get_y() + barra.get_height() / 2.))
+            else:
+                texto.set_position((barra.get_x() + barra.get_width() / 2., valor))
+            texto.set_text(formato.format(valor))
+        
+        posiciones = np.arange(len(etiquetas))
+        if self.horizontal:
+            self.ax.set_yticks(posiciones, labels=etiquetas)
+        else:
+            self.ax.set_xticks(posiciones, labels=etiquetas, rotation=rotacion,
+                               ha='right' if rotacion else 'center')
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+
+def _texto_barras(**estilo):
+    return dict(ha='center', va='bottom', fontweight='bold', **estilo)
+
+
+def _crear_barras(figsize, n, xlabel=None, ylabel=None, titulo=None, **opciones):
+    fig = _nueva_figura(figsize)
+    ax = fig.add_subplot()
+    plantilla = _PlantillaBarras(ax, n, **opciones)
+    if xlabel:
+        ax.set_xlabel(xlabel, fontsize=12, fontweight='bold')
+    if ylabel:
+        ax.set_ylabel(ylabel, fontsize=12, fontweight='bold')
+    if titulo:
+        ax.set_title(titulo, fontsize=14, fontweight='bold')
+    return plantilla
+
+
+def _ajustar(fig):
+    """
+    tight_layout partiendo de los márgenes por omisión, para que una
+    figura reutilizada quede igual que una nueva con los mismos datos
+    """
+    fig.subplots_adjust(**{
+        margen: matplotlib.rcParams[f'figure.subplot.{margen}']
+        for margen in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+    })
+    fig.tight_layout()
+
+
+def _orden(valores):
+    """Índices de mayor a menor valor, el orden en que se dibujan las barras"""
+    return np.argsort(valores)[::-1]
+
+
+def _crear_eje(figsize):
+    return _nueva_figura(figsize).add_subplot()
+
+
 class GeneradorGraficas:
     """
     Generas para visualización de consumo energético
+    
+    Cada gráfica primero extrae los datos que dibuja; con una
+    CacheGraficas la imagen se busca por el hash de esos datos (más
+    estilo, DPI y formato) y matplotlib solo se usa en los fallos.
+    
+    Las gráficas de barras reutilizan figuras ya configuradas por hilo y
+    tamaño y solo actualizan sus barras y textos; pastel y línea (y el
+    pastel del dashboard) se crean cada vez porque sus artistas dependen
+    de los datos. Es seguro usar el generador desde varios hilos a la vez.
     """
     
-    def __init__(self):
-        
-        plt.style.use('seaborn-v0_8-darkgrid')
+    def __init__(self, cache=None, dpi=DPI, formato=FORMATO):
+        """
+        Args:
+            cache: CacheGraficas compartida (opcional)
+            dpi: Resolución de las imágenes
+            formato: 'png' o 'svg' ('json' solo para la llave de los datos)
+        """
         self.colores = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E2']
+        self.cache = cache
+        self.dpi = dpi
+        self.formato = formato
     
-    def _fig_to_base64(self, fig):
-        """Convierte una figura de matplotlib a base64"""
+    def _fig_a_bytes(self, fig):
+        """Serializa una figura de matplotlib"""
         buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight', dpi=100)
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        return img_base64
+        # Sin fecha en los metadatos del SVG
+        metadata = {'Date': None} if self.formato == 'svg' else None
+        fig.savefig(buf, format=self.formato, bbox_inches='tight', dpi=self.dpi, metadata=metadata)
+        return buf.getvalue()
     
-    def grafica_consumo_por_dispositivo(self, consumo_dispositivos):
+    def llave(self, tipo, datos):
+        """Hash de los datos de la gráfica, versión, estilo, DPI y formato"""
+        return CacheGraficas.llave([tipo, VERSION_GRAFICAS], datos, ESTILO, self.dpi, self.formato)
+    
+    def preparar(self, tipo, *argumentos):
         """
-        Genera de barras del consumo por dispositivo
+        Extrae los datos que dibujaría grafica_<tipo>, sin dibujar
         
         Args:
-            consumo_dispositivos: Dict con consumo de cada dispositivo
+            tipo: Nombre de la gráfica sin 'grafica_' (ej. 'pie_distribucion')
+            argumentos: Los del método grafica_<tipo>
         
         Returns:
-            str: Imagen en base64
+            tuple: (llave de la imagen, datos para imagen())
+        """
+        datos = getattr(self, f'_datos_{tipo}')(*argumentos)
+        return self.llave(tipo, datos), datos
+    
+    def imagen(self, tipo, datos):
         """
-        fig, ax = plt.subplots(figsize=(10, 6))
+        Bytes de la gráfica, desde la caché o dibujada en este proceso
         
-        dispositivos = list(consumo_dispositivos.keys())
-        consumos = [data['consumo_bimestral_kwh'] for data in consumo_dispositivos.values()]
+        Returns:
+            bytes: Imagen en el formato del generador
+        """
+        if self.cache is None:
+            return self.dibujar(tipo, datos)
+        llave = self.llave(tipo, datos)
+        contenido = self.cache.obtener(llave)
+        if contenido is None:
+            contenido = self.dibujar(tipo, datos)
+            self.cache.guardar(llave, contenido)
+        return contenido
+    
+    def dibujar(self, tipo, datos):
+        """
+        Dibuja una gráfica en este proceso, sin caché
+        
+        Args:
+            tipo: Nombre de la gráfica sin 'grafica_' (ej. 'pie_distribucion')
+            datos: Lo que regresa su _datos_<tipo>
+        
+        Returns:
+            bytes: Imagen en el formato del generador
+        """
+        return self._fig_a_bytes(getattr(self, f'_dibujar_{tipo}')(datos))
+    
+    def _renderizar(self, tipo, datos):
+        """
+        Imagen en base64 de la gráfica, desde la caché si ya se dibujó
+        con los mismos datos
+        """
+        return base64.b64encode(self.imagen(tipo, datos)).decode('utf-8')
+    
+    def _serie(self, etiquetas, valores, titulo, unidad, colores=None, porcentajes=True, **extra):
+        """
+        Serie de una gráfica lista para JSON
         
-        barras = ax.bar(dispositivos, consumos, color=self.colores[:len(dispositivos)])
+        Args:
+            porcentajes: Incluir la parte del total de cada valor; solo tiene
+                sentido si los valores son partes de un mismo total (no en
+                series que ya son porcentajes, comparativas o en el tiempo)
         
-        ax.set_xlabel('Dispositivos', fontsize=12, fontweight='bold')
-        ax.set_ylabel('Consumo (kWh)', fontsize=12, fontweight='bold')
-        ax.set_title('Consumo Energético Bimestral por Dispositivo', fontsize=14, fontweight='bold')
-        plt.xticks(rotation=45, ha='right')
+        Returns:
+            dict: 'titulo', 'unidad', 'etiquetas', 'valores', 'orden' (índices
+                de mayor a menor, como en las barras), 'colores' (uno por
+                valor), 'porcentajes' del total si se piden y los campos de extra
+        """
+        colores = colores or self.colores
+        serie = {
+            'titulo': titulo,
+            'unidad': unidad,
+            'etiquetas': list(etiquetas),
+            'valores': [round(float(valor), 3) for valor in valores],
+            'orden': _orden(valores).tolist(),
+            'colores': [colores[i % len(colores)] for i in range(len(valores))]
+        }
+        if porcentajes:
+            total = float(np.sum(valores))
+            serie['porcentajes'] = [round(float(valor) / total * 100, 2) if total else 0.0 for valor in valores]
+        serie.update(extra)
+        return serie
+    
+    def grafica_consumo_por_dispositivo(self, consumo_dispositivos):
+        """
+        Genera de barras del consumo por dispositivo
         
-       
-        for barra in barras:
-            altura = barra.get_height()
-            ax.text(barra.get_x() + barra.get_width()/2., altura,
-                   f'{altura:.1f}',
-                   ha='center', va='bottom', fontweight='bold')
+        Args:
+            consumo_dispositivos: Dict con consumo de cada dispositivo
         
-        plt.tight_layout()
-        return self._fig_to_base64(fig)
+        Returns:
+            str: Imagen en base64
+        """
+        return self._renderizar('consumo_por_dispositivo', self._datos_consumo_por_dispositivo(consumo_dispositivos))
+    
+    def datos_consumo_por_dispositivo(self, consumo_dispositivos):
+        """
+        Datos de grafica_consumo_por_dispositivo sin dibujar, para la vista web
+        
+        Returns:
+            dict: Serie para JSON (ver _serie)
+        """
+        datos = self._datos_consumo_por_dispositivo(consumo_dispositivos)
+        return self._serie(datos['dispositivos'], datos['consumos'],
+                           'Consumo Energético Bimestral por Dispositivo', 'kWh')
+    
+    def _datos_consumo_por_dispositivo(self, consumo_dispositivos):
+        return {
+            'dispositivos': list(consumo_dispositivos.keys()),
+            'consumos': [data['consumo_bimestral_kwh'] for data in consumo_dispositivos.values()]
+        }
+    
+    def _dibujar_consumo_por_dispositivo(self, datos):
+        dispositivos = datos['dispositivos']
+        plantilla = _plantilla(('consumo_por_dispositivo', len(dispositivos)), lambda: _crear_barras(
+            (10, 6), len(dispositivos), 'Dispositivos', 'Consumo (kWh)',
+            'Consumo Energético Bimestral por Dispositivo', estilo_texto=_texto_barras()
+        ))
+        plantilla.actualizar(dispositivos, datos['consumos'], self.colores, '{:.1f}', rotacion=45)
+        _ajustar(plantilla.fig)
+        return plantilla.fig
     
     def grafica_pie_distribucion(self, consumo_dispositivos):
         """
@@ -67,21 +308,38 @@ class GeneradorGraficas:
         Returns:
             str: Imagen en base64
         """
-        fig, ax = plt.subplots(figsize=(10, 8))
+        return self._renderizar('pie_distribucion', self._datos_pie_distribucion(consumo_dispositivos))
+    
+    def datos_pie_distribucion(self, consumo_dispositivos):
+        """
+        Datos de grafica_pie_distribucion sin dibujar, para la vista web
+        
+        Returns:
+            dict: Serie para JSON (ver _serie)
+        """
+        datos = self._datos_pie_distribucion(consumo_dispositivos)
+        return self._serie(datos['dispositivos'], datos['porcentajes'],
+                           'Distribución del Consumo Energético', '%', porcentajes=False)
+    
+    def _datos_pie_distribucion(self, consumo_dispositivos):
+        return {
+            'dispositivos': list(consumo_dispositivos.keys()),
+            'porcentajes': [data['porcentaje'] for data in consumo_dispositivos.values()]
+        }
+    
+    def _dibujar_pie_distribucion(self, datos):
+        ax = _crear_eje((10, 8))
         
-        dispositivos = list(consumo_dispositivos.keys())
-        porcentajes = [data['porcentaje'] for data in consumo_dispositivos.values()]
+        dispositivos = datos['dispositivos']
         
-       
         wedges, texts, autotexts = ax.pie(
-            porcentajes,
+            datos['porcentajes'],
             labels=dispositivos,
             autopct='%1.1f%%',
             startangle=90,
             colors=self.colores[:len(dispositivos)]
         )
         
-        
         for autotext in autotexts:
             autotext.set_color('white')
             autotext.set_fontweight('bold')
@@ -92,8 +350,8 @@ class GeneradorGraficas:
         
         ax.set_title('Distribución del Consumo Energético', fontsize=14, fontweight='bold')
         
-        plt.tight_layout()
-        return self._fig_to_base64(fig)
+        _ajustar(ax.figure)
+        return ax.figure
     
     def grafica_comparativa_antes_despues(self, ahorro_total):
         """
@@ -105,35 +363,47 @@ class GeneradorGraficas:
         Returns:
             str: Imagen en base64
         """
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        categorias = ['Consumo Actual', 'Consumo Optimizado']
-        valores = [
-            ahorro_total['consumo_actual_kwh'],
-            ahorro_total['consumo_optimizado_kwh']
-        ]
-        
-        barras = ax.bar(categorias, valores, color=['#FF6B6B', '#4ECDC4'], width=0.5)
-        
-        ax.set_ylabel('Consumo (kWh)', fontsize=12, fontweight='bold')
-        ax.set_title('Comparativa: Consumo Actual vs Optimizado', fontsize=14, fontweight='bold')
+        return self._renderizar('comparativa_antes_despues', self._datos_comparativa_antes_despues(ahorro_total))
+    
+    def datos_comparativa_antes_despues(self, ahorro_total):
+        """
+        Datos de grafica_comparativa_antes_despues sin dibujar, para la vista web
         
-       
-        for i, barra in enumerate(barras):
-            altura = barra.get_height()
-            ax.text(barra.get_x() + barra.get_width()/2., altura,
-                   f'{altura:.1f} kWh',
-                   ha='center', va='bottom', fontweight='bold', fontsize=11)
+        Returns:
+            dict: Serie para JSON (ver _serie)
+        """
+        datos = self._datos_comparativa_antes_despues(ahorro_total)
+        return self._serie(['Consumo Actual', 'Consumo Optimizado'], datos['valores'],
+                           'Comparativa: Consumo Actual vs Optimizado', 'kWh', ['#FF6B6B', '#4ECDC4'],
+                           porcentajes=False, ahorro_kwh=round(datos['ahorro_kwh'], 3),
+                           porcentaje_ahorro=round(datos['porcentaje_ahorro'], 2))
+    
+    def _datos_comparativa_antes_despues(self, ahorro_total):
+        return {
+            'valores': [ahorro_total['consumo_actual_kwh'], ahorro_total['consumo_optimizado_kwh']],
+            'ahorro_kwh': ahorro_total['ahorro_kwh'],
+            'porcentaje_ahorro': ahorro_total['porcentaje_ahorro']
+        }
+    
+    def _crear_comparativa(self):
+        plantilla = _crear_barras((10, 6), 2, ylabel='Consumo (kWh)',
+                                  titulo='Comparativa: Consumo Actual vs Optimizado',
+                                  ancho=0.5, estilo_texto=_texto_barras(fontsize=11))
+        plantilla.extra = plantilla.ax.text(0.5, 0, '', ha='center', fontsize=13, fontweight='bold',
+                                            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        return plantilla
+    
+    def _dibujar_comparativa_antes_despues(self, datos):
+        plantilla = _plantilla(('comparativa_antes_despues',), self._crear_comparativa)
+        valores = datos['valores']
+        plantilla.actualizar(['Consumo Actual', 'Consumo Optimizado'], valores,
+                             ['#FF6B6B', '#4ECDC4'], '{:.1f} kWh')
         
-      
-        ahorro = ahorro_total['ahorro_kwh']
-        ax.text(0.5, max(valores) * 0.5, 
-               f'Ahorro: {ahorro:.1f} kWh\n({ahorro_total["porcentaje_ahorro"]:.1f}%)',
-               ha='center', fontsize=13, fontweight='bold',
-               bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        plantilla.extra.set_position((0.5, max(valores) * 0.5))
+        plantilla.extra.set_text(f'Ahorro: {datos["ahorro_kwh"]:.1f} kWh\n({datos["porcentaje_ahorro"]:.1f}%)')
         
-        plt.tight_layout()
-        return self._fig_to_base64(fig)
+        _ajustar(plantilla.fig)
+        return plantilla.fig
     
     def grafica_proyeccion_consumo(self, proyeccion):
         """
@@ -145,31 +415,49 @@ class GeneradorGraficas:
         Returns:
             str: Imagen en base64
         """
-        fig, ax = plt.subplots(figsize=(12, 6))
+        return self._renderizar('proyeccion_consumo', self._datos_proyeccion_consumo(proyeccion))
+    
+    def datos_proyeccion_consumo(self, proyeccion):
+        """
+        Datos de grafica_proyeccion_consumo sin dibujar, para la vista web
+        
+        Returns:
+            dict: Serie para JSON (ver _serie)
+        """
+        datos = self._datos_proyeccion_consumo(proyeccion)
+        promedio = float(np.mean(datos['consumos'])) if datos['consumos'] else 0.0
+        return self._serie(datos['fechas'], datos['consumos'], 'Proyección de Consumo Energético', 'kWh',
+                           ['#4ECDC4'], porcentajes=False, promedio=round(promedio, 3))
+    
+    def _datos_proyeccion_consumo(self, proyeccion):
+        return {
+            'fechas': [item['fecha'] for item in proyeccion],
+            'consumos': [item['consumo_kwh'] for item in proyeccion]
+        }
+    
+    def _dibujar_proyeccion_consumo(self, datos):
+        ax = _crear_eje((12, 6))
         
-        fechas = [item['fecha'] for item in proyeccion]
-        consumos = [item['consumo_kwh'] for item in proyeccion]
+        fechas = datos['fechas']
+        consumos = datos['consumos']
         
-       
-        ax.plot(fechas, consumos, marker='o', linewidth=2, markersize=4, color='#4ECDC4')
+        ax.plot(range(len(fechas)), consumos, marker='o', linewidth=2, markersize=4, color='#4ECDC4')
         ax.fill_between(range(len(fechas)), consumos, alpha=0.3, color='#4ECDC4')
         
         ax.set_xlabel('Fecha', fontsize=12, fontweight='bold')
         ax.set_ylabel('Consumo Diario (kWh)', fontsize=12, fontweight='bold')
         ax.set_title('Proyección de Consumo Energético', fontsize=14, fontweight='bold')
         
-       
         paso = max(1, len(fechas) // 10)
         ax.set_xticks(range(0, len(fechas), paso))
         ax.set_xticklabels([fechas[i] for i in range(0, len(fechas), paso)], rotation=45, ha='right')
         
-      
         promedio = np.mean(consumos)
         ax.axhline(y=promedio, color='#FF6B6B', linestyle='--', linewidth=2, label=f'Promedio: {promedio:.2f} kWh')
         ax.legend()
         
-        plt.tight_layout()
-        return self._fig_to_base64(fig)
+        _ajustar(ax.figure)
+        return ax.figure
     
     def grafica_costo_por_dispositivo(self, consumo_dispositivos):
         """
@@ -181,31 +469,40 @@ class GeneradorGraficas:
         Returns:
             str: Imagen en base64
         """
-        fig, ax = plt.subplots(figsize=(10, 8))
-        
-        dispositivos = list(consumo_dispositivos.keys())
-        costos = [data['costo_bimestral'] for data in consumo_dispositivos.values()]
+        return self._renderizar('costo_por_dispositivo', self._datos_costo_por_dispositivo(consumo_dispositivos))
+    
+    def datos_costo_por_dispositivo(self, consumo_dispositivos):
+        """
+        Datos de grafica_costo_por_dispositivo sin dibujar, para la vista web
         
+        Returns:
+            dict: Serie para JSON (ver _serie)
+        """
+        datos = self._datos_costo_por_dispositivo(consumo_dispositivos)
+        return self._serie(datos['dispositivos'], datos['costos'], 'Costo por Dispositivo', '$')
+    
+    def _datos_costo_por_dispositivo(self, consumo_dispositivos):
+        return {
+            'dispositivos': list(consumo_dispositivos.keys()),
+            'costos': [data['costo_bimestral'] for data in consumo_dispositivos.values()]
+        }
+    
+    def _dibujar_costo_por_dispositivo(self, datos):
+        dispositivos = datos['dispositivos']
+        costos = datos['costos']
         
-        indices = np.argsort(costos)[::-1]
+        indices = _orden(costos)
         dispositivos_ordenados = [dispositivos[i] for i in indices]
         costos_ordenados = [costos[i] for i in indices]
         
-        barras = ax.barh(dispositivos_ordenados, costos_ordenados, color=self.colores[:len(dispositivos)])
-        
-        ax.set_xlabel('Costo Bimestral ($)', fontsize=12, fontweight='bold')
-        ax.set_title('Costo por Dispositivo', fontsize=14, fontweight='bold')
-        
-       
-        for i, barra in enumerate(barras):
-            ancho = barra.get_width()
-            ax.text(ancho, barra.get_y() + barra.get_height()/2.,
-                   f'${ancho:.2f}',
-                   ha='left', va='center', fontweight='bold', fontsize=10, 
-                   bbox=dict(boxstyle='round', facecolor='white', alpha=0.7))
-        
-        plt.tight_layout()
-        return self._fig_to_base64(fig)
+        plantilla = _plantilla(('costo_por_dispositivo', len(dispositivos)), lambda: _crear_barras(
+            (10, 8), len(dispositivos), 'Costo Bimestral ($)', titulo='Costo por Dispositivo', horizontal=True,
+            estilo_texto=dict(ha='left', va='center', fontweight='bold', fontsize=10,
+                              bbox=dict(boxstyle='round', facecolor='white', alpha=0.7))
+        ))
+        plantilla.actualizar(dispositivos_ordenados, costos_ordenados, self.colores, '${:.2f}')
+        _ajustar(plantilla.fig)
+        return plantilla.fig
     
     def grafica_ahorro_por_dispositivo(self, configuracion_optima):
         """
@@ -217,32 +514,40 @@ class GeneradorGraficas:
         Returns:
             str: Imagen en base64
         """
-        fig, ax = plt.subplots(figsize=(10, 6))
+        return self._renderizar('ahorro_por_dispositivo', self._datos_ahorro_por_dispositivo(configuracion_optima))
+    
+    def datos_ahorro_por_dispositivo(self, configuracion_optima):
+        """
+        Datos de grafica_ahorro_por_dispositivo sin dibujar, para la vista web
         
-        dispositivos = list(configuracion_optima.keys())
-        ahorros = [config['ahorro_pesos'] for config in configuracion_optima.values()]
+        Returns:
+            dict: Serie para JSON (ver _serie)
+        """
+        datos = self._datos_ahorro_por_dispositivo(configuracion_optima)
+        return self._serie(datos['dispositivos'], datos['ahorros'], 'Potencial de Ahorro por Dispositivo', '$',
+                           ['#4ECDC4'])
+    
+    def _datos_ahorro_por_dispositivo(self, configuracion_optima):
+        return {
+            'dispositivos': list(configuracion_optima.keys()),
+            'ahorros': [config['ahorro_pesos'] for config in configuracion_optima.values()]
+        }
+    
+    def _dibujar_ahorro_por_dispositivo(self, datos):
+        dispositivos = datos['dispositivos']
+        ahorros = datos['ahorros']
         
-       
-        indices = np.argsort(ahorros)[::-1]
+        indices = _orden(ahorros)
         dispositivos_ordenados = [dispositivos[i] for i in indices]
         ahorros_ordenados = [ahorros[i] for i in indices]
         
-        barras = ax.bar(dispositivos_ordenados, ahorros_ordenados, color='#4ECDC4')
-        
-        ax.set_xlabel('Dispositivos', fontsize=12, fontweight='bold')
-        ax.set_ylabel('Ahorro Potencial ($)', fontsize=12, fontweight='bold')
-        ax.set_title('Potencial de Ahorro por Dispositivo', fontsize=14, fontweight='bold')
-        plt.xticks(rotation=45, ha='right')
-        
-        
-        for barra in barras:
-            altura = barra.get_height()
-            ax.text(barra.get_x() + barra.get_width()/2., altura,
-                   f'${altura:.2f}',
-                   ha='center', va='bottom', fontweight='bold')
-        
-        plt.tight_layout()
-        return self._fig_to_base64(fig)
+        plantilla = _plantilla(('ahorro_por_dispositivo', len(dispositivos)), lambda: _crear_barras(
+            (10, 6), len(dispositivos), 'Dispositivos', 'Ahorro Potencial ($)',
+            'Potencial de Ahorro por Dispositivo', estilo_texto=_texto_barras()
+        ))
+        plantilla.actualizar(dispositivos_ordenados, ahorros_ordenados, ['#4ECDC4'], '${:.2f}', rotacion=45)
+        _ajustar(plantilla.fig)
+        return plantilla.fig
     
     def grafica_energia_acumulada(self, energia_acumulada, intervalo):
         """
@@ -255,27 +560,39 @@ class GeneradorGraficas:
         Returns:
             str: Imagen en base64
         """
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        dispositivos = list(energia_acumulada.keys())
-        consumos = [data['consumo_kwh'] for data in energia_acumulada.values()]
-        
-        barras = ax.bar(dispositivos, consumos, color=self.colores[:len(dispositivos)])
-        
-        ax.set_xlabel('Dispositivos', fontsize=12, fontweight='bold')
-        ax.set_ylabel(f'Energía Acumulada (kWh por {intervalo})', fontsize=12, fontweight='bold')
-        ax.set_title(f'Energía Acumulada por {intervalo.capitalize()}', fontsize=14, fontweight='bold')
-        plt.xticks(rotation=45, ha='right')
-        
-        
-        for barra in barras:
-            altura = barra.get_height()
-            ax.text(barra.get_x() + barra.get_width()/2., altura,
-                   f'{altura:.1f}',
-                   ha='center', va='bottom', fontweight='bold')
+        return self._renderizar('energia_acumulada', self._datos_energia_acumulada(energia_acumulada, intervalo))
+    
+    def datos_energia_acumulada(self, energia_acumulada, intervalo):
+        """
+        Datos de grafica_energia_acumulada sin dibujar, para la vista web
         
-        plt.tight_layout()
-        return self._fig_to_base64(fig)
+        Returns:
+            dict: Serie para JSON (ver _serie)
+        """
+        datos = self._datos_energia_acumulada(energia_acumulada, intervalo)
+        return self._serie(datos['dispositivos'], datos['consumos'],
+                           f'Energía Acumulada por {intervalo.capitalize()}', 'kWh', intervalo=intervalo)
+    
+    def _datos_energia_acumulada(self, energia_acumulada, intervalo):
+        return {
+            'dispositivos': list(energia_acumulada.keys()),
+            'consumos': [data['consumo_kwh'] for data in energia_acumulada.values()],
+            'intervalo': intervalo
+        }
+    
+    def _dibujar_energia_acumulada(self, datos):
+        dispositivos = datos['dispositivos']
+        intervalo = datos['intervalo']
+        
+        plantilla = _plantilla(('energia_acumulada', len(dispositivos)), lambda: _crear_barras(
+            (10, 6), len(dispositivos), 'Dispositivos', estilo_texto=_texto_barras()
+        ))
+        plantilla.actualizar(dispositivos, datos['consumos'], self.colores, '{:.1f}', rotacion=45)
+        plantilla.ax.set_ylabel(f'Energía Acumulada (kWh por {intervalo})', fontsize=12, fontweight='bold')
+        plantilla.ax.set_title(f'Energía Acumulada por {intervalo.capitalize()}', fontsize=14, fontweight='bold')
+        
+        _ajustar(plantilla.fig)
+        return plantilla.fig
     
     def grafica_dashboard_completo(self, consumo_dispositivos, ahorro_total, configuracion_optima):
         """
@@ -289,46 +606,92 @@ class GeneradorGraficas:
         Returns:
             str: Imagen en base64
         """
-        fig = plt.figure(figsize=(16, 10))
+        return self._renderizar('dashboard_completo', self._datos_dashboard_completo(
+            consumo_dispositivos, ahorro_total, configuracion_optima
+        ))
+    
+    def datos_dashboard_completo(self, consumo_dispositivos, ahorro_total, configuracion_optima):
+        """
+        Datos de grafica_dashboard_completo sin dibujar, para la vista web
+        
+        Returns:
+            dict: Una serie por subgráfica (ver _serie)
+        """
+        datos = self._datos_dashboard_completo(consumo_dispositivos, ahorro_total, configuracion_optima)
+        dispositivos_ahorro = datos['dispositivos_ahorro']
+        ahorros = datos['ahorros']
+        indices = _orden(ahorros)[:TOP_AHORRO]
+        return {
+            'titulo': 'Dashboard de Optimización Energética',
+            'consumo': self._serie(datos['dispositivos'], datos['consumos'], 'Consumo por Dispositivo', 'kWh'),
+            'distribucion': self._serie(datos['dispositivos'], datos['porcentajes'],
+                                        'Distribución del Consumo', '%', porcentajes=False),
+            'comparativa': self._serie(['Actual', 'Optimizado'], datos['valores'], 'Comparativa Consumo', 'kWh',
+                                       ['#FF6B6B', '#4ECDC4'], porcentajes=False),
+            # indices: posición de cada dispositivo del top en configuracion_optima
+            'top_ahorro': self._serie([dispositivos_ahorro[i] for i in indices], [ahorros[i] for i in indices],
+                                      f'Top {TOP_AHORRO} Potencial de Ahorro', 'kWh', ['#4ECDC4'],
+                                      indices=indices.tolist())
+        }
+    
+    def _datos_dashboard_completo(self, consumo_dispositivos, ahorro_total, configuracion_optima):
+        return {
+            'dispositivos': list(consumo_dispositivos.keys()),
+            'consumos': [data['consumo_bimestral_kwh'] for data in consumo_dispositivos.values()],
+            'porcentajes': [data['porcentaje'] for data in consumo_dispositivos.values()],
+            'valores': [ahorro_total['consumo_actual_kwh'], ahorro_total['consumo_optimizado_kwh']],
+            'dispositivos_ahorro': list(configuracion_optima.keys()),
+            'ahorros': [config['ahorro_kwh'] for config in configuracion_optima.values()]
+        }
+    
+    def _crear_dashboard(self, n, n_top):
+        fig = _nueva_figura((16, 10))
         gs = fig.add_gridspec(2, 2, hspace=0.3, wspace=0.3)
         
         # 1: Consumo por dispositivo (barras)
-        ax1 = fig.add_subplot(gs[0, 0])
-        dispositivos = list(consumo_dispositivos.keys())
-        consumos = [data['consumo_bimestral_kwh'] for data in consumo_dispositivos.values()]
-        ax1.bar(dispositivos, consumos, color=self.colores[:len(dispositivos)])
-        ax1.set_title('Consumo por Dispositivo', fontweight='bold')
-        ax1.set_ylabel('kWh')
-        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45, ha='right')
-        
-        # 2: Distribución (pastel)
-        ax2 = fig.add_subplot(gs[0, 1])
-        porcentajes = [data['porcentaje'] for data in consumo_dispositivos.values()]
-        ax2.pie(porcentajes, labels=dispositivos, autopct='%1.1f%%', 
-               colors=self.colores[:len(dispositivos)])
-        ax2.set_title('Distribución del Consumo', fontweight='bold')
+        consumo = _PlantillaBarras(fig.add_subplot(gs[0, 0]), n)
+        consumo.ax.set_title('Consumo por Dispositivo', fontweight='bold')
+        consumo.ax.set_ylabel('kWh')
+        
+        # 2: Distribución (pastel, se crea en cada gráfica)
+        pastel = fig.add_subplot(gs[0, 1])
         
         # 3: Comparativa antes/después
-        ax3 = fig.add_subplot(gs[1, 0])
-        categorias = ['Actual', 'Optimizado']
-        valores = [ahorro_total['consumo_actual_kwh'], ahorro_total['consumo_optimizado_kwh']]
-        ax3.bar(categorias, valores, color=['#FF6B6B', '#4ECDC4'])
-        ax3.set_title('Comparativa Consumo', fontweight='bold')
-        ax3.set_ylabel('kWh')
-        for i, v in enumerate(valores):
-            ax3.text(i, v, f'{v:.1f}', ha='center', va='bottom', fontweight='bold')
+        comparativa = _PlantillaBarras(fig.add_subplot(gs[1, 0]), 2, estilo_texto=_texto_barras())
+        comparativa.ax.set_title('Comparativa Consumo', fontweight='bold')
+        comparativa.ax.set_ylabel('kWh')
         
         # 4: Ahorro por dispositivo
-        ax4 = fig.add_subplot(gs[1, 1])
-        dispositivos_ahorro = list(configuracion_optima.keys())
-        ahorros = [config['ahorro_kwh'] for config in configuracion_optima.values()]
-        indices = np.argsort(ahorros)[::-1][:5]  # Top 5
-        dispositivos_top = [dispositivos_ahorro[i] for i in indices]
-        ahorros_top = [ahorros[i] for i in indices]
-        ax4.barh(dispositivos_top, ahorros_top, color='#4ECDC4')
-        ax4.set_title('Top 5 Potencial de Ahorro', fontweight='bold')
-        ax4.set_xlabel('Ahorro (kWh)')
-        
-        plt.suptitle('Dashboard de Optimización Energética', fontsize=16, fontweight='bold', y=0.98)
-        
-        return self._fig_to_base64(fig)
\ No newline at end of file
+        ahorro = _PlantillaBarras(fig.add_subplot(gs[1, 1]), n_top, horizontal=True)
+        ahorro.ax.set_title('Top 5 Potencial de Ahorro', fontweight='bold')
+        ahorro.ax.set_xlabel('Ahorro (kWh)')
+        
+        fig.suptitle('Dashboard de Optimización Energética', fontsize=16, fontweight='bold', y=0.98)
+        return [consumo, pastel, comparativa, ahorro]
+    
+    def _dibujar_dashboard_completo(self, datos):
+        dispositivos = datos['dispositivos']
+        dispositivos_ahorro = datos['dispositivos_ahorro']
+        ahorros = datos['ahorros']
+        indices = _orden(ahorros)[:TOP_AHORRO]
+        
+        plantilla = _plantilla(
+            ('dashboard_completo', len(dispositivos), len(indices)),
+            lambda: self._crear_dashboard(len(dispositivos), len(indices))
+        )
+        consumo, pastel, comparativa, ahorro = plantilla
+        
+        consumo.actualizar(dispositivos, datos['consumos'], self.colores, rotacion=45)
+        
+        especificacion = pastel.get_subplotspec()
+        pastel.remove()
+        pastel = plantilla[1] = consumo.fig.add_subplot(especificacion)
+        pastel.pie(datos['porcentajes'], labels=dispositivos, autopct='%1.1f%%',
+                   colors=self.colores[:len(dispositivos)])
+        pastel.set_title('Distribución del Consumo', fontweight='bold')
+        
+        comparativa.actualizar(['Actual', 'Optimizado'], datos['valores'], ['#FF6B6B', '#4ECDC4'], '{:.1f}')
+        
+        ahorro.actualizar([dispositivos_ahorro[i] for i in indices], [ahorros[i] for i in indices], ['#4ECDC4'])
+        
+        return consumo.fig
@@ -0,0 +1,227 @@
+import os
+import shutil
+import struct
+
+import numpy as np
+from sqlalchemy import func, select
+
+from models import BloqueLecturas
+from services.series import MINUTOS_DIA, almacen_series
+
+
+# Carpeta DATA_FOLDER de Config (config.py)
+CARPETA_DEFAULT = os.path.join('data', 'lecturas')
+
+# Encabezado: mágico, versión, usuario, primer día (días desde 1970),
+# resolución, número de valores y la firma de los bloques exportados
+# (bloques, última escritura, kWh totales). Los valores float32 empiezan
+# en el byte 64 para quedar alineados.
+ENCABEZADO = struct.Struct('<4sIqqiqqqd')
+BYTES_ENCABEZADO = 64
+MAGICO = b'PWLC'
+VERSION = 2
+EXTENSION = '.pwlc'
+
+# Días leídos del almacén por cada escritura al archivo
+DIAS_LOTE = 31
+
+
+def _a_dia(valor):
+    return np.datetime64(valor, 'D')
+
+
+class SerieMapeada:
+    """
+    Archivo columnar de lecturas abierto con numpy.memmap
+
+    'kwh' es un arreglo float32 de solo lectura mapeado al archivo: las
+    rebanadas no copian datos y el sistema operativo solo carga las
+    páginas que se tocan, así que una flota de archivos de varios GB se
+    recorre sin llevarla completa a RAM.
+    """
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as archivo:
+            campos = ENCABEZADO.unpack(archivo.read(ENCABEZADO.size))
+        (magico, version, self.usuario_id, dia_inicio, self.resolucion_min,
+         n_valores, bloques, actualizado, total_kwh) = campos
+        if magico != MAGICO or version != VERSION:
+            raise ValueError(f'{ruta} no es un archivo columnar de lecturas válido')
+
+        self.ruta = ruta
+        self.firma = (bloques, actualizado, total_kwh)
+        self.inicio = np.datetime64(dia_inicio, 'D')
+        self.kwh = np.memmap(ruta, dtype='<f4', mode='r', offset=BYTES_ENCABEZADO, shape=(n_valores,))
+
+    @property
+    def por_dia(self):
+        return MINUTOS_DIA // self.resolucion_min
+
+    @property
+    def dias(self):
+        return len(self.kwh) // self.por_dia
+
+    @property
+    def fin(self):
+        return self.inicio + self.dias
+
+    def __len__(self):
+        return len(self.kwh)
+
+    def _indice(self, momento):
+        minutos = (np.datetime64(momento, 'm') - self.inicio.astype('datetime64[m]')).astype(np.int64)
+        return int(np.clip(minutos // self.resolucion_min, 0, len(self.kwh)))
+
+    def rebanada(self, inicio=None, fin=None):
+        """
+        Lecturas en [inicio, fin) sin copiar
+
+        Returns:
+            dict: 'tiempos' (datetime64[m]) y 'kwh' (vista del memmap)
+        """
+        i = self._indice(inicio) if inicio is not None else 0
+        j = self._indice(fin) if fin is not None else len(self.kwh)
+        tiempos = self.inicio.astype('datetime64[m]') + np.arange(i, j) * self.resolucion_min
+        return {'tiempos': tiempos, 'kwh': self.kwh[i:j]}
+
+    def diario(self, dias_lote=DIAS_LOTE):
+        """
+        kWh por día (NaN si el día no tiene lecturas), recorriendo el
+        archivo por lotes de días
+
+        Returns:
+            dict: 'fechas' (datetime64[D]) y 'kwh' (float64)
+        """
+        totales = np.full(self.dias, np.nan)
+        for dia in range(0, self.dias, dias_lote):
+            hasta = min(dia + dias_lote, self.dias)
+            matriz = self.kwh[dia * self.por_dia:hasta * self.por_dia].reshape(-1, self.por_dia)
+            con_dato = ~np.isnan(matriz)
+            totales[dia:hasta] = np.where(con_dato.any(axis=1),
+                                          np.nansum(matriz, axis=1, dtype=np.float64), np.nan)
+        return {'fechas': self.inicio + np.arange(self.dias), 'kwh': totales}
+
+
+class CacheColumnar:
+    """
+    Caché en disco de lecturas por intervalo en formato columnar
+
+    Cada archivo cubre un usuario y un rango de días completos: un
+    encabezado fijo seguido de los kWh como float32 en una malla de
+    tiempo regular (NaN sin lectura). Se genera desde AlmacenSeries por
+    lotes de días y se reemplaza de forma atómica; el encabezado guarda
+    la firma de los bloques del rango para saber si sigue vigente: el
+    número de bloques (detecta días borrados) y la última escritura de
+    cualquiera de ellos (detecta días nuevos y lecturas reescritas, aunque
+    el total del día no cambie).
+    """
+
+    def __init__(self, carpeta=CARPETA_DEFAULT, almacen=almacen_series):
+        """
+        Args:
+            carpeta: Carpeta de los archivos (una subcarpeta por usuario)
+            almacen: AlmacenSeries del que se exportan las lecturas
+        """
+        self.carpeta = carpeta
+        self.almacen = almacen
+
+    def ruta(self, usuario_id, inicio, fin):
+        return os.path.join(self.carpeta, f'usuario_{usuario_id}', f'{_a_dia(inicio)}_{_a_dia(fin)}{EXTENSION}')
+
+    def _firma(self, sesion, usuario_id, inicio, fin):
+        """(bloques, última escritura, kWh totales, resolución máxima) del rango"""
+        bloques, actualizado, total, resolucion = sesion.execute(
+            select(func.count(), func.coalesce(func.max(BloqueLecturas.actualizado), 0),
+                   func.coalesce(func.sum(BloqueLecturas.total_kwh), 0.0),
+                   func.max(BloqueLecturas.resolucion_min))
+            .where(BloqueLecturas.usuario_id == usuario_id,
+                   BloqueLecturas.dia >= inicio.item(), BloqueLecturas.dia < fin.item())
+        ).one()
+        return bloques, actualizado, float(total), resolucion
+
+    def exportar(self, sesion, usuario_id, inicio, fin, resolucion_min=None):
+        """
+        Escribe (o reescribe) el archivo de [inicio, fin) por días completos
+
+        Args:
+            resolucion_min: Resolución del archivo; si hay días compactados
+                a una más gruesa se usa esa
+
+        Returns:
+            str: Ruta del archivo
+        """
+        inicio, fin = _a_dia(inicio), _a_dia(fin)
+        if fin <= inicio:
+            raise ValueError('El fin del rango debe ser posterior al inicio')
+
+        bloques, actualizado, total, resolucion = self._firma(sesion, usuario_id, inicio, fin)
+        resolucion = max(resolucion_min or self.almacen.resolucion_min, resolucion or 0)
+        dias = int((fin - inicio).astype(np.int64))
+
+        ruta = self.ruta(usuario_id, inicio, fin)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        with open(temporal, 'wb') as archivo:
+            encabezado = ENCABEZADO.pack(MAGICO, VERSION, usuario_id, int(inicio.astype(np.int64)), resolucion,
+                                         dias * (MINUTOS_DIA // resolucion), bloques, actualizado, total)
+            archivo.write(encabezado.ljust(BYTES_ENCABEZADO, b'\0'))
+            for dia in range(0, dias, DIAS_LOTE):
+                serie = self.almacen.rango(sesion, usuario_id, inicio + dia,
+                                           inicio + min(dia + DIAS_LOTE, dias), resolucion_min=resolucion)
+                serie['kwh'].astype('<f4').tofile(archivo)
+        # Quien ya tenga mapeado el archivo anterior lo sigue viendo completo
+        os.replace(temporal, ruta)
+        return ruta
+
+    def abrir(self, ruta):
+        return SerieMapeada(ruta)
+
+    def obtener(self, sesion, usuario_id, inicio, fin):
+        """
+        Serie mapeada de [inicio, fin), exportándola de nuevo solo si no
+        existe o si los bloques del rango cambiaron
+
+        Returns:
+            SerieMapeada
+        """
+        inicio, fin = _a_dia(inicio), _a_dia(fin)
+        ruta = self.ruta(usuario_id, inicio, fin)
+        if os.path.exists(ruta):
+            try:
+                serie = SerieMapeada(ruta)
+            except ValueError:
+                # Archivo de una versión anterior del formato: se regenera
+                serie = None
+            bloques, actualizado, total, resolucion = self._firma(sesion, usuario_id, inicio, fin)
+            if (serie is not None and serie.firma == (bloques, actualizado, total)
+                    and serie.resolucion_min >= (resolucion or 0)):
+                return serie
+        return SerieMapeada(self.exportar(sesion, usuario_id, inicio, fin))
+
+    def exportar_flota(self, sesion, inicio, fin, usuario_ids=None):
+        """
+        Exporta el rango de todos los usuarios con lecturas en él
+
+        Returns:
+            dict: usuario_id -> ruta
+        """
+        inicio, fin = _a_dia(inicio), _a_dia(fin)
+        consulta = (
+            select(BloqueLecturas.usuario_id).distinct()
+            .where(BloqueLecturas.dia >= inicio.item(), BloqueLecturas.dia < fin.item())
+            .order_by(BloqueLecturas.usuario_id)
+        )
+        if usuario_ids is not None:
+            consulta = consulta.where(BloqueLecturas.usuario_id.in_(usuario_ids))
+        return {
+            usuario_id: self.exportar(sesion, usuario_id, inicio, fin)
+            for usuario_id in sesion.scalars(consulta).all()
+        }
+
+    def limpiar(self, usuario_id=None):
+        """Borra los archivos de un usuario o de todos"""
+        carpeta = os.path.join(self.carpeta, f'usuario_{usuario_id}') if usuario_id is not None else self.carpeta
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+cache_columnar = CacheColumnar()
@@ -0,0 +1,20 @@
+def valor_config(config, clave):
+    """
+    Lee una clave de la clase Config o de un dict como app.config
+
+    Args:
+        config: Clase/objeto Config o mapeo con las claves
+        clave: Nombre de la clave
+
+    Returns:
+        Valor configurado
+
+    Raises:
+        KeyError: Si la clave no está configurada
+    """
+    if isinstance(config, dict):
+        return config[clave]
+    try:
+        return getattr(config, clave)
+    except AttributeError:
+        raise KeyError(clave) from None
@@ -0,0 +1,136 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, joinedload
+
+from models import Usuario, Dispositivo, ConsumoBimestral, Reporte, ResumenUsuario
+
+
+# Recibos que se muestran en el historial del dashboard (el resto en
+# "Ver todos") y reportes en "Últimos Reportes"
+HISTORIAL_CONSUMOS = 12
+REPORTES_RECIENTES = 3
+
+# Filas que se traen por lote al recorrer agregados de toda la flota
+TAMANO_LOTE = 1000
+
+
+class ConsultasDashboard:
+    """
+    Carga la vista del dashboard sin recorrer las relaciones lazy de Usuario
+
+    El usuario, su ResumenUsuario, sus dispositivos (joinedload) y su
+    último recibo y último reporte (por los apuntadores del resumen) salen
+    de una sola sentencia. Los historiales se piden aparte con LIMIT, así que el costo
+    no crece con los años de recibos y reportes acumulados.
+    """
+
+    def vista_usuario(self, usuario_id, sesion):
+        """
+        Args:
+            usuario_id: Id del usuario
+            sesion: Sesión de SQLAlchemy (db.session)
+
+        Returns:
+            dict: usuario, resumen, dispositivos, ultimo_consumo y
+            ultimo_reporte, o None si el usuario no existe
+        """
+        ultimo_consumo = aliased(ConsumoBimestral)
+        ultimo_reporte = aliased(Reporte)
+        consulta = (
+            select(Usuario, ResumenUsuario, ultimo_consumo, ultimo_reporte)
+            .select_from(Usuario)
+            .outerjoin(ResumenUsuario, ResumenUsuario.usuario_id == Usuario.id)
+            .outerjoin(ultimo_consumo, ultimo_consumo.id == ResumenUsuario.ultimo_consumo_id)
+            .outerjoin(ultimo_reporte, ultimo_reporte.id == ResumenUsuario.ultimo_reporte_id)
+            .where(Usuario.id == usuario_id)
+            .options(joinedload(Usuario.dispositivos))
+        )
+        fila = sesion.execute(consulta).unique().first()
+        if fila is None:
+            return None
+
+        usuario, resumen, consumo, reporte = fila
+        return {
+            'usuario': usuario,
+            'resumen': resumen,
+            'dispositivos': usuario.dispositivos,
+            'ultimo_consumo': consumo,
+            'ultimo_reporte': reporte
+        }
+
+    def ultimo_consumo(self, usuario_id, sesion):
+        """Recibo más reciente del usuario (None si no tiene)"""
+        return sesion.scalars(
+            select(ConsumoBimestral)
+            .where(ConsumoBimestral.usuario_id == usuario_id)
+            .order_by(ConsumoBimestral.id.desc())
+            .limit(1)
+        ).first()
+
+    def consumos_recientes(self, usuario_id, sesion, limite=HISTORIAL_CONSUMOS):
+        """Recibos del usuario, del más reciente al más antiguo (limite=None para todos)"""
+        return self._recientes(ConsumoBimestral, usuario_id, sesion, limite)
+
+    def reportes_recientes(self, usuario_id, sesion, limite=REPORTES_RECIENTES):
+        """Reportes del usuario, del más reciente al más antiguo (limite=None para todos)"""
+        return self._recientes(Reporte, usuario_id, sesion, limite)
+
+    def _recientes(self, modelo, usuario_id, sesion, limite):
+        consulta = (
+            select(modelo)
+            .where(modelo.usuario_id == usuario_id)
+            .order_by(modelo.id.desc())
+        )
+        if limite is not None:
+            consulta = consulta.limit(limite)
+        return sesion.scalars(consulta).all()
+
+
+class ConsultasFlota:
+    """
+    Agregados de todos los usuarios calculados dentro de la base de datos
+
+    Usan las expresiones SQL de los métodos híbridos de los modelos
+    (consumo_bimestral_kwh, costo_por_kwh, porcentaje_ahorro), así que
+    solo regresan una fila pequeña por usuario, leída por lotes, en lugar
+    de hidratar cada objeto.
+    """
+
+    def consumo_por_usuario(self, sesion, tamano_lote=TAMANO_LOTE):
+        """
+        Returns:
+            Iterador de filas (usuario_id, total_dispositivos, consumo_bimestral_kwh)
+        """
+        return self._agrupado(sesion, Dispositivo, tamano_lote,
+                              func.count(Dispositivo.id).label('total_dispositivos'),
+                              func.sum(Dispositivo.consumo_bimestral_kwh()).label('consumo_bimestral_kwh'))
+
+    def tarifa_por_usuario(self, sesion, tamano_lote=TAMANO_LOTE):
+        """
+        Returns:
+            Iterador de filas (usuario_id, recibos, costo_por_kwh_promedio)
+        """
+        return self._agrupado(sesion, ConsumoBimestral, tamano_lote,
+                              func.count(ConsumoBimestral.id).label('recibos'),
+                              func.avg(ConsumoBimestral.costo_por_kwh()).label('costo_por_kwh_promedio'))
+
+    def ahorro_por_usuario(self, sesion, tamano_lote=TAMANO_LOTE):
+        """
+        Returns:
+            Iterador de filas (usuario_id, reportes, porcentaje_ahorro_promedio, ahorro_pesos_total)
+        """
+        return self._agrupado(sesion, Reporte, tamano_lote,
+                              func.count(Reporte.id).label('reportes'),
+                              func.avg(Reporte.porcentaje_ahorro()).label('porcentaje_ahorro_promedio'),
+                              func.sum(Reporte.ahorro_pesos).label('ahorro_pesos_total'))
+
+    def _agrupado(self, sesion, modelo, tamano_lote, *agregados):
+        consulta = (
+            select(modelo.usuario_id, *agregados)
+            .group_by(modelo.usuario_id)
+            .order_by(modelo.usuario_id)
+        )
+        return sesion.execute(consulta, execution_options={'yield_per': tamano_lote})
+
+
+consultas_dashboard = ConsultasDashboard()
+consultas_flota = ConsultasFlota()
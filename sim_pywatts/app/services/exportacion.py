@@ -0,0 +1,173 @@
+import csv
+import io
+
+from sqlalchemy import Date, DateTime, Float, Integer, select
+
+from models import Dispositivo, ConsumoBimestral, Reporte
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él solo se exporta CSV
+    pa = None
+
+
+TAMANO_LOTE = 5000
+
+TABLAS = {
+    'dispositivos': Dispositivo,
+    'consumos': ConsumoBimestral,
+    'reportes': Reporte
+}
+
+# Columnas calculadas con las expresiones SQL de los métodos híbridos
+CALCULADAS = {
+    'dispositivos': ('consumo_diario_kwh', 'consumo_mensual_kwh', 'consumo_bimestral_kwh'),
+    'consumos': ('costo_por_kwh',),
+    'reportes': ('porcentaje_ahorro',)
+}
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+
+class _Salida(io.RawIOBase):
+    """Archivo de solo escritura que acumula bytes hasta que se vacía"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _tipo_arrow(tipo):
+    if isinstance(tipo, Integer):
+        return pa.int64()
+    if isinstance(tipo, Float):
+        return pa.float64()
+    if isinstance(tipo, DateTime):
+        return pa.timestamp('us')
+    if isinstance(tipo, Date):
+        return pa.date32()
+    return pa.string()
+
+
+class ExportadorDatos:
+    """
+    Exportación en streaming de dispositivos, recibos y reportes
+
+    Las filas se leen con un cursor del lado del servidor (stream_results
+    con yield_per) y se escriben por lotes, así que la memoria no depende
+    del tamaño de la tabla. CSV siempre está disponible; Parquet y Arrow
+    requieren pyarrow.
+    """
+
+    def __init__(self, sesion, tamano_lote=TAMANO_LOTE):
+        """
+        Args:
+            sesion: Sesión de SQLAlchemy (db.session)
+            tamano_lote: Filas por lote leído y escrito
+        """
+        self.sesion = sesion
+        self.tamano_lote = tamano_lote
+
+    @staticmethod
+    def formato_disponible(formato):
+        return formato == 'csv' or (formato in FORMATOS and pa is not None)
+
+    def _columnas(self, tabla, calculadas):
+        modelo = TABLAS[tabla]
+        columnas = [(c.name, c.type, c) for c in modelo.__table__.columns]
+        if calculadas:
+            for nombre in CALCULADAS[tabla]:
+                columnas.append((nombre, Float(), getattr(modelo, nombre)().label(nombre)))
+        return columnas
+
+    def _lotes(self, tabla, columnas, usuario_id):
+        modelo = TABLAS[tabla]
+        consulta = select(*[expresion for _, _, expresion in columnas]).order_by(modelo.id)
+        if usuario_id is not None:
+            consulta = consulta.where(modelo.usuario_id == usuario_id)
+        resultado = self.sesion.execute(
+            consulta, execution_options={'stream_results': True, 'yield_per': self.tamano_lote}
+        )
+        yield from resultado.partitions()
+
+    def exportar(self, tabla, formato='csv', usuario_id=None, calculadas=True):
+        """
+        Generador con el contenido del archivo por pedazos
+
+        Args:
+            tabla: 'dispositivos', 'consumos' o 'reportes'
+            formato: 'csv', 'parquet' o 'arrow'
+            usuario_id: Solo las filas de este usuario (todas si es None)
+            calculadas: Agregar las columnas calculadas (kWh, costo por kWh, % de ahorro)
+
+        Returns:
+            Generador de str (CSV) o bytes (Parquet/Arrow)
+        """
+        if tabla not in TABLAS:
+            raise ValueError(f'Tabla desconocida: {tabla}')
+        if formato not in FORMATOS:
+            raise ValueError(f'Formato desconocido: {formato}')
+        if not self.formato_disponible(formato):
+            raise ValueError(f'El formato {formato} requiere pyarrow')
+
+        columnas = self._columnas(tabla, calculadas)
+        lotes = self._lotes(tabla, columnas, usuario_id)
+        if formato == 'csv':
+            return self._csv(columnas, lotes)
+        return self._arrow(columnas, lotes, parquet=(formato == 'parquet'))
+
+    def _csv(self, columnas, lotes):
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        escritor.writerow([nombre for nombre, _, _ in columnas])
+        yield salida.getvalue()
+
+        for filas in lotes:
+            salida.seek(0)
+            salida.truncate()
+            escritor.writerows(filas)
+            yield salida.getvalue()
+
+    def _arrow(self, columnas, lotes, parquet):
+        esquema = pa.schema([(nombre, _tipo_arrow(tipo)) for nombre, tipo, _ in columnas])
+        salida = _Salida()
+        if parquet:
+            escritor = pq.ParquetWriter(salida, esquema)
+        else:
+            escritor = pa_ipc.new_stream(salida, esquema)
+
+        for filas in lotes:
+            columnas_lote = list(zip(*filas))
+            lote = pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas_lote, esquema)],
+                schema=esquema
+            )
+            # En Parquet cada lote es un row group
+            escritor.write_batch(lote)
+            yield salida.vaciar()
+
+        escritor.close()
+        yield salida.vaciar()
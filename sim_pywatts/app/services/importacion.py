@@ -0,0 +1,291 @@
+import csv
+import io
+from datetime import date
+
+import numpy as np
+from sqlalchemy import insert, select
+
+from models import Usuario, Dispositivo, ConsumoBimestral
+from forms import DISPOSITIVOS_DATA
+
+
+TAMANO_LOTE = 5000
+
+# Errores al leer el archivo (no de validación): detienen la importación
+ERRORES_LECTURA = (UnicodeDecodeError, csv.Error)
+
+COLUMNAS = {
+    'dispositivos': ('nombre', 'tipo', 'potencia_watts', 'horas_uso_dia'),
+    'consumos': ('periodo_inicio', 'periodo_fin', 'consumo_kwh', 'costo_total')
+}
+
+
+def _a_flotante(valores):
+    """Convierte textos a float64; lo que no es número queda como NaN"""
+    resultado = np.empty(len(valores))
+    for i, valor in enumerate(valores):
+        try:
+            resultado[i] = float(valor)
+        except (TypeError, ValueError):
+            resultado[i] = np.nan
+    return resultado
+
+
+def _a_fecha(valores):
+    """Convierte textos YYYY-MM-DD a datetime64[D]; lo inválido queda como NaT"""
+    resultado = np.empty(len(valores), dtype='datetime64[D]')
+    for i, valor in enumerate(valores):
+        try:
+            resultado[i] = np.datetime64(date.fromisoformat((valor or '').strip()), 'D')
+        except ValueError:
+            resultado[i] = np.datetime64('NaT')
+    return resultado
+
+
+def _rango_por_tipo(tipos, rangos):
+    """Mínimo y máximo de cada fila según su tipo (-inf/inf si no hay rango)"""
+    unicos, inverso = np.unique(tipos, return_inverse=True)
+    minimos = np.array([rangos.get(t, (-np.inf, np.inf))[0] for t in unicos], dtype=np.float64)
+    maximos = np.array([rangos.get(t, (-np.inf, np.inf))[1] for t in unicos], dtype=np.float64)
+    return minimos[inverso], maximos[inverso]
+
+
+def _lineas_texto(archivo):
+    """
+    Decodifica un archivo binario línea por línea, así un error de
+    codificación aparece justo en la línea que lo tiene y no al principio
+    del bloque de 8 KB que la contiene
+    """
+    for i, crudo in enumerate(archivo):
+        yield crudo.decode('utf-8-sig' if i == 0 else 'utf-8')
+
+
+def _lotes(lector, tamano):
+    lote = []
+    try:
+        for fila in lector:
+            lote.append(fila)
+            if len(lote) == tamano:
+                yield lote
+                lote = []
+    except ERRORES_LECTURA:
+        # Las filas leídas antes del error se importan; luego se avisa
+        if lote:
+            yield lote
+        raise
+    if lote:
+        yield lote
+
+
+class ImportadorCSV:
+    """
+    Importación masiva de dispositivos y recibos bimestrales desde CSV
+
+    El archivo se lee en streaming por lotes de TAMANO_LOTE filas. Cada
+    lote se valida con máscaras de numpy (los mismos límites que
+    DispositivoForm y ConsumoBimestralForm, más los rangos típicos por
+    tipo que se reciben al crearlo), se inserta con un solo executemany y
+    se confirma en su propia transacción. Las filas rechazadas quedan en
+    el reporte con su número de línea y los motivos. Si una línea no se
+    puede leer (p. ej. no es UTF-8), la importación se detiene ahí: los
+    lotes anteriores ya quedaron confirmados y el reporte lo indica en
+    'detenido' con el número de línea.
+
+    Columnas (encabezado obligatorio; el usuario por usuario_id o
+    nombre_usuario):
+        dispositivos: nombre, tipo, potencia_watts, horas_uso_dia
+        consumos: periodo_inicio, periodo_fin, consumo_kwh, costo_total
+    """
+
+    def __init__(self, sesion, resumen=None, cache=None, tamano_lote=TAMANO_LOTE,
+                 rangos_potencia=None, horas_tipicas=None):
+        """
+        Args:
+            sesion: Sesión de SQLAlchemy (db.session)
+            resumen: SincronizadorResumen a recalcular por lote
+            cache: CacheOptimizacion a invalidar para los usuarios importados
+            tamano_lote: Filas por lote/transacción
+            rangos_potencia: Dict tipo -> (mín, máx) W; fuera de rango es error
+                             (RANGOS_POTENCIA de Config)
+            horas_tipicas: Dict tipo -> (mín, máx) h/día; fuera de rango es
+                           advertencia (HORAS_USO_TIPICAS de Config)
+        """
+        self.sesion = sesion
+        self.resumen = resumen
+        self.cache = cache
+        self.tamano_lote = tamano_lote
+        self.rangos_potencia = rangos_potencia or {}
+        self.horas_tipicas = horas_tipicas or {}
+
+    def importar(self, archivo, tipo):
+        """
+        Importa un CSV completo
+
+        Args:
+            archivo: Archivo de texto o binario (p. ej. request.files['archivo'].stream)
+            tipo: 'dispositivos' o 'consumos'
+
+        Returns:
+            dict: Filas leídas, importadas y rechazadas, advertencias,
+            errores [{'fila', 'errores'}] y detenido ({'fila', 'error'} si
+            la lectura se detuvo antes del final, None si no)
+        """
+        if tipo not in COLUMNAS:
+            raise ValueError(f'Tipo de importación desconocido: {tipo}')
+        if not isinstance(archivo, io.TextIOBase):
+            archivo = _lineas_texto(archivo)
+
+        lector = csv.DictReader(archivo)
+        encabezado = set(lector.fieldnames or [])
+        faltantes = [c for c in COLUMNAS[tipo] if c not in encabezado]
+        if not encabezado & {'usuario_id', 'nombre_usuario'}:
+            faltantes.append('usuario_id o nombre_usuario')
+        if faltantes:
+            raise ValueError(f'Faltan columnas en el CSV: {", ".join(faltantes)}')
+
+        reporte = {'tipo': tipo, 'filas': 0, 'importadas': 0, 'rechazadas': 0,
+                   'usuarios': 0, 'errores': [], 'advertencias': [], 'detenido': None}
+        usuarios = set()
+        validar = self._validar_dispositivos if tipo == 'dispositivos' else self._validar_consumos
+        modelo = Dispositivo if tipo == 'dispositivos' else ConsumoBimestral
+
+        # La línea 1 es el encabezado
+        linea = 2
+        try:
+            for lote in _lotes(lector, self.tamano_lote):
+                lineas = np.arange(linea, linea + len(lote))
+                linea += len(lote)
+
+                usuario_ids, errores = self._resolver_usuarios(lote)
+                registros, advertencias = validar(lote, usuario_ids, errores)
+                validas = np.array([not e for e in errores], dtype=bool)
+
+                if validas.any():
+                    filas = [r for r, ok in zip(registros, validas) if ok]
+                    self.sesion.execute(insert(modelo), filas)
+                    afectados = {int(u) for u in usuario_ids[validas]}
+                    if self.resumen is not None:
+                        self.resumen.recalcular_usuarios(self.sesion, afectados)
+                    self.sesion.commit()
+                    if self.cache is not None:
+                        for usuario_id in afectados:
+                            self.cache.invalidar_usuario(usuario_id)
+                    usuarios |= afectados
+
+                reporte['filas'] += len(lote)
+                reporte['importadas'] += int(validas.sum())
+                reporte['errores'].extend(
+                    {'fila': int(lineas[i]), 'errores': errores[i]} for i in np.flatnonzero(~validas)
+                )
+                reporte['advertencias'].extend(
+                    {'fila': int(lineas[i]), 'advertencias': advertencias[i]}
+                    for i in np.flatnonzero(validas) if advertencias[i]
+                )
+        except ERRORES_LECTURA as e:
+            motivo = 'no es texto UTF-8' if isinstance(e, UnicodeDecodeError) else str(e)
+            reporte['detenido'] = {'fila': linea, 'error': f'No se pudo leer la línea: {motivo}'}
+
+        reporte['rechazadas'] = reporte['filas'] - reporte['importadas']
+        reporte['usuarios'] = len(usuarios)
+        return reporte
+
+    def _resolver_usuarios(self, lote):
+        """Id de usuario de cada fila (-1 si no existe) y lista de errores por fila"""
+        errores = [[] for _ in lote]
+        textos = [(f.get('usuario_id') or '').strip() for f in lote]
+        ids = _a_flotante(textos)
+        nombres = [(f.get('nombre_usuario') or '').strip() for f in lote]
+
+        # Un usuario_id presente tiene que ser un entero ("1.7" no es el usuario 1)
+        con_id = np.array([bool(t) for t in textos], dtype=bool)
+        with np.errstate(invalid='ignore'):
+            enteros = np.isfinite(ids) & (ids == np.round(ids)) & (np.abs(ids) <= np.iinfo(np.int64).max)
+        invalidos = con_id & ~enteros
+        self._marcar(errores, invalidos, 'usuario_id inválido')
+        ids[invalidos] = np.nan
+
+        por_nombre = ~con_id & np.array([bool(n) for n in nombres], dtype=bool)
+        if por_nombre.any():
+            buscados = {nombres[i] for i in np.flatnonzero(por_nombre)}
+            encontrados = dict(self.sesion.execute(
+                select(Usuario.nombre_usuario, Usuario.id).where(Usuario.nombre_usuario.in_(buscados))
+            ).all())
+            for i in np.flatnonzero(por_nombre):
+                ids[i] = encontrados.get(nombres[i], np.nan)
+
+        validos = ~np.isnan(ids)
+        existentes = set(self.sesion.scalars(
+            select(Usuario.id).where(Usuario.id.in_({int(i) for i in ids[validos]}))
+        ).all())
+        usuario_ids = np.where(validos, ids, -1).astype(np.int64)
+        sin_usuario = ~invalidos & ~np.isin(usuario_ids, list(existentes))
+        for i in np.flatnonzero(sin_usuario):
+            errores[i].append('Usuario no encontrado')
+        return usuario_ids, errores
+
+    def _marcar(self, errores, mascara, mensaje):
+        for i in np.flatnonzero(mascara):
+            errores[i].append(mensaje)
+
+    def _validar_dispositivos(self, lote, usuario_ids, errores):
+        nombres = [(f.get('nombre') or '').strip() for f in lote]
+        tipos = np.array([(f.get('tipo') or '').strip().lower() for f in lote], dtype=object)
+        potencias = _a_flotante([f.get('potencia_watts') for f in lote])
+        horas = _a_flotante([f.get('horas_uso_dia') for f in lote])
+        largo = np.array([len(n) for n in nombres])
+
+        self._marcar(errores, (largo < 2) | (largo > 100), 'El nombre debe tener entre 2 y 100 caracteres')
+        self._marcar(errores, ~np.isin(tipos, list(DISPOSITIVOS_DATA)), 'Tipo de dispositivo desconocido')
+        self._marcar(errores, np.isnan(potencias) | (potencias < 1) | (potencias > 10000),
+                     'La potencia debe estar entre 1 y 10,000 W')
+        self._marcar(errores, np.isnan(horas) | (horas < 0.1) | (horas > 24),
+                     'Las horas deben estar entre 0.1 y 24')
+
+        minimos, maximos = _rango_por_tipo(tipos, self.rangos_potencia)
+        self._marcar(errores, (potencias < minimos) | (potencias > maximos),
+                     'La potencia está fuera del rango típico para este tipo de dispositivo')
+
+        advertencias = [[] for _ in lote]
+        minimos, maximos = _rango_por_tipo(tipos, self.horas_tipicas)
+        self._marcar(advertencias, (horas < minimos) | (horas > maximos),
+                     'Horas de uso fuera de lo típico para este tipo de dispositivo')
+
+        registros = [
+            {'usuario_id': int(usuario_ids[i]), 'nombre': nombres[i], 'tipo': tipos[i],
+             'potencia_watts': float(potencias[i]), 'horas_uso_dia': float(horas[i])}
+            for i in range(len(lote))
+        ]
+        return registros, advertencias
+
+    def _validar_consumos(self, lote, usuario_ids, errores):
+        inicio = _a_fecha([f.get('periodo_inicio') for f in lote])
+        fin = _a_fecha([f.get('periodo_fin') for f in lote])
+        consumo = _a_flotante([f.get('consumo_kwh') for f in lote])
+        costo = _a_flotante([f.get('costo_total') for f in lote])
+
+        self._marcar(errores, np.isnat(inicio) | np.isnat(fin), 'Fechas inválidas (formato YYYY-MM-DD)')
+        self._marcar(errores, ~np.isnat(inicio) & ~np.isnat(fin) & (fin <= inicio),
+                     'La fecha de fin debe ser posterior a la fecha de inicio')
+        self._marcar(errores, np.isnan(consumo) | (consumo < 10) | (consumo > 5000),
+                     'El consumo debe estar entre 10 y 5,000 kWh')
+        self._marcar(errores, np.isnan(costo) | (costo < 0.1) | (costo > 1000000),
+                     'El costo debe estar entre 0.1 y 1,000,000 MXN')
+
+        registros = [
+            {'usuario_id': int(usuario_ids[i]),
+             'periodo_inicio': inicio[i].item() if not np.isnat(inicio[i]) else None,
+             'periodo_fin': fin[i].item() if not np.isnat(fin[i]) else None,
+             'consumo_kwh': float(consumo[i]), 'costo_total': float(costo[i])}
+            for i in range(len(lote))
+        ]
+        return registros, [[] for _ in lote]
+
+    @staticmethod
+    def escribir_errores(reporte, archivo):
+        """Escribe el reporte de errores como CSV (fila, errores)"""
+        escritor = csv.writer(archivo)
+        escritor.writerow(['fila', 'errores'])
+        for error in reporte['errores']:
+            escritor.writerow([error['fila'], '; '.join(error['errores'])])
+        if reporte['detenido']:
+            escritor.writerow([reporte['detenido']['fila'], reporte['detenido']['error']])
@@ -15,7 +15,7 @@ class GeneradorPDF:
     """
     
     def __init__(self, usuario, consumo_dispositivos, configuracion_optima, 
-                 ahorro_total, recomendaciones, graficas=None):
+                 ahorro_total, recomendaciones, graficas=None, programacion=None):
         """
         Inicializa el generador de PDF
         
@@ -26,6 +26,7 @@ class GeneradorPDF:
             ahorro_total: Dict con información del ahorro total
             recomendaciones: Dict con recomendaciones personalizadas
             graficas: Dict con gráficas en base64 (opcional)
+            programacion: Dict de ProgramadorCargas.programar (opcional)
         """
         self.usuario = usuario
         self.consumo_dispositivos = consumo_dispositivos
@@ -33,6 +34,7 @@ class GeneradorPDF:
         self.ahorro_total = ahorro_total
         self.recomendaciones = recomendaciones
         self.graficas = graficas or {}
+        self.programacion = programacion
         self.styles = getSampleStyleSheet()
         self._configurar_estilos()
     
@@ -132,6 +134,10 @@ class GeneradorPDF:
         elementos.extend(self._crear_configuracion_optima())
         elementos.append(PageBreak())
         
+        if self.programacion and self.programacion['dispositivos']:
+            elementos.extend(self._crear_programacion_horaria())
+            elementos.append(PageBreak())
+        
     
         elementos.extend(self._crear_recomendaciones())
         elementos.append(PageBreak())
@@ -333,6 +339,61 @@ class GeneradorPDF:
         
         return elementos
     
+    def _crear_programacion_horaria(self):
+        """Crea la sección de programación de cargas desplazables"""
+        elementos = []
+        
+        elementos.append(Paragraph("PROGRAMACIÓN HORARIA DE CARGAS", self.styles['Subtitulo']))
+        elementos.append(Spacer(1, 0.2*inch))
+        
+        intro = f"""
+        Los siguientes dispositivos pueden usarse en otro horario sin perder comodidad.
+        Moverlos a las ventanas de tarifa más baja, sin superar una carga de
+        {self.programacion['pico_kw']:.1f} kW en el hogar, ahorra aproximadamente
+        <b>${self.programacion['ahorro_bimestral']:.2f} MXN bimestrales</b>:
+        """
+        elementos.append(Paragraph(intro, self.styles['TextoNormal']))
+        elementos.append(Spacer(1, 0.2*inch))
+        
+        datos_programacion = [
+            ['Dispositivo', 'Horas/Día', 'Horario Sugerido', 'Ahorro Diario ($)']
+        ]
+        
+        for dispositivo in self.programacion['dispositivos']:
+            datos_programacion.append([
+                dispositivo['nombre'],
+                f"{dispositivo['horas_uso_dia']:.1f}h",
+                Paragraph(dispositivo['horario'], self.styles['Normal']),
+                f"${dispositivo['ahorro']:.2f}"
+            ])
+        
+        tabla = Table(datos_programacion, colWidths=[1.8*inch, 1*inch, 2.4*inch, 1.3*inch])
+        tabla.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2980B9')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#EBF5FB')])
+        ]))
+        
+        elementos.append(tabla)
+        
+        recortados = [d for d in self.programacion['dispositivos'] if d['horas_recortadas'] > 0]
+        if recortados:
+            nota = ' '.join(
+                f"{d['nombre']}: {d['horas_recortadas']:.1f}h diarias no caben en su horario permitido."
+                for d in recortados
+            )
+            elementos.append(Spacer(1, 0.1*inch))
+            elementos.append(Paragraph(nota + ' Esas horas no se programan ni se cuentan como ahorro.',
+                                       self.styles['TextoNormal']))
+        
+        return elementos
+    
     def _crear_recomendaciones(self):
         """Crea la sección de recomendaciones"""
         elementos = []
@@ -0,0 +1,150 @@
+import numpy as np
+from scipy.optimize import linprog
+from scipy import sparse
+
+from services.simulacion import simulador_horario, HORAS_DIA
+
+
+# Dispositivos que se pueden mover de horario sin perder confort, con las
+# franjas (inicio, fin) en las que está permitido usarlos
+VENTANAS_PERMITIDAS = {
+    'lavadora': [(7, 23)],
+    'secadora': [(7, 23)],
+    'calentador': [(0, 24)],
+    'plancha': [(6, 23)]
+}
+
+# Carga máxima del hogar en kW (servicio residencial típico)
+PICO_KW_DEFAULT = 5.0
+
+# Días de cada tipo en un bimestre
+DIAS_BIMESTRE = {'laborable': 60 * 5 / 7, 'fin_de_semana': 60 * 2 / 7}
+
+DIA_SEMANA_TIPO = {'laborable': 0, 'fin_de_semana': 5}
+
+
+def _formatear_bloques(fila, tolerancia=1e-6):
+    """Convierte 24 fracciones de uso en texto 'HH:00-HH:00' por bloque contiguo"""
+    activo = np.concatenate([[False], fila > tolerancia, [False]])
+    cambios = np.flatnonzero(activo[1:] != activo[:-1])
+    return ', '.join(f'{inicio:02d}:00-{fin:02d}:00' for inicio, fin in zip(cambios[::2], cambios[1::2]))
+
+
+class ProgramadorCargas:
+    """
+    Programa las horas de los dispositivos desplazables (lavadora,
+    secadora, calentador, plancha) en las ventanas más baratas
+
+    Se plantea como un problema lineal: x[i, h] es la fracción de la hora h
+    en que se usa el dispositivo i. Se minimiza el costo sujeto a cumplir
+    sus horas diarias, a sus franjas permitidas y a que la carga del hogar
+    (incluidos los dispositivos no desplazables) no pase de pico_kw.
+    """
+
+    def __init__(self, simulador=None, pico_kw=PICO_KW_DEFAULT, ventanas_permitidas=None):
+        """
+        Args:
+            simulador: SimuladorCargaHoraria (perfiles y precios por hora)
+            pico_kw: Carga máxima del hogar en kW
+            ventanas_permitidas: Dict tipo -> lista de (inicio, fin)
+        """
+        self.simulador = simulador or simulador_horario
+        self.pico_kw = pico_kw
+        self.ventanas_permitidas = ventanas_permitidas or VENTANAS_PERMITIDAS
+
+    def _tipo(self, dispositivo):
+        return dispositivo.tipo.lower().replace(' ', '_')
+
+    def _mascara_permitida(self, tipo):
+        """24 booleanos con las horas en que el dispositivo puede usarse"""
+        mascara = np.zeros(HORAS_DIA, dtype=bool)
+        for inicio, fin in self.ventanas_permitidas[tipo]:
+            mascara[inicio:fin] = True
+        return mascara
+
+    def programar(self, dispositivos, tipo_dia='laborable'):
+        """
+        Calcula el horario de menor costo para los dispositivos desplazables
+
+        Args:
+            dispositivos: Lista de objetos Dispositivo del hogar
+            tipo_dia: 'laborable' o 'fin_de_semana'
+
+        Returns:
+            dict: Horario por dispositivo, costos, ahorro y carga máxima
+        """
+        desplazables = [d for d in dispositivos if self._tipo(d) in self.ventanas_permitidas]
+        fijos = [d for d in dispositivos if self._tipo(d) not in self.ventanas_permitidas]
+
+        precio = self.simulador.precios[self.simulador.ventana[DIA_SEMANA_TIPO[tipo_dia]]]
+        carga_base = self.simulador.perfil_dispositivos(fijos).sum(axis=1) if fijos else np.zeros(HORAS_DIA)
+
+        programacion = {
+            'tipo_dia': tipo_dia,
+            'factible': True,
+            'pico_kw': self.pico_kw,
+            'pico_programado_kw': round(float(carga_base.max()), 2),
+            'costo_actual': 0.0,
+            'costo_programado': 0.0,
+            'ahorro_diario': 0.0,
+            'ahorro_bimestral': 0.0,
+            'horas_recortadas': 0.0,
+            'dispositivos': []
+        }
+        if not desplazables:
+            return programacion
+
+        n = len(desplazables)
+        potencias_kw = np.array([d.potencia_watts for d in desplazables], dtype=np.float64) / 1000
+        permitido = np.stack([self._mascara_permitida(self._tipo(d)) for d in desplazables])
+        horas_pedidas = np.array([d.horas_uso_dia for d in desplazables], dtype=np.float64)
+        horas = np.minimum(horas_pedidas, permitido.sum(axis=1))
+        # Las horas que no caben en la ventana permitida se reportan aparte;
+        # el horario actual se arma con las mismas horas que el programado
+        # para que el ahorro sea solo por desplazar el uso, no por recortarlo
+        perfil_actual = self.simulador.perfil_diario(potencias_kw * 1000, horas, [d.tipo for d in desplazables])
+        uso_actual = np.divide(perfil_actual, potencias_kw, out=np.zeros_like(perfil_actual), where=potencias_kw > 0)
+
+        # Variables x[i, h] aplanadas como i * 24 + h
+        costos = np.outer(potencias_kw, precio).ravel()
+        limites = np.column_stack([np.zeros(n * HORAS_DIA), permitido.ravel().astype(np.float64)])
+        A_eq = sparse.kron(sparse.eye(n), np.ones((1, HORAS_DIA)), format='csr')
+        A_ub = sparse.kron(potencias_kw.reshape(1, -1), sparse.eye(HORAS_DIA), format='csr')
+        b_ub = np.maximum(self.pico_kw - carga_base, 0)
+
+        resultado = linprog(costos, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=horas,
+                            bounds=limites, method='highs')
+        if resultado.success:
+            uso = resultado.x.reshape(n, HORAS_DIA)
+        else:
+            programacion['factible'] = False
+            uso = uso_actual.T
+
+        costo_actual = (uso_actual.T * potencias_kw[:, None]) @ precio
+        costo_programado = (uso * potencias_kw[:, None]) @ precio
+        ahorro = costo_actual - costo_programado
+
+        for i, dispositivo in enumerate(desplazables):
+            programacion['dispositivos'].append({
+                'nombre': dispositivo.nombre,
+                'tipo': dispositivo.tipo,
+                'horas_uso_dia': round(float(horas[i]), 2),
+                'horas_recortadas': round(float(horas_pedidas[i] - horas[i]), 2),
+                'horario_actual': _formatear_bloques(uso_actual[:, i]),
+                'horario': _formatear_bloques(uso[i]),
+                'uso_por_hora': np.round(uso[i], 3).tolist(),
+                'costo_actual': round(float(costo_actual[i]), 2),
+                'costo_programado': round(float(costo_programado[i]), 2),
+                'ahorro': round(float(ahorro[i]), 2)
+            })
+
+        ahorro_diario = float(ahorro.sum())
+        programacion.update({
+            'pico_programado_kw': round(float((carga_base + potencias_kw @ uso).max()), 2),
+            'costo_actual': round(float(costo_actual.sum()), 2),
+            'costo_programado': round(float(costo_programado.sum()), 2),
+            'ahorro_diario': round(ahorro_diario, 2),
+            'ahorro_bimestral': round(ahorro_diario * DIAS_BIMESTRE[tipo_dia], 2),
+            'horas_recortadas': round(float((horas_pedidas - horas).sum()), 2)
+        })
+        return programacion
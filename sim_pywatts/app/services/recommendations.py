@@ -1,3 +1,6 @@
+from services.simulacion import simulador_horario, VENTANAS
+
+
 class GeneradorRecomendaciones:
     """
     Genera recomendaciones personalizadas para optimizar el consumo energético
@@ -257,7 +260,7 @@ class GeneradorRecomendaciones:
         Returns:
             dict: Tips de horarios
         """
-        return {
+        tips = {
             'horario_base': {
                 'descripcion': 'Tarifa más económica',
                 'horarios': 'Lunes a Viernes: 00:00-06:00, Fines de semana: todo el día',
@@ -276,4 +279,39 @@ class GeneradorRecomendaciones:
                 'dispositivos_evitar': ['Aire acondicionado', 'Calentador', 'Plancha', 'Lavadora'],
                 'recomendacion': 'Minimiza el uso de dispositivos de alto consumo'
             }
+        }
+        
+        # Reparto real del consumo del hogar en cada ventana
+        if self.dispositivos:
+            distribucion = self.calcular_distribucion_horaria()
+            for ventana, datos in distribucion.items():
+                tips[f'horario_{ventana}'].update(datos)
+        
+        return tips
+    
+    def calcular_distribucion_horaria(self, dias=7):
+        """
+        Calcula cuánto del consumo cae en cada ventana horaria usando los
+        perfiles de uso de SimuladorCargaHoraria
+        
+        Args:
+            dias: Días del periodo a valorar a partir de hoy (una semana
+                  por defecto, para incluir días laborables y fin de semana)
+        
+        Returns:
+            dict: Por ventana, consumo (kWh), costo y porcentaje del total
+        """
+        perfil = simulador_horario.perfil_dispositivos(self.dispositivos)
+        resultado = simulador_horario.costo_por_ventana(perfil, dias=dias)
+        consumo = resultado['consumo_kwh'].sum(axis=1)
+        costo = resultado['costo'].sum(axis=1)
+        total = consumo.sum()
+        
+        return {
+            ventana: {
+                'consumo_kwh': round(float(consumo[i]), 2),
+                'costo': round(float(costo[i]), 2),
+                'porcentaje_consumo': round(float(consumo[i] / total * 100), 1) if total > 0 else 0
+            }
+            for i, ventana in enumerate(VENTANAS)
         }
\ No newline at end of file
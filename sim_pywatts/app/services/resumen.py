@@ -0,0 +1,201 @@
+from sqlalchemy import case, delete, event, func, insert, inspect, select, update
+
+from models import Usuario, Dispositivo, ConsumoBimestral, Reporte, ResumenUsuario
+from services.agregados import deltas_consumo, valor_anterior
+
+
+def _columnas_resumen(usuario_id):
+    """Valores del resumen calculados desde cero (subconsultas correlacionadas)"""
+    consumo_diario = (
+        select(func.coalesce(func.sum(Dispositivo.consumo_diario_kwh()), 0.0))
+        .where(Dispositivo.usuario_id == usuario_id)
+        .scalar_subquery()
+    )
+    return {
+        'total_dispositivos': select(func.count(Dispositivo.id))
+            .where(Dispositivo.usuario_id == usuario_id).scalar_subquery(),
+        'consumo_diario_kwh': consumo_diario,
+        'consumo_bimestral_kwh': consumo_diario * 60,
+        'ultimo_consumo_id': select(func.max(ConsumoBimestral.id))
+            .where(ConsumoBimestral.usuario_id == usuario_id).scalar_subquery(),
+        'ultimo_reporte_id': select(func.max(Reporte.id))
+            .where(Reporte.usuario_id == usuario_id).scalar_subquery()
+    }
+
+
+def _insertar_desde_cero(filtro):
+    """INSERT ... SELECT del resumen de los usuarios que cumplen el filtro"""
+    columnas = _columnas_resumen(Usuario.id)
+    return insert(ResumenUsuario).from_select(
+        ['usuario_id'] + list(columnas),
+        select(Usuario.id, *columnas.values()).where(filtro)
+    )
+
+
+class SincronizadorResumen:
+    """
+    Mantiene la tabla ResumenUsuario dentro de la misma transacción que
+    las escrituras de Dispositivo, ConsumoBimestral y Reporte
+
+    Los cambios de Dispositivo llegan como deltas de services.agregados y
+    cada uno se aplica con un UPDATE incremental sobre la fila del usuario
+    en la misma conexión del flush, así que el resumen se confirma o se
+    revierte junto con el cambio que lo originó. Si la fila no existe
+    todavía (usuarios anteriores a la tabla) se crea calculándola desde
+    cero.
+    """
+
+    def escuchar_cambios(self):
+        """Registra los eventos de SQLAlchemy sobre los modelos"""
+        event.listen(Usuario, 'after_insert', self._usuario_insertado)
+        event.listen(Usuario, 'before_delete', self._usuario_eliminado)
+
+        deltas_consumo.suscribir(self._aplicar_delta)
+        deltas_consumo.escuchar_cambios(Dispositivo)
+
+        for modelo, columna in ((ConsumoBimestral, ResumenUsuario.ultimo_consumo_id),
+                                (Reporte, ResumenUsuario.ultimo_reporte_id)):
+            event.listen(modelo, 'after_insert', self._registro_insertado(columna))
+            event.listen(modelo, 'after_update', self._registro_actualizado)
+            event.listen(modelo, 'after_delete', self._registro_eliminado(modelo, columna))
+
+    # Usuarios
+
+    def _usuario_insertado(self, mapper, connection, target):
+        connection.execute(insert(ResumenUsuario).values(usuario_id=target.id))
+
+    def _usuario_eliminado(self, mapper, connection, target):
+        connection.execute(delete(ResumenUsuario).where(ResumenUsuario.usuario_id == target.id))
+
+    # Dispositivos: deltas de número y consumo
+
+    def _aplicar_delta(self, connection, usuario_id, delta_dispositivos, delta_consumo):
+        resultado = connection.execute(
+            update(ResumenUsuario)
+            .where(ResumenUsuario.usuario_id == usuario_id)
+            .values(
+                total_dispositivos=ResumenUsuario.total_dispositivos + delta_dispositivos,
+                consumo_diario_kwh=ResumenUsuario.consumo_diario_kwh + delta_consumo,
+                consumo_bimestral_kwh=ResumenUsuario.consumo_bimestral_kwh + delta_consumo * 60
+            )
+        )
+        if resultado.rowcount == 0:
+            # El cambio ya está escrito en esta conexión, así que el cálculo
+            # desde cero lo incluye
+            connection.execute(_insertar_desde_cero(Usuario.id == usuario_id))
+
+    # Recibos y reportes: apuntador al más reciente (id mayor)
+
+    def _registro_insertado(self, columna):
+        def al_insertar(mapper, connection, target):
+            resultado = connection.execute(
+                update(ResumenUsuario)
+                .where(ResumenUsuario.usuario_id == target.usuario_id)
+                .values({columna: case(
+                    (columna.is_(None) | (columna < target.id), target.id),
+                    else_=columna
+                )})
+            )
+            if resultado.rowcount == 0:
+                connection.execute(_insertar_desde_cero(Usuario.id == target.usuario_id))
+        return al_insertar
+
+    def _registro_actualizado(self, mapper, connection, target):
+        usuario_anterior = valor_anterior(inspect(target), 'usuario_id')
+        if usuario_anterior != target.usuario_id:
+            self._recalcular(connection, usuario_anterior)
+            self._recalcular(connection, target.usuario_id)
+
+    def _registro_eliminado(self, modelo, columna):
+        def al_eliminar(mapper, connection, target):
+            # Solo cambia si se borró justo el más reciente
+            connection.execute(
+                update(ResumenUsuario)
+                .where(ResumenUsuario.usuario_id == target.usuario_id, columna == target.id)
+                .values({columna: select(func.max(modelo.id))
+                         .where(modelo.usuario_id == target.usuario_id).scalar_subquery()})
+            )
+        return al_eliminar
+
+    def _recalcular(self, connection, usuario_id):
+        resultado = connection.execute(
+            update(ResumenUsuario)
+            .where(ResumenUsuario.usuario_id == usuario_id)
+            .values(_columnas_resumen(usuario_id))
+        )
+        if resultado.rowcount == 0:
+            connection.execute(_insertar_desde_cero(Usuario.id == usuario_id))
+
+    # Lecturas y mantenimiento
+
+    def obtener(self, usuario_id, sesion):
+        """Resumen del usuario por llave primaria (None si no existe)"""
+        return sesion.get(ResumenUsuario, usuario_id)
+
+    def porcentaje(self, usuario_id, sesion, consumo_bimestral_kwh):
+        """Porcentaje que representa un consumo bimestral sobre el total del usuario"""
+        resumen = self.obtener(usuario_id, sesion)
+        return resumen.porcentaje(consumo_bimestral_kwh) if resumen else 0
+
+    def holgura_optimizador(self, usuario_id, sesion, restriccion_ahorro=0.20):
+        """
+        Cifras de la restricción de ahorro de encontrar_punto_optimo leídas
+        del resumen (ceros si el usuario no tiene)
+
+        Returns:
+            dict: Consumo actual, consumo objetivo y ahorro requerido (kWh bimestrales)
+        """
+        resumen = self.obtener(usuario_id, sesion) or ResumenUsuario(consumo_bimestral_kwh=0.0)
+        return resumen.holgura_optimizador(restriccion_ahorro)
+
+    def ranking(self, sesion, limite=10):
+        """
+        Usuarios con mayor consumo bimestral, con un ORDER BY sobre el índice
+
+        Returns:
+            list: Tuplas (Usuario, ResumenUsuario)
+        """
+        return sesion.execute(
+            select(Usuario, ResumenUsuario)
+            .join(ResumenUsuario, ResumenUsuario.usuario_id == Usuario.id)
+            .order_by(ResumenUsuario.consumo_bimestral_kwh.desc())
+            .limit(limite)
+        ).all()
+
+    def sincronizar_faltantes(self, sesion):
+        """Crea el resumen de los usuarios que aún no tienen (p. ej. tras crear la tabla)"""
+        sin_resumen = ~select(ResumenUsuario.usuario_id).where(ResumenUsuario.usuario_id == Usuario.id).exists()
+        sesion.execute(_insertar_desde_cero(sin_resumen))
+        sesion.commit()
+
+    def recalcular_usuarios(self, sesion, usuario_ids):
+        """
+        Recalcula el resumen de varios usuarios en la transacción en curso
+
+        Para escrituras masivas (insert(Modelo) con executemany), que no
+        disparan los eventos de mapper; no hace commit.
+        """
+        usuario_ids = list(usuario_ids)
+        if not usuario_ids:
+            return
+        sesion.execute(
+            update(ResumenUsuario)
+            .where(ResumenUsuario.usuario_id.in_(usuario_ids))
+            .values(_columnas_resumen(ResumenUsuario.usuario_id))
+        )
+        sin_resumen = ~select(ResumenUsuario.usuario_id).where(ResumenUsuario.usuario_id == Usuario.id).exists()
+        sesion.execute(_insertar_desde_cero(Usuario.id.in_(usuario_ids) & sin_resumen))
+
+    def reconstruir(self, sesion, usuario_id=None):
+        """Recalcula desde cero el resumen de un usuario (o de todos)"""
+        borrar = delete(ResumenUsuario)
+        filtro = Usuario.id.isnot(None)
+        if usuario_id is not None:
+            borrar = borrar.where(ResumenUsuario.usuario_id == usuario_id)
+            filtro = Usuario.id == usuario_id
+        sesion.execute(borrar)
+        sesion.execute(_insertar_desde_cero(filtro))
+        sesion.commit()
+
+
+resumen_usuarios = SincronizadorResumen()
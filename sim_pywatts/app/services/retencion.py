@@ -0,0 +1,296 @@
+import gzip
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from models import Reporte, ResumenReportesAnual
+
+
+# Carpetas relativas por defecto; app.py usa UPLOAD_FOLDER y ARCHIVE_FOLDER
+CARPETA_REPORTES = os.path.join('exports', 'reports')
+CARPETA_ARCHIVO = os.path.join('exports', 'archive')
+
+TAMANO_LOTE = 1000
+EXTENSION_ARCHIVO = '.gz'
+
+
+def ruta_fragmentada(fecha, nombre):
+    """Ruta relativa 'AAAA/MM/nombre' para repartir los PDFs por fecha"""
+    return f'{fecha:%Y}/{fecha:%m}/{os.path.basename(nombre)}'
+
+
+class RetencionReportes:
+    """
+    Retención de reportes y archivo de sus PDFs
+
+    - Por usuario se conservan los últimos 'conservar' reportes; los
+      anteriores se suman en ResumenReportesAnual (uno por año) y se borran.
+    - Los PDFs con más de 'dias_archivo' días (y los que ya no tienen
+      reporte) se comprimen con gzip en carpeta_archivo/AAAA/MM/.
+    - Si el archivo pasa de 'cuota_mb' se borran los PDFs más antiguos.
+
+    Reporte.archivo_pdf guarda la ruta relativa AAAA/MM/nombre.pdf, que
+    es la misma dentro de la carpeta de reportes y (con .gz) del archivo;
+    Reporte.pdf_archivado indica que ya no hay que buscarlo en la primera.
+
+    Cada regla se omite mientras su valor sea None; app.py los toma de
+    Config (REPORTES_CONSERVADOS, DIAS_ARCHIVO_PDF, CUOTA_ARCHIVO_MB).
+    """
+
+    def __init__(self, carpeta_reportes=CARPETA_REPORTES, carpeta_archivo=CARPETA_ARCHIVO,
+                 conservar=None, dias_archivo=None, cuota_mb=None):
+        """
+        Args:
+            carpeta_reportes: Carpeta donde se generan los PDFs (UPLOAD_FOLDER)
+            carpeta_archivo: Carpeta del archivo comprimido (ARCHIVE_FOLDER)
+            conservar: Reportes que se conservan completos por usuario
+            dias_archivo: Antigüedad a partir de la cual se archiva el PDF
+            cuota_mb: Tamaño máximo del archivo comprimido
+        """
+        if conservar is not None and conservar < 1:
+            raise ValueError('Se debe conservar al menos un reporte por usuario')
+        self.carpeta_reportes = carpeta_reportes
+        self.carpeta_archivo = carpeta_archivo
+        self.conservar = conservar
+        self.dias_archivo = dias_archivo
+        self.cuota_mb = cuota_mb
+
+    # PDFs
+
+    def ruta_nueva(self, nombre, fecha=None):
+        """
+        Ruta relativa y absoluta para un PDF nuevo (crea la carpeta del mes)
+
+        Returns:
+            tuple: (ruta relativa para Reporte.archivo_pdf, ruta completa)
+        """
+        relativa = ruta_fragmentada(fecha or datetime.now(), nombre)
+        completa = os.path.join(self.carpeta_reportes, relativa)
+        os.makedirs(os.path.dirname(completa), exist_ok=True)
+        return relativa, completa
+
+    def abrir_pdf(self, archivo_pdf):
+        """
+        Abre el PDF de un reporte, esté vigente o archivado
+
+        Returns:
+            Archivo binario de solo lectura (None si ya no existe)
+        """
+        if not archivo_pdf:
+            return None
+        ruta = os.path.join(self.carpeta_reportes, archivo_pdf)
+        if os.path.exists(ruta):
+            return open(ruta, 'rb')
+        ruta = os.path.join(self.carpeta_archivo, archivo_pdf + EXTENSION_ARCHIVO)
+        if os.path.exists(ruta):
+            return gzip.open(ruta, 'rb')
+        return None
+
+    def _archivar_pdf(self, origen, relativa):
+        destino = os.path.join(self.carpeta_archivo, relativa + EXTENSION_ARCHIVO)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            temporal = destino + '.tmp'
+            with open(origen, 'rb') as entrada, gzip.open(temporal, 'wb') as salida:
+                shutil.copyfileobj(entrada, salida)
+            shutil.copystat(origen, temporal)
+            os.replace(temporal, destino)
+        os.remove(origen)
+
+    # Compactación de filas
+
+    def compactar(self, sesion, tamano_lote=TAMANO_LOTE):
+        """
+        Suma en ResumenReportesAnual y borra los reportes de cada usuario
+        fuera de los últimos 'conservar' (hace commit por lote)
+
+        El más reciente (id mayor) siempre se conserva, así que el
+        apuntador ultimo_reporte_id de ResumenUsuario no cambia.
+
+        Returns:
+            int: Reportes compactados
+        """
+        if self.conservar is None:
+            return 0
+        rango = func.row_number().over(partition_by=Reporte.usuario_id, order_by=Reporte.id.desc())
+        numerados = select(Reporte.id, rango.label('rango')).subquery()
+        consulta = (
+            select(Reporte.id, Reporte.usuario_id, Reporte.fecha_generacion, Reporte.consumo_actual_kwh,
+                   Reporte.consumo_optimizado_kwh, Reporte.ahorro_kwh, Reporte.ahorro_pesos,
+                   Reporte.archivo_pdf)
+            .join(numerados, numerados.c.id == Reporte.id)
+            .where(numerados.c.rango > self.conservar)
+            .order_by(Reporte.id)
+            .limit(tamano_lote)
+        )
+
+        compactados = 0
+        while True:
+            filas = sesion.execute(consulta).all()
+            if not filas:
+                return compactados
+
+            grupos = defaultdict(list)
+            for fila in filas:
+                fecha = fila.fecha_generacion or datetime.now()
+                grupos[(fila.usuario_id, fecha.year)].append(fila)
+            existentes = {
+                (r.usuario_id, r.anio): r for r in sesion.scalars(
+                    select(ResumenReportesAnual)
+                    .where(ResumenReportesAnual.usuario_id.in_({u for u, _ in grupos}),
+                           ResumenReportesAnual.anio.in_({a for _, a in grupos}))
+                )
+            }
+            for (usuario_id, anio), grupo in grupos.items():
+                resumen = existentes.get((usuario_id, anio))
+                if resumen is None:
+                    resumen = ResumenReportesAnual(usuario_id=usuario_id, anio=anio, reportes=0,
+                                                   consumo_actual_kwh=0.0, consumo_optimizado_kwh=0.0,
+                                                   ahorro_kwh=0.0, ahorro_pesos=0.0)
+                    sesion.add(resumen)
+                fechas = [f.fecha_generacion for f in grupo if f.fecha_generacion] + \
+                         [f for f in (resumen.primera_fecha, resumen.ultima_fecha) if f]
+                resumen.reportes += len(grupo)
+                resumen.consumo_actual_kwh += sum(f.consumo_actual_kwh for f in grupo)
+                resumen.consumo_optimizado_kwh += sum(f.consumo_optimizado_kwh for f in grupo)
+                resumen.ahorro_kwh += sum(f.ahorro_kwh for f in grupo)
+                resumen.ahorro_pesos += sum(f.ahorro_pesos for f in grupo)
+                if fechas:
+                    resumen.primera_fecha, resumen.ultima_fecha = min(fechas), max(fechas)
+
+            sesion.execute(delete(Reporte).where(Reporte.id.in_([f.id for f in filas])))
+            sesion.commit()
+            compactados += len(filas)
+
+            # Sin reporte que los referencie, sus PDFs se archivan ya
+            for fila in filas:
+                origen = os.path.join(self.carpeta_reportes, fila.archivo_pdf or '')
+                if fila.archivo_pdf and os.path.isfile(origen):
+                    self._archivar_pdf(origen, ruta_fragmentada(fila.fecha_generacion or datetime.now(),
+                                                                fila.archivo_pdf))
+
+    # Archivo de PDFs
+
+    def archivar(self, sesion, hoy=None, tamano_lote=TAMANO_LOTE):
+        """
+        Comprime en el archivo los PDFs anteriores a dias_archivo, incluidos
+        los que no pertenecen a ningún reporte (hace commit por lote)
+
+        Solo se revisan los reportes con pdf_archivado falso, así que cada
+        corrida recorre los PDFs nuevos y no todo el historial.
+
+        Returns:
+            int: PDFs archivados
+        """
+        if self.dias_archivo is None:
+            return 0
+        limite = (hoy or datetime.now()) - timedelta(days=self.dias_archivo)
+        archivados = 0
+
+        ultimo_id = 0
+        while True:
+            filas = sesion.execute(
+                select(Reporte.id, Reporte.fecha_generacion, Reporte.archivo_pdf)
+                .where(Reporte.id > ultimo_id, Reporte.pdf_archivado.is_(False),
+                       Reporte.fecha_generacion < limite, Reporte.archivo_pdf.isnot(None))
+                .order_by(Reporte.id)
+                .limit(tamano_lote)
+            ).all()
+            if not filas:
+                break
+            ultimo_id = filas[-1].id
+
+            cambios = []
+            for fila in filas:
+                origen = os.path.join(self.carpeta_reportes, fila.archivo_pdf)
+                relativa = ruta_fragmentada(fila.fecha_generacion, fila.archivo_pdf)
+                if os.path.isfile(origen):
+                    self._archivar_pdf(origen, relativa)
+                    archivados += 1
+                # Sin archivo en la carpeta de reportes ya no hay nada que
+                # archivar: o se archivó antes o se perdió
+                cambios.append({'id': fila.id, 'archivo_pdf': relativa, 'pdf_archivado': True})
+            sesion.execute(update(Reporte), cambios)
+            sesion.commit()
+
+        return archivados + self._archivar_huerfanos(sesion, limite)
+
+    def _pdfs(self, carpeta, extension):
+        """Rutas relativas (con '/') de los archivos bajo la carpeta"""
+        for raiz, _, archivos in os.walk(carpeta):
+            for nombre in archivos:
+                if nombre.endswith(extension):
+                    ruta = os.path.join(raiz, nombre)
+                    yield os.path.relpath(ruta, carpeta).replace(os.sep, '/'), ruta
+
+    def _archivar_huerfanos(self, sesion, limite):
+        candidatos = {
+            relativa: ruta for relativa, ruta in self._pdfs(self.carpeta_reportes, '.pdf')
+            if datetime.fromtimestamp(os.path.getmtime(ruta)) < limite
+        }
+        if not candidatos:
+            return 0
+        con_reporte = set(sesion.scalars(
+            select(Reporte.archivo_pdf).where(Reporte.archivo_pdf.in_(list(candidatos)))
+        ))
+        archivados = 0
+        for relativa, ruta in candidatos.items():
+            if relativa not in con_reporte:
+                fecha = datetime.fromtimestamp(os.path.getmtime(ruta))
+                self._archivar_pdf(ruta, ruta_fragmentada(fecha, relativa))
+                archivados += 1
+        return archivados
+
+    def aplicar_cuota(self, sesion):
+        """
+        Borra los PDFs archivados más antiguos hasta quedar bajo cuota_mb
+        (hace commit)
+
+        Returns:
+            dict: Archivos y bytes eliminados
+        """
+        if self.cuota_mb is None:
+            return {'archivos': 0, 'bytes': 0}
+        archivos = sorted(
+            (relativa, os.path.getsize(ruta), ruta)
+            for relativa, ruta in self._pdfs(self.carpeta_archivo, EXTENSION_ARCHIVO)
+        )
+        cuota = self.cuota_mb * 1024 * 1024
+        total = sum(tamano for _, tamano, _ in archivos)
+        eliminados = []
+        # AAAA/MM/ ordena del más antiguo al más reciente
+        for relativa, tamano, ruta in archivos:
+            if total <= cuota:
+                break
+            os.remove(ruta)
+            total -= tamano
+            eliminados.append((relativa[:-len(EXTENSION_ARCHIVO)], tamano))
+
+        relativas = [relativa for relativa, _ in eliminados]
+        for inicio in range(0, len(relativas), TAMANO_LOTE):
+            sesion.execute(
+                update(Reporte)
+                .where(Reporte.archivo_pdf.in_(relativas[inicio:inicio + TAMANO_LOTE]))
+                .values(archivo_pdf=None)
+            )
+        sesion.commit()
+        return {'archivos': len(eliminados), 'bytes': sum(tamano for _, tamano in eliminados)}
+
+    def aplicar(self, sesion, hoy=None):
+        """
+        Compacta, archiva y aplica la cuota
+
+        Returns:
+            dict: 'compactados', 'archivados' y 'cuota' (archivos y bytes eliminados)
+        """
+        return {
+            'compactados': self.compactar(sesion),
+            'archivados': self.archivar(sesion, hoy),
+            'cuota': self.aplicar_cuota(sesion)
+        }
+
+
+retencion_reportes = RetencionReportes()
@@ -0,0 +1,280 @@
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, select
+
+from models import BloqueLecturas
+
+
+MINUTOS_DIA = 24 * 60
+RESOLUCION_DEFAULT = 15  # minutos (medidores inteligentes)
+
+# Retención por defecto: 15 min los últimos 90 días, horaria hasta 2 años
+# y diaria después
+POLITICA_RETENCION = ((90, 60), (730, MINUTOS_DIA))
+
+# Frecuencias de remuestrear: (unidad datetime64, agrupar cada n unidades)
+FRECUENCIAS = {
+    'hora': ('h', 1),
+    'dia': ('D', 1),
+    'mes': ('M', 1),
+    'bimestre': ('M', 2)
+}
+
+TAMANO_LOTE = 500
+
+
+def _validar_resolucion(resolucion_min):
+    if resolucion_min <= 0 or MINUTOS_DIA % resolucion_min:
+        raise ValueError('La resolución debe dividir exactamente un día (1440 minutos)')
+
+
+def _codificar(valores):
+    return np.asarray(valores, dtype=np.float32).tobytes()
+
+
+def _decodificar(bloque):
+    return np.frombuffer(bloque.valores, dtype=np.float32).astype(np.float64)
+
+
+def _reducir(valores, factor):
+    """Suma grupos de 'factor' intervalos; NaN si ningún intervalo del grupo tiene dato"""
+    if factor == 1:
+        return valores
+    grupos = valores.reshape(-1, factor)
+    con_dato = ~np.isnan(grupos)
+    return np.where(con_dato.any(axis=1), np.nansum(grupos, axis=1), np.nan)
+
+
+def _llenar_bloque(bloque, valores, resolucion_min):
+    bloque.resolucion_min = resolucion_min
+    bloque.valores = _codificar(valores)
+    bloque.total_kwh = float(np.nansum(valores))
+    bloque.lecturas = int(np.count_nonzero(~np.isnan(valores)))
+    # Creciente aunque dos escrituras caigan en el mismo instante del reloj
+    bloque.actualizado = max(time.time_ns(), (bloque.actualizado or 0) + 1)
+
+
+def _dia(valor):
+    """date a partir de date, datetime o datetime64"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return np.datetime64(valor, 'D').item()
+
+
+class AlmacenSeries:
+    """
+    Lecturas de medidor por intervalo guardadas por bloques diarios
+
+    Cada fila de BloqueLecturas es un día completo de un usuario: un
+    arreglo float32 de ancho fijo (96 valores a 15 min) en un BLOB, con
+    NaN donde no hubo lectura. Un año son 365 filas por hogar en lugar de
+    ~35 mil. Los bloques antiguos se compactan a menor resolución en su
+    misma fila (horaria, diaria) o se eliminan según la política de
+    retención.
+    """
+
+    def __init__(self, resolucion_min=RESOLUCION_DEFAULT):
+        """
+        Args:
+            resolucion_min: Resolución de los bloques nuevos en minutos
+        """
+        _validar_resolucion(resolucion_min)
+        self.resolucion_min = resolucion_min
+
+    def _bloques(self, sesion, usuario_id, dias):
+        return {
+            b.dia: b for b in sesion.scalars(
+                select(BloqueLecturas)
+                .where(BloqueLecturas.usuario_id == usuario_id, BloqueLecturas.dia.in_(dias))
+            )
+        }
+
+    def guardar(self, sesion, usuario_id, tiempos, valores):
+        """
+        Agrega o reemplaza lecturas (no hace commit)
+
+        Las lecturas de un intervalo ya guardado lo sustituyen; si el día
+        ya fue compactado, las lecturas se suman al intervalo más grueso.
+
+        Args:
+            sesion: Sesión de SQLAlchemy
+            usuario_id: Id del usuario
+            tiempos: Inicio de cada intervalo (datetime o datetime64)
+            valores: kWh de cada intervalo
+
+        Returns:
+            int: Número de bloques diarios escritos
+        """
+        tiempos = np.asarray(tiempos, dtype='datetime64[m]')
+        valores = np.asarray(valores, dtype=np.float64)
+        validos = ~np.isnat(tiempos) & np.isfinite(valores)
+        tiempos, valores = tiempos[validos], valores[validos]
+        if not len(tiempos):
+            return 0
+
+        dias = tiempos.astype('datetime64[D]')
+        minutos = (tiempos - dias).astype(np.int64)
+        orden = np.argsort(dias, kind='stable')
+        dias, minutos, valores = dias[orden], minutos[orden], valores[orden]
+        unicos, inicios = np.unique(dias, return_index=True)
+
+        existentes = self._bloques(sesion, usuario_id, [d.item() for d in unicos])
+        for dia, minutos_dia, valores_dia in zip(unicos, np.split(minutos, inicios[1:]),
+                                                  np.split(valores, inicios[1:])):
+            bloque = existentes.get(dia.item())
+            if bloque is None:
+                bloque = BloqueLecturas(usuario_id=usuario_id, dia=dia.item())
+                sesion.add(bloque)
+                resolucion = self.resolucion_min
+                actuales = np.full(MINUTOS_DIA // resolucion, np.nan)
+            else:
+                resolucion = bloque.resolucion_min
+                actuales = _decodificar(bloque).copy()
+
+            intervalo = minutos_dia // resolucion
+            suma = np.bincount(intervalo, weights=valores_dia, minlength=len(actuales))
+            tocados = np.bincount(intervalo, minlength=len(actuales)) > 0
+            if resolucion > self.resolucion_min:
+                # Día compactado: el intervalo grueso ya acumula otras lecturas
+                actuales[tocados] = np.nan_to_num(actuales[tocados]) + suma[tocados]
+            else:
+                actuales[tocados] = suma[tocados]
+            _llenar_bloque(bloque, actuales, resolucion)
+
+        return len(unicos)
+
+    def rango(self, sesion, usuario_id, inicio, fin, resolucion_min=None):
+        """
+        Lecturas en [inicio, fin)
+
+        La resolución de salida es la pedida o, si en el rango hay días ya
+        compactados, la más gruesa de ellos (los días más finos se suman).
+
+        Returns:
+            dict: 'tiempos' (datetime64[m]), 'kwh' (NaN sin lectura) y 'resolucion_min'
+        """
+        inicio = np.datetime64(inicio, 'm')
+        fin = np.datetime64(fin, 'm')
+        primer_dia = inicio.astype('datetime64[D]')
+        n_dias = int(((fin - np.timedelta64(1, 'm')).astype('datetime64[D]') - primer_dia).astype(np.int64)) + 1
+        n_dias = max(n_dias, 0)
+
+        bloques = list(sesion.scalars(
+            select(BloqueLecturas)
+            .where(BloqueLecturas.usuario_id == usuario_id,
+                   BloqueLecturas.dia >= primer_dia.item(),
+                   BloqueLecturas.dia < (primer_dia + n_dias).item())
+        ))
+        resolucion = max([resolucion_min or self.resolucion_min] + [b.resolucion_min for b in bloques])
+        _validar_resolucion(resolucion)
+
+        if any(resolucion % b.resolucion_min for b in bloques):
+            raise ValueError('La resolución pedida debe ser múltiplo de la de los bloques')
+
+        por_dia = MINUTOS_DIA // resolucion
+        matriz = np.full((n_dias, por_dia), np.nan)
+        for bloque in bloques:
+            fila = (np.datetime64(bloque.dia, 'D') - primer_dia).astype(np.int64)
+            matriz[fila] = _reducir(_decodificar(bloque), resolucion // bloque.resolucion_min)
+
+        tiempos = primer_dia.astype('datetime64[m]') + np.arange(n_dias * por_dia) * resolucion
+        dentro = (tiempos + resolucion > inicio) & (tiempos < fin)
+        return {
+            'tiempos': tiempos[dentro],
+            'kwh': matriz.ravel()[dentro],
+            'resolucion_min': resolucion
+        }
+
+    def remuestrear(self, sesion, usuario_id, inicio, fin, frecuencia='hora'):
+        """
+        Suma las lecturas por hora, día, mes o bimestre (calendario:
+        ene-feb, mar-abr, ...)
+
+        Returns:
+            dict: 'inicio' de cada periodo, 'kwh' y 'cobertura' (fracción
+            de intervalos con lectura)
+        """
+        if frecuencia not in FRECUENCIAS:
+            raise ValueError(f'Frecuencia desconocida: {frecuencia}')
+        unidad, cada = FRECUENCIAS[frecuencia]
+
+        serie = self.rango(sesion, usuario_id, inicio, fin,
+                           resolucion_min=60 if frecuencia == 'hora' else None)
+        periodo = serie['tiempos'].astype(f'datetime64[{unidad}]').astype(np.int64) // cada
+        if not len(periodo):
+            return {'inicio': np.array([], dtype=f'datetime64[{unidad}]'), 'kwh': np.array([]),
+                    'cobertura': np.array([])}
+
+        etiquetas, indice = np.unique(periodo, return_inverse=True)
+        con_dato = ~np.isnan(serie['kwh'])
+        kwh = np.bincount(indice, weights=np.where(con_dato, serie['kwh'], 0.0))
+        cobertura = np.bincount(indice, weights=con_dato) / np.bincount(indice)
+        return {
+            'inicio': (etiquetas * cada).astype(f'datetime64[{unidad}]'),
+            'kwh': np.where(cobertura > 0, kwh, np.nan),
+            'cobertura': cobertura
+        }
+
+    def compactar(self, sesion, antes_de, resolucion_min, usuario_id=None, tamano_lote=TAMANO_LOTE):
+        """
+        Baja a resolucion_min los bloques anteriores a antes_de (hace commit por lote)
+
+        Returns:
+            int: Número de bloques compactados
+        """
+        _validar_resolucion(resolucion_min)
+        consulta = (
+            select(BloqueLecturas)
+            .where(BloqueLecturas.dia < _dia(antes_de), BloqueLecturas.resolucion_min < resolucion_min)
+            .order_by(BloqueLecturas.id)
+            .limit(tamano_lote)
+        )
+        if usuario_id is not None:
+            consulta = consulta.where(BloqueLecturas.usuario_id == usuario_id)
+
+        compactados = 0
+        while True:
+            bloques = sesion.scalars(consulta).all()
+            if not bloques:
+                return compactados
+            for bloque in bloques:
+                if resolucion_min % bloque.resolucion_min:
+                    raise ValueError('La nueva resolución debe ser múltiplo de la actual')
+                valores = _reducir(_decodificar(bloque), resolucion_min // bloque.resolucion_min)
+                _llenar_bloque(bloque, valores, resolucion_min)
+            sesion.commit()
+            compactados += len(bloques)
+
+    def eliminar_antes(self, sesion, antes_de, usuario_id=None):
+        """Borra los bloques anteriores a antes_de (hace commit)"""
+        sentencia = delete(BloqueLecturas).where(BloqueLecturas.dia < _dia(antes_de))
+        if usuario_id is not None:
+            sentencia = sentencia.where(BloqueLecturas.usuario_id == usuario_id)
+        eliminados = sesion.execute(sentencia).rowcount
+        sesion.commit()
+        return eliminados
+
+    def aplicar_retencion(self, sesion, hoy=None, politica=POLITICA_RETENCION, dias_maximos=None):
+        """
+        Compacta según la política [(antigüedad en días, resolución), ...]
+        y, si se indica, borra lo que tenga más de dias_maximos
+
+        Returns:
+            dict: Bloques compactados por resolución y eliminados
+        """
+        hoy = _dia(hoy) if hoy is not None else date.today()
+        resultado = {'compactados': {}, 'eliminados': 0}
+        for antiguedad, resolucion in politica:
+            resultado['compactados'][resolucion] = self.compactar(
+                sesion, hoy - timedelta(days=antiguedad), resolucion
+            )
+        if dias_maximos is not None:
+            resultado['eliminados'] = self.eliminar_antes(sesion, hoy - timedelta(days=dias_maximos))
+        return resultado
+
+
+almacen_series = AlmacenSeries()
@@ -0,0 +1,249 @@
+from datetime import datetime
+import numpy as np
+from services.configuracion import valor_config
+
+
+HORAS_DIA = 24
+DIAS_SEMANA = 7
+
+# Ventanas horarias (mismas que GeneradorRecomendaciones.generar_tips_horarios)
+VENTANAS = ('base', 'intermedio', 'punta')
+
+# Claves de Config con los MXN/kWh de cada ventana (esquema horario aparte
+# de las tarifas por bloque de services/tarifas.py) y con los perfiles de
+# uso por tipo de dispositivo: (inicio, fin, peso relativo), que se
+# normalizan al compilar. Los valores solo viven en Config.
+CLAVES_PRECIO = {
+    'base': 'PRECIO_HORARIO_BASE',
+    'intermedio': 'PRECIO_HORARIO_INTERMEDIO',
+    'punta': 'PRECIO_HORARIO_PUNTA'
+}
+CLAVE_PERFILES = 'PERFILES_USO'
+
+# (inicio, fin, ventana) por tipo de día; las horas no listadas son 'intermedio'
+HORARIO_LABORABLE = [(0, 6, 'base'), (18, 22, 'punta')]
+HORARIO_FIN_SEMANA = [(0, 24, 'base')]
+
+
+def _dia_semana(fechas):
+    """Día de la semana (lunes = 0) de un arreglo datetime64[D]"""
+    # 1970-01-01 fue jueves
+    return (fechas.astype(np.int64) + 3) % DIAS_SEMANA
+
+
+class SimuladorCargaHoraria:
+    """
+    Simula el uso horario de los dispositivos y lo valora con precios por
+    horario (base, intermedio y punta), no con las tarifas por bloque
+
+    Todo trabaja sobre matrices 24 x N (una columna por dispositivo), así
+    que miles de hogares se simulan en una sola pasada concatenando sus
+    dispositivos y agregando con un índice de hogar.
+    """
+
+    def __init__(self, perfiles=None, precios=None, horario_laborable=None, horario_fin_semana=None):
+        """
+        Args:
+            perfiles: Dict tipo -> lista de (inicio, fin, peso)
+            precios: Dict ventana -> MXN/kWh
+            horario_laborable: Lista de (inicio, fin, ventana) de lunes a viernes
+            horario_fin_semana: Lista de (inicio, fin, ventana) de sábado y domingo
+
+        Sin perfiles ni precios el simulador queda sin configurar hasta
+        llamar configurar.
+        """
+        self.tipos = self.indice_tipos = self.perfiles = self.precios = None
+        if perfiles is not None:
+            self._compilar_perfiles(perfiles)
+        if precios is not None:
+            self.precios = np.array([precios[ventana] for ventana in VENTANAS], dtype=np.float64)
+
+        laborable = self._compilar_horario(horario_laborable or HORARIO_LABORABLE)
+        fin_semana = self._compilar_horario(horario_fin_semana or HORARIO_FIN_SEMANA)
+        # ventana[dia_semana, hora] -> índice en VENTANAS
+        self.ventana = np.vstack([np.tile(laborable, (5, 1)), np.tile(fin_semana, (2, 1))])
+
+    def configurar(self, config):
+        """
+        Toma de Config o app.config los perfiles de uso (PERFILES_USO) y los
+        precios por ventana (PRECIO_HORARIO_*)
+
+        Raises:
+            KeyError: Si falta alguna clave
+        """
+        self._compilar_perfiles(valor_config(config, CLAVE_PERFILES))
+        self.precios = np.array([valor_config(config, CLAVES_PRECIO[ventana]) for ventana in VENTANAS],
+                                dtype=np.float64)
+
+    def _compilar_perfiles(self, perfiles):
+        """Normaliza los perfiles y arma el índice tipo -> fila"""
+        self.tipos = list(perfiles)
+        self.indice_tipos = {tipo: i for i, tipo in enumerate(self.tipos)}
+        self.perfiles = np.stack([self._compilar_perfil(rangos) for rangos in perfiles.values()])
+
+    def _verificar(self):
+        """Falla con un mensaje claro si nadie llamó configurar"""
+        if self.perfiles is None or self.precios is None:
+            raise RuntimeError('simulador_horario sin configurar: llame a configurar(Config)')
+
+    @staticmethod
+    def _compilar_perfil(rangos):
+        """Convierte una lista de (inicio, fin, peso) en 24 pesos que suman 1"""
+        perfil = np.zeros(HORAS_DIA)
+        for inicio, fin, peso in rangos:
+            perfil[inicio:fin] += peso
+        return perfil / perfil.sum()
+
+    @staticmethod
+    def _compilar_horario(rangos):
+        """Convierte una lista de (inicio, fin, ventana) en 24 índices de ventana"""
+        horario = np.full(HORAS_DIA, VENTANAS.index('intermedio'), dtype=np.intp)
+        for inicio, fin, ventana in rangos:
+            horario[inicio:fin] = VENTANAS.index(ventana)
+        return horario
+
+    def indices_tipo(self, tipos):
+        """Índice de perfil de cada tipo de dispositivo ('otro' si no se conoce)"""
+        self._verificar()
+        otro = self.indice_tipos['otro']
+        return np.fromiter(
+            (self.indice_tipos.get(str(t).lower().replace(' ', '_'), otro) for t in tipos),
+            dtype=np.intp, count=len(tipos)
+        )
+
+    def perfil_diario(self, potencias, horas, tipos):
+        """
+        Reparte las horas de uso diario de cada dispositivo según su perfil,
+        sin pasar de una hora de uso por franja horaria.
+
+        Args:
+            potencias: Arreglo de potencias en Watts
+            horas: Arreglo de horas de uso diario
+            tipos: Lista con el tipo de cada dispositivo
+
+        Returns:
+            np.ndarray: Matriz 24 x N con kWh por hora
+        """
+        potencias = np.asarray(potencias, dtype=np.float64)
+        restante = np.minimum(np.asarray(horas, dtype=np.float64), HORAS_DIA)
+        peso = self.perfiles[self.indices_tipo(tipos)].T.copy()
+        uso = np.zeros_like(peso)
+
+        # Llenado por niveles: lo que no cabe en una franja saturada se
+        # reparte entre las franjas restantes del perfil (y, si ya no quedan,
+        # entre cualquier franja libre).
+        for _ in range(HORAS_DIA):
+            libre = uso < 1
+            peso = np.where(libre, peso, 0.0)
+            total = peso.sum(axis=0)
+            sin_peso = (total <= 0) & (restante > 0)
+            if np.any(sin_peso):
+                peso[:, sin_peso] = libre[:, sin_peso]
+                total = peso.sum(axis=0)
+            asignado = np.minimum(1 - uso, peso * np.divide(restante, total, out=np.zeros_like(restante), where=total > 0))
+            uso += asignado
+            restante = restante - asignado.sum(axis=0)
+            if not np.any(restante > 1e-12):
+                break
+
+        return uso * (potencias / 1000)
+
+    def perfil_dispositivos(self, dispositivos):
+        """perfil_diario a partir de objetos Dispositivo"""
+        return self.perfil_diario(
+            [d.potencia_watts for d in dispositivos],
+            [d.horas_uso_dia for d in dispositivos],
+            [d.tipo for d in dispositivos]
+        )
+
+    def horas_por_ventana(self, fecha_inicio=None, dias=1):
+        """
+        Cuántas veces cae cada hora del día en cada ventana dentro del periodo
+
+        Returns:
+            np.ndarray: Matriz len(VENTANAS) x 24
+        """
+        fechas = self._fechas(fecha_inicio, dias)
+        conteo_dias = np.bincount(_dia_semana(fechas), minlength=DIAS_SEMANA)
+        horas = np.zeros((len(VENTANAS), HORAS_DIA))
+        np.add.at(horas, (self.ventana, np.arange(HORAS_DIA)), np.repeat(conteo_dias[:, None], HORAS_DIA, axis=1))
+        return horas
+
+    def costo_por_ventana(self, perfil, fecha_inicio=None, dias=1, hogar=None, n_hogares=None):
+        """
+        Consumo y costo por ventana horaria de un periodo, sin expandir la
+        serie hora por hora: como el perfil diario se repite, basta con
+        contar cuántas horas de cada ventana hay en el periodo.
+
+        Args:
+            perfil: Matriz 24 x N de perfil_diario
+            fecha_inicio: Primer día del periodo (hoy por defecto)
+            dias: Longitud del periodo (365 para un año de 8760 horas)
+            hogar: Índice de hogar de cada columna para agregar por hogar
+            n_hogares: Número de hogares (por defecto max(hogar) + 1)
+
+        Returns:
+            dict: 'ventanas', 'consumo_kwh' y 'costo' (len(VENTANAS) x N o x hogares)
+            y 'costo_total'
+        """
+        self._verificar()
+        consumo = self.horas_por_ventana(fecha_inicio, dias) @ perfil
+        if hogar is not None:
+            hogar = np.asarray(hogar, dtype=np.intp)
+            n_hogares = n_hogares or int(hogar.max()) + 1
+            consumo = np.vstack([np.bincount(hogar, weights=fila, minlength=n_hogares) for fila in consumo])
+        costo = consumo * self.precios[:, None]
+        return {
+            'ventanas': VENTANAS,
+            'consumo_kwh': consumo,
+            'costo': costo,
+            'costo_total': costo.sum(axis=0)
+        }
+
+    def expandir(self, perfil, fecha_inicio=None, dias=365):
+        """
+        Serie hora por hora del periodo (dias*24 x N), con la ventana y el
+        precio de cada hora. Solo hace falta para análisis hora a hora;
+        para totales usar costo_por_ventana.
+        """
+        self._verificar()
+        fechas = self._fechas(fecha_inicio, dias)
+        ventana = self.ventana[_dia_semana(fechas)].ravel()
+        return {
+            'horas': fechas.astype('datetime64[h]').repeat(HORAS_DIA) + np.tile(np.arange(HORAS_DIA), dias),
+            'consumo_kwh': np.tile(perfil, (dias, 1)),
+            'ventana': ventana,
+            'precio': self.precios[ventana]
+        }
+
+    def precio_medio_diario(self, perfil, fecha_inicio=None, dias=1):
+        """
+        MXN/kWh promedio de cada día del periodo: los precios de las 24
+        horas de ese tipo de día ponderados por el perfil horario del hogar
+
+        Args:
+            perfil: Matriz 24 x N de perfil_diario (se suman las columnas)
+            fecha_inicio: Primer día del periodo (hoy por defecto)
+            dias: Longitud del periodo
+
+        Returns:
+            np.ndarray: Precio promedio por día, forma (dias,)
+        """
+        self._verificar()
+        carga = np.asarray(perfil, dtype=np.float64).reshape(HORAS_DIA, -1).sum(axis=1)
+        total = carga.sum()
+        if total <= 0:
+            # Sin consumo: promedio simple de las horas del día
+            carga, total = np.ones(HORAS_DIA), HORAS_DIA
+        precio_tipo_dia = self.precios[self.ventana] @ carga / total
+        return precio_tipo_dia[_dia_semana(self._fechas(fecha_inicio, dias))]
+
+    @staticmethod
+    def _fechas(fecha_inicio, dias):
+        if fecha_inicio is None:
+            fecha_inicio = datetime.now().date()
+        return np.datetime64(fecha_inicio, 'D') + np.arange(dias)
+
+
+# Sin perfiles ni precios al importar; app.py lo configura con Config
+simulador_horario = SimuladorCargaHoraria()
@@ -0,0 +1,117 @@
+import numpy as np
+from services.configuracion import valor_config
+
+
+# Claves de Config con la tabla tarifaria, en orden de bloque (límites en
+# kWh bimestrales y tarifa en MXN/kWh de cada bloque; el último bloque no
+# tiene límite). Los valores solo viven en Config.
+CLAVES_LIMITES = ('LIMITE_TARIFA_1', 'LIMITE_TARIFA_1A', 'LIMITE_TARIFA_1B', 'LIMITE_TARIFA_1C')
+CLAVES_TARIFAS = ('TARIFA_BASE', 'TARIFA_INTERMEDIA', 'TARIFA_1B', 'TARIFA_1C', 'TARIFA_EXCEDENTE')
+
+
+class MotorTarifario:
+    """
+    Motor de tarifas escalonadas por bloques
+
+    Las tablas se compilan una sola vez (bordes de bloque y costo acumulado
+    al inicio de cada bloque), así que el recibo de cualquier arreglo de
+    consumos se calcula con un searchsorted y una multiplicación, sin
+    ciclos de Python.
+    """
+
+    def __init__(self, limites=None, tarifas=None):
+        """
+        Args:
+            limites: Límites superiores de cada bloque (kWh bimestrales), ascendentes
+            tarifas: Tarifa por kWh de cada bloque (una más que límites); si
+                faltan, el motor queda sin tablas hasta llamar configurar
+        """
+        self.limites = self.tarifas = self.bordes = self.costo_acumulado = None
+        if limites is not None:
+            self._compilar(limites, tarifas)
+
+    def _compilar(self, limites, tarifas):
+        """Valida las tablas y precalcula bordes y costo acumulado por bloque"""
+        limites = np.asarray(limites, dtype=np.float64)
+        tarifas = np.asarray(tarifas, dtype=np.float64)
+
+        if len(tarifas) != len(limites) + 1:
+            raise ValueError('Debe haber una tarifa más que límites de bloque')
+        if np.any(np.diff(limites) <= 0):
+            raise ValueError('Los límites de bloque deben ser ascendentes')
+
+        self.limites, self.tarifas = limites, tarifas
+        self.bordes = np.concatenate([[0.0], limites])
+        self.costo_acumulado = np.concatenate([[0.0], np.cumsum(np.diff(self.bordes) * tarifas[:-1])])
+
+    @classmethod
+    def desde_config(cls, config):
+        """
+        Construye el motor a partir de Config o de un dict (p. ej. app.config)
+        con las claves de CLAVES_LIMITES y CLAVES_TARIFAS
+
+        Raises:
+            KeyError: Si falta alguna clave de la tabla
+        """
+        return cls(*cls._tablas(config))
+
+    @staticmethod
+    def _tablas(config):
+        """Límites y tarifas leídos de Config, en orden de bloque"""
+        limites = [valor_config(config, clave) for clave in CLAVES_LIMITES]
+        tarifas = [valor_config(config, clave) for clave in CLAVES_TARIFAS]
+        return limites, tarifas
+
+    def configurar(self, config):
+        """
+        Compila las tablas con las claves de Config o app.config. Cambia la
+        instancia en su lugar porque otros módulos ya importaron
+        motor_tarifario.
+        """
+        self._compilar(*self._tablas(config))
+
+    def _verificar(self):
+        """Falla con un mensaje claro si nadie llamó configurar"""
+        if self.bordes is None:
+            raise RuntimeError('motor_tarifario sin configurar: llame a configurar(Config)')
+
+    def costo(self, consumos_kwh):
+        """
+        Recibo escalonado: cada kWh se cobra a la tarifa del bloque en el que cae
+
+        Args:
+            consumos_kwh: Escalar o arreglo de consumos bimestrales
+
+        Returns:
+            np.ndarray: Costo en pesos de cada consumo
+        """
+        self._verificar()
+        consumos = np.maximum(np.asarray(consumos_kwh, dtype=np.float64), 0)
+        bloque = np.searchsorted(self.bordes, consumos, side='right') - 1
+        return self.costo_acumulado[bloque] + (consumos - self.bordes[bloque]) * self.tarifas[bloque]
+
+    def tarifa_marginal(self, consumos_kwh):
+        """Tarifa del bloque en el que termina cada consumo"""
+        self._verificar()
+        consumos = np.asarray(consumos_kwh, dtype=np.float64)
+        return self.tarifas[np.searchsorted(self.limites, consumos, side='left')]
+
+    def rango_cobro(self, consumos_kwh):
+        """
+        Versión vectorizada de OptimizadorEnergetico.calcular_rango_cobro_bimestral
+
+        Returns:
+            dict: Arreglos con tarifa marginal, costo estimado y rango ±5%
+        """
+        costo = self.costo(consumos_kwh)
+        return {
+            'consumo_kwh': np.asarray(consumos_kwh, dtype=np.float64),
+            'tarifa_aplicada': self.tarifa_marginal(consumos_kwh),
+            'costo_estimado': costo,
+            'rango_minimo': costo * 0.95,
+            'rango_maximo': costo * 1.05
+        }
+
+
+# Sin tablas al importar; app.py lo compila con Config
+motor_tarifario = MotorTarifario()
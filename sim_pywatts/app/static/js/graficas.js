@@ -0,0 +1,63 @@
+// Gráficas de report.html dibujadas en el navegador con Chart.js a partir de
+// /usuario/<id>/grafica/<tipo>.json; si Chart.js o los datos no llegan se
+// muestra la imagen que genera el servidor (data-imagen)
+(function () {
+    'use strict';
+
+    function usarImagen(canvas) {
+        var imagen = document.createElement('img');
+        imagen.src = canvas.dataset.imagen;
+        imagen.alt = canvas.getAttribute('aria-label') || '';
+        canvas.replaceWith(imagen);
+    }
+
+    function dibujar(canvas, serie) {
+        var tipo = canvas.dataset.tipo;
+        new Chart(canvas, {
+            type: tipo,
+            data: {
+                labels: serie.etiquetas,
+                datasets: [{
+                    label: serie.unidad,
+                    data: serie.valores,
+                    backgroundColor: serie.colores
+                }]
+            },
+            options: {
+                plugins: {
+                    title: { display: true, text: serie.titulo },
+                    legend: { display: tipo === 'pie' },
+                    tooltip: {
+                        callbacks: {
+                            label: function (contexto) {
+                                var i = contexto.dataIndex;
+                                var texto = serie.valores[i] + ' ' + serie.unidad;
+                                // Solo series cuyos valores son partes de un total
+                                if (serie.porcentajes && serie.unidad !== '%') {
+                                    texto += ' (' + serie.porcentajes[i] + '%)';
+                                }
+                                return texto;
+                            }
+                        }
+                    }
+                }
+            }
+        });
+    }
+
+    document.querySelectorAll('canvas[data-grafica]').forEach(function (canvas) {
+        if (!window.Chart || !window.fetch) {
+            usarImagen(canvas);
+            return;
+        }
+        fetch(canvas.dataset.grafica)
+            .then(function (respuesta) {
+                if (!respuesta.ok) {
+                    throw new Error(respuesta.status);
+                }
+                return respuesta.json();
+            })
+            .then(function (serie) { dibujar(canvas, serie); })
+            .catch(function () { usarImagen(canvas); });
+    });
+})();
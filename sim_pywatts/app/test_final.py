@@ -25,8 +25,13 @@ from services.calculations import OptimizadorEnergetico
 from services.recommendations import GeneradorRecomendaciones
 from services.charts import GeneradorGraficas
 from services.pdf_generator import GeneradorPDF
+from services.simulacion import simulador_horario
 from datetime import datetime
 
+# config.py vive en la raíz del repositorio, como en app.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')))
+from config import Config
+
 # Configurar Flask
 app = Flask(__name__)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -35,6 +40,9 @@ app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
+# Perfiles y precios horarios de las recomendaciones (app.py hace lo mismo)
+simulador_horario.configurar(Config)
+
 print(f"📁 Base de datos se creará en: {DB_PATH}\n")
 
 # Crear BD limpia